@@ -1,76 +1,109 @@
 # app.py — FlightFinder main Flask app
+#
+#   flask --app app migrate             create the database tables (run once per deploy)
+#   gunicorn -c gunicorn.conf.py        production; see gunicorn.conf.py for the presets
+#   python app.py                       local development server with debugpy
 
-import uuid
-import logging
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify, session, redirect
-from dotenv import load_dotenv
 import os
+from flask import Flask
 
-# === Load environment variables ===
-load_dotenv()
-
-# === App configuration ===
-IS_LOCAL = os.getenv("IS_LOCAL", "false").lower() == "true"
-AFFILIATE_MARKER = os.getenv("AFFILIATE_MARKER")
-FLASK_ENV = os.getenv("FLASK_ENV", "development")
-PORT = int(os.getenv("PORT", 10000))
-API_TOKEN = os.getenv("TRAVELPAYOUTS_API_TOKEN")
-MARKER = os.getenv("TRAVELPAYOUTS_MARKER")
-DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() == "true"
-
-# === Initialize Flask app ===
-app = Flask(__name__, static_folder="static")
-app.secret_key = os.getenv("SECRET_KEY", "flightfinder-secret")
-app.config["TEMPLATES_AUTO_RELOAD"] = True
-app.config["ENV"] = FLASK_ENV
-app.config["DEBUG"] = FLASK_ENV == "development"
-
-# === Configure SQLAlchemy ===
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-# === Initialize database ===
-from database import db
-db.init_app(app)
-
-# === Import models AFTER db.init_app ===
-from models import Booking
-
-# === Register blueprints ===
-from travel_ui import travel_bp
-app.register_blueprint(travel_bp)
-
-# === Create tables ===
-with app.app_context():
-    db.create_all()
-
-# === Error handling ===
-@app.errorhandler(500)
-def internal_error(error):
-    return f"Internal Server Error: {error}", 500
-
-# === Logging ===
+from config import FLASK_ENV, PORT, IS_LOCAL, DEFER_BACKGROUND_JOBS, WARM_CACHE_ENABLED
 from config import get_logger
 logger = get_logger(__name__)
 
-logging.basicConfig(
-    level=logging.DEBUG if app.config["DEBUG"] else logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.StreamHandler()]
-)
 
-if IS_LOCAL:
-    logging.info("Running in local mode.")
+def create_app(start_background=not DEFER_BACKGROUND_JOBS):
+    """Build the app. Importing this module builds it once; a preloading server forks after
+    that, so everything imported here is shared copy-on-write by its workers."""
+    # === Initialize Flask app ===
+    app = Flask(__name__, static_folder="static")
+    app.secret_key = os.getenv("SECRET_KEY", "flightfinder-secret")
+    app.config["ENV"] = FLASK_ENV
+    app.config["DEBUG"] = FLASK_ENV == "development"
+
+    # === Template rendering ===
+    # Development re-reads templates on change; production compiles each template
+    # once and keeps the bytecode on disk so new workers skip the Jinja parser.
+    app.config["TEMPLATES_AUTO_RELOAD"] = FLASK_ENV == "development"
+    if FLASK_ENV != "development":
+        from jinja2 import FileSystemBytecodeCache
+        from config import JINJA_BYTECODE_CACHE_DIR
+        os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+        app.jinja_env.auto_reload = False
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_BYTECODE_CACHE_DIR)
+
+    # === Configure SQLAlchemy ===
+    from database import DATABASE_URL, db
+    app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+
+    # === Import models AFTER db.init_app ===
+    import models  # noqa: F401  (registers the tables with db)
+
+    # === Register blueprints ===
+    from travel_ui import travel_bp
+    app.register_blueprint(travel_bp)
+
+    # === Profiling and slow-request capture ===
+    from profiling import init_profiling
+    init_profiling(app)
+
+    # === Error handling ===
+    @app.errorhandler(500)
+    def internal_error(error):
+        return f"Internal Server Error: {error}", 500
+
+    # === Schema ===
+    # Not created on import any more: every worker (and every test import) paid for it
+    @app.cli.command("migrate")
+    def migrate_command():
+        """Create any missing database tables."""
+        migrate(app)
+        print("✅ Database tables are up to date")
+
+    if start_background:
+        start_background_jobs()
+    if IS_LOCAL:
+        logger.info("Running in local mode.")
+    return app
+
+
+def migrate(app):
+    from database import db
+    from db import backfill_booking_summaries
+    with app.app_context():
+        db.create_all()
+        created = backfill_booking_summaries()
+        if created:
+            logger.info(f"Backfilled {created} booking summaries")
+
+
+def start_background_jobs():
+    """Per-process background threads; a preloading server starts them after forking"""
+    if WARM_CACHE_ENABLED:
+        from warm_cache import start_warm_cache_scheduler
+        start_warm_cache_scheduler()
+
+
+def warm_shared_state():
+    """Load the read-mostly lookup structures so forked workers share their pages"""
+    from reference_data import reference_data
+    from place_resolver import place_resolver
+    reference_data.get_version()
+    place_resolver.search("london")
+
+
+app = create_app()
+
 
 # === Dev-only Debugging ===
 if __name__ == "__main__" and FLASK_ENV == "development":
     import debugpy
+    migrate(app)
     debugpy.listen(("0.0.0.0", 5681))
     print("Waiting for debugger connection...")
+    print("Registered routes:")
+    for rule in app.url_map.iter_rules():
+        print(rule)
     app.run(host="0.0.0.0", port=PORT, debug=True, use_reloader=False, use_debugger=False)
-
-# === Show Registered Routes ===
-print("Registered routes:")
-for rule in app.url_map.iter_rules():
-    print(rule)
\ No newline at end of file
@@ -0,0 +1,14 @@
+# asgi.py — ASGI entry point for uvicorn-based serving
+#
+#   gunicorn -c gunicorn.conf.py            (with GUNICORN_PROFILE=uvicorn)
+#   uvicorn asgi:asgi_app --port 10000      (local)
+#
+# The Flask app is WSGI, so each request runs on one of ASGI_THREADS threads per worker.
+# (asgiref's WsgiToAsgi ran every request on a single thread: one search at a time.)
+
+from a2wsgi import WSGIMiddleware
+
+from app import app
+from config import ASGI_THREADS
+
+asgi_app = WSGIMiddleware(app, workers=ASGI_THREADS)
@@ -0,0 +1,63 @@
+# batch_search.py — runs many search specs concurrently and yields results as they complete
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from flight_search import search_flights_with_meta
+from search_api import API_MAX_OFFERS, parse_search_request
+from search_cache import make_search_spec, make_search_key
+from search_queue import SearchPending
+from config import BATCH_SEARCH_WORKERS
+from config import get_logger
+logger = get_logger(__name__)
+
+# Shared by all batch requests in this process, so concurrent batches cannot multiply
+# upstream load; every upstream call still goes through the shared rate limiter.
+_batch_pool = ThreadPoolExecutor(max_workers=BATCH_SEARCH_WORKERS, thread_name_prefix="batch-search")
+
+
+def _dedupe_key(params):
+    spec = make_search_spec(**{k: v for k, v in params.items() if k != "direct_only"})
+    return f"{make_search_key(spec)}:{params['direct_only']}"
+
+
+def run_batch(items, shape):
+    """Yield one dict per distinct search, in completion order.
+
+    `items` are raw search specs; `shape(flights)` turns results into the offers
+    to return. Invalid specs and failed searches become per-item errors; searches
+    handed to the search workers come back with their "job_id"."""
+    unique = {}  # dedupe key -> (params, [indexes])
+    for index, item in enumerate(items):
+        params, errors = parse_search_request(item if isinstance(item, dict) else {})
+        if errors:
+            yield {"indexes": [index], "errors": errors}
+            continue
+        try:
+            key = _dedupe_key(params)
+        except Exception as e:
+            yield {"indexes": [index], "errors": [str(e)]}
+            continue
+        unique.setdefault(key, (params, []))[1].append(index)
+
+    futures = {
+        _batch_pool.submit(search_flights_with_meta, **params, limit=API_MAX_OFFERS): (params, indexes)
+        for params, indexes in unique.values()
+    }
+    for future in as_completed(futures):
+        params, indexes = futures[future]
+        route = f"{params['origin_code']}-{params['destination_code']}"
+        try:
+            flights, meta = future.result()
+            result = {
+                "indexes": indexes,
+                "route": route,
+                "date_from": params["date_from_str"],
+                "source": meta["source"],
+                "offers": shape(flights),
+            }
+        except SearchPending as pending:
+            result = {"indexes": indexes, "route": route, "job_id": pending.job_id}
+        except Exception as e:
+            logger.error(f"Batch search for {route} failed: {e}")
+            result = {"indexes": indexes, "route": route, "error": str(e)}
+        yield result
@@ -0,0 +1,54 @@
+# benchmarks/alerts_benchmark.py — price alert matching with 100k watches on one node
+#
+#   python benchmarks/alerts_benchmark.py [watches]
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from price_alerts import PriceAlerts  # noqa: E402
+
+DESTINATIONS = ["LON", "PAR", "TYO", "AMS", "IST", "AYT", "MAN", "CDG", "BCN", "ROM"]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = PriceAlerts(path=os.path.join(tmp, "alerts.db"))
+        conn = writer._connect()
+        rows = []
+        for i in range(count):
+            start = rng.randint(1, 20)
+            rows.append((f"user{i}@example.com", "STO", rng.choice(DESTINATIONS),
+                         f"2099-10-{start:02d}", f"2099-10-{start + rng.randint(0, 7):02d}",
+                         rng.randint(50, 400), 0.0))
+        with conn:
+            conn.executemany(
+                "INSERT INTO watches (email, origin, destination, date_from, date_to, max_price, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+        alerts = PriceAlerts(path=os.path.join(tmp, "alerts.db"))
+        start = time.perf_counter()
+        alerts.sync(force=True)
+        print(f"index load:   {count} watches in {time.perf_counter() - start:.2f}s")
+
+        results = 10_000
+        matched = 0
+        start = time.perf_counter()
+        for _ in range(results):
+            matched += len(alerts.match("STO", rng.choice(DESTINATIONS), f"2099-10-{rng.randint(1, 27):02d}", rng.randint(40, 120)))
+        elapsed = time.perf_counter() - start
+        print(f"match:        {results} results in {elapsed * 1000:.1f} ms ({elapsed / results * 1e6:.1f} µs each, {matched} matches)")
+
+        start = time.perf_counter()
+        queued = alerts.evaluate("STO", "LON", "2099-10-10", [{"price": 60, "airline": "BA"}])
+        print(f"evaluate:     {queued} alerts queued in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
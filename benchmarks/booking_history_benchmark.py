@@ -0,0 +1,111 @@
+# benchmarks/booking_history_benchmark.py — booking history page: JSON blobs vs summary rows
+#
+# Fills a throwaway SQLite database with N bookings and their summary rows, then times
+#   - the old page: every Booking row, newest first, flight_data parsed per row
+#     (only up to 100k bookings; beyond that it no longer finishes in reasonable time)
+#   - the old query limited to one page, which still sorts the whole table by timestamp
+#   - get_booking_history() for the first page and for a deep page
+#
+#   python benchmarks/booking_history_benchmark.py [N ...]     default: 100000 1000000
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from database import db  # noqa: E402
+from db import get_booking_history, summary_fields  # noqa: E402
+from models import Booking, BookingSummary  # noqa: E402
+from config import HISTORY_PAGE_SIZE  # noqa: E402
+
+AIRPORTS = ["ARN", "LHR", "CDG", "FRA", "JFK", "DXB", "BCN", "AMS", "IST", "MAD"]
+BATCH = 20_000
+FULL_LOAD_LIMIT = 100_000
+
+
+def fake_flight(rng, depart):
+    origin, destination = rng.sample(AIRPORTS, 2)
+    return {"id": f"{rng.getrandbits(64):016x}", "origin": origin, "destination": destination,
+            "departure_date": depart.strftime("%Y-%m-%d %H:%M"),
+            "return_date": (depart + timedelta(days=7)).strftime("%Y-%m-%d %H:%M"),
+            "price": round(rng.uniform(40, 900), 2), "currency": "EUR", "airline": "SK",
+            "flight_number": f"SK{rng.randint(100, 9999)}", "cabin_class": "economy",
+            "stops": rng.randint(0, 2), "duration": rng.randint(60, 900), "vendor": "Kiwi"}
+
+
+def populate(n):
+    rng = random.Random(n)
+    start = datetime(2024, 1, 1)
+    for first in range(0, n, BATCH):
+        bookings, summaries = [], []
+        for i in range(first, min(n, first + BATCH)):
+            booked_at = start + timedelta(seconds=i * 30)
+            flight = fake_flight(rng, booked_at + timedelta(days=30))
+            reference = f"R{i:09d}"
+            passenger = {"passenger_name": f"Passenger {i}", "passenger_email": f"p{i}@example.com",
+                         "passenger_phone": f"07{i:08d}"}
+            bookings.append({"id": i + 1, "reference": reference, **passenger,
+                             "flight_data": json.dumps(flight), "timestamp": booked_at})
+            summaries.append({"booking_id": i + 1, "reference": reference, **passenger,
+                              "booked_at": booked_at, **summary_fields(flight)})
+        db.session.execute(insert(Booking), bookings)
+        db.session.execute(insert(BookingSummary), summaries)
+        db.session.commit()
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def old_full_page():
+    return [(b, json.loads(b.flight_data)) for b in Booking.query.order_by(Booking.timestamp.desc()).all()]
+
+
+def old_first_page():
+    rows = Booking.query.order_by(Booking.timestamp.desc()).limit(HISTORY_PAGE_SIZE).all()
+    return [(b, json.loads(b.flight_data)) for b in rows]
+
+
+def run(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(tmp, 'history.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            populate(n)
+            print(f"{n:>9,} bookings  (populated in {time.perf_counter() - started:.1f}s)")
+            if n <= FULL_LOAD_LIMIT:
+                print(f"  old page, all rows + json.loads   {timed(old_full_page, repeat=1):10.1f} ms")
+            print(f"  old query, first {HISTORY_PAGE_SIZE} rows          {timed(old_first_page):10.1f} ms")
+            print(f"  summary page 1                    {timed(lambda: get_booking_history(1)):10.2f} ms")
+            deep = n // HISTORY_PAGE_SIZE // 2
+            print(f"  summary page {deep:<6}               {timed(lambda: get_booking_history(deep)):10.2f} ms")
+            db.session.remove()
+            db.engine.dispose()
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for n in sizes:
+        run(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# benchmarks/booking_reference_stress.py — a million concurrent bookings, zero reference collisions
+#
+# Several processes, each with several threads, call generate_booking_reference() and
+# save_booking() against one shared SQLite database, like gunicorn workers would. Every
+# booking must be saved on the first attempt; afterwards the reference column is checked
+# for duplicates. For comparison, the old 5-random-character generator is run over the
+# same number of same-day references in memory.
+#
+#   python benchmarks/booking_reference_stress.py [bookings] [processes] [threads]
+
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import string
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSENGER = {"name": "Stress Test", "email": "stress@example.com", "phone": "0700000000"}
+FLIGHT = json.dumps({"origin": "ARN", "destination": "LHR", "departure_date": "2025-10-05 08:00",
+                     "price": 123.45, "currency": "EUR", "airline": "SK", "flight_number": "SK1527"})
+
+
+def make_app(path):
+    from flask import Flask
+    from sqlalchemy import event
+    from database import db
+    import models  # noqa: F401  (registers the tables with db)
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 60}}
+    db.init_app(app)
+    with app.app_context():
+        @event.listens_for(db.engine, "connect")
+        def _pragmas(conn, _):
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # the stress is on the reference scheme, not the disk
+    return app
+
+
+def worker_process(path, bookings, threads, failures):
+    from db import save_booking
+    from travel import generate_booking_reference
+
+    app = make_app(path)
+    per_thread = [bookings // threads + (1 if i < bookings % threads else 0) for i in range(threads)]
+
+    def run(count):
+        with app.app_context():
+            for _ in range(count):
+                try:
+                    save_booking(generate_booking_reference(), PASSENGER, FLIGHT)
+                except Exception as e:
+                    with failures.get_lock():
+                        failures.value += 1
+                    print(f"save_booking failed: {e}", file=sys.stderr)
+
+    pool = [threading.Thread(target=run, args=(count,)) for count in per_thread]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+
+def old_generator_collisions(n):
+    seen, collisions = set(), 0
+    for _ in range(n):
+        code = "".join(random.choices(string.ascii_uppercase + string.digits, k=5))
+        if code in seen:
+            collisions += 1
+        seen.add(code)
+    return collisions
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stress.db")
+        app = make_app(path)
+        from database import db
+        with app.app_context():
+            db.create_all()
+            db.engine.dispose()  # children open their own connections
+
+        failures = multiprocessing.get_context("fork").Value("i", 0)
+        started = time.perf_counter()
+        children = [multiprocessing.get_context("fork").Process(
+            target=worker_process, args=(path, total // processes + (1 if i < total % processes else 0), threads, failures))
+            for i in range(processes)]
+        for child in children:
+            child.start()
+        for child in children:
+            child.join()
+        elapsed = time.perf_counter() - started
+
+        conn = sqlite3.connect(path)
+        rows, distinct = conn.execute("SELECT COUNT(*), COUNT(DISTINCT reference) FROM bookings").fetchone()
+        summaries = conn.execute("SELECT COUNT(*) FROM booking_summaries").fetchone()[0]
+        blocks = conn.execute("SELECT next_value FROM reference_counters").fetchone()[0]
+        conn.close()
+
+    print(f"{total:,} bookings from {processes} processes x {threads} threads in {elapsed:.1f}s "
+          f"({total / elapsed:,.0f}/s)")
+    print(f"  saved {rows:,}, distinct references {distinct:,}, summaries {summaries:,}, "
+          f"failed saves {failures.value}, sequence numbers reserved {blocks:,}")
+    print(f"  old generator, {total:,} references on one day: {old_generator_collisions(total):,} collisions")
+    if failures.value or rows != total or distinct != total:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
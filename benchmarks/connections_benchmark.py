@@ -0,0 +1,60 @@
+# benchmarks/connections_benchmark.py — graph build and k-cheapest self-transfer search on a synthetic network
+#
+#   python benchmarks/connections_benchmark.py [flights] [airports]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connections import ConnectionGraph, Edge, to_minutes  # noqa: E402
+
+
+def synthetic_edges(count, airports, rng):
+    """Hub-and-spoke-ish network over 30 days: a fifth of the airports take most of the traffic"""
+    codes = [f"A{i:03d}" for i in range(airports)]
+    hubs = codes[:max(1, airports // 5)]
+    start = to_minutes("2099-10-01 00:00")
+    edges = []
+    for _ in range(count):
+        origin = rng.choice(hubs if rng.random() < 0.6 else codes)
+        destination = rng.choice(hubs if rng.random() < 0.6 else codes)
+        if origin == destination:
+            continue
+        depart = start + rng.randint(0, 30 * 24 * 60)
+        edges.append(Edge(depart, depart + rng.randint(45, 720), origin, destination, rng.randint(20, 600), None))
+    return edges, codes
+
+
+def timed(label, fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label}: {best * 1000:.1f} ms")
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    airports = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    rng = random.Random(5)
+    edges, codes = synthetic_edges(count, airports, rng)
+    print(f"{len(edges)} flights between {airports} airports")
+
+    graph = timed("build graph", lambda: ConnectionGraph(edges))
+    day = to_minutes("2099-10-15 00:00")
+    queries = [(rng.choice(codes), rng.choice(codes)) for _ in range(20)]
+
+    def run_queries():
+        return [graph.k_cheapest_paths(o, d, day, day + 1439, k=10, min_legs=2) for o, d in queries if o != d]
+    results = timed(f"{len(queries)} k=10 searches", run_queries)
+    print(f"  {sum(len(r) for r in results)} itineraries, "
+          f"{sum(len(r) for r in results) / max(1, len(results)):.1f} per search")
+
+
+if __name__ == "__main__":
+    main()
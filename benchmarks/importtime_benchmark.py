@@ -0,0 +1,76 @@
+# benchmarks/importtime_benchmark.py — cold import cost of the app's entry points
+#
+# Runs `python -X importtime -c "import <target>"` in fresh interpreters, takes the
+# median of several runs, and reports the total import time, the most expensive
+# top-level packages (self time summed over their submodules) and which of the heavy
+# optional modules were actually imported. The NLP stack and the HTTP client should
+# only show up once something uses them.
+#
+#   python benchmarks/importtime_benchmark.py [runs] [target ...]
+
+import os
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_TARGETS = ["app", "travel_ui", "flight_search", "utils"]
+HEAVY_MODULES = ["spacy", "dateparser", "word2number", "requests", "flask_sqlalchemy", "sqlalchemy", "debugpy"]
+TOP_PACKAGES = 8
+
+
+def parse_importtime(stderr):
+    """[(self_us, cumulative_us, depth, module)] from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def measure(target):
+    """(total ms, {package: self ms}, [heavy modules loaded]) for one fresh interpreter"""
+    code = (f"import sys, {target}; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    rows = parse_importtime(result.stderr)
+    packages = Counter()
+    for self_us, _, _, name in rows:
+        packages[name.split(".")[0]] += self_us / 1000
+    total = sum(cumulative for _, cumulative, depth, name in rows if depth == 0 and name != "site")
+    loaded = [m for m in result.stdout.strip().splitlines()[-1].split(",") if m] if result.stdout.strip() else []
+    return total / 1000, packages, loaded
+
+
+def main():
+    args = sys.argv[1:]
+    runs = int(args.pop(0)) if args and args[0].isdigit() else 5
+    targets = args or DEFAULT_TARGETS
+
+    for target in targets:
+        try:
+            samples = [measure(target) for _ in range(runs)]
+        except RuntimeError as e:
+            print(f"{target}: {e}")
+            continue
+        totals = [total for total, _, _ in samples]
+        packages = Counter()
+        for _, per_package, _ in samples:
+            packages.update(per_package)
+        print(f"import {target}: median {statistics.median(totals):7.1f} ms  "
+              f"(min {min(totals):.1f}, max {max(totals):.1f}, {runs} runs)")
+        print(f"  heavy modules loaded: {', '.join(samples[-1][2]) or 'none'}")
+        for package, ms in packages.most_common(TOP_PACKAGES):
+            print(f"  {package:24} {ms / runs:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/load_test.py — concurrent-search capacity of a running FlightFinder server
+#
+# Start the server with a simulated upstream delay and no caching, e.g.
+#   MOCK_UPSTREAM_LATENCY=1 SEARCH_CACHE_TTL=0 SNAPSHOT_ENABLED=false SELF_TRANSFER_ENABLED=false \
+#   GUNICORN_PROFILE=gevent WEB_CONCURRENCY=1 gunicorn -c gunicorn.conf.py
+# then run
+#   python benchmarks/load_test.py --concurrency 50 --requests 200 --workers 1
+#
+# Compare the searches/s per worker across GUNICORN_PROFILE=sync|gevent|uvicorn; the
+# figures measured this way are listed in gunicorn.conf.py. Dates are relative to today
+# (the mock inventory has no flights then, but every search still waits for the upstream).
+
+import argparse
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+
+def search_form(days_ahead):
+    """A round-trip search `days_ahead` days from today, so the form never asks for past dates"""
+    depart = date.today() + timedelta(days=days_ahead)
+    return {
+        "origin_code": "Stockholm (STO)",
+        "destination_code": "London (LON)",
+        "date_from": depart.isoformat(),
+        "date_to": (depart + timedelta(days=7)).isoformat(),
+        "passengers": "1",
+        "cabin_class": "economy",
+        "trip_type": "round-trip",
+    }
+
+
+def run_search(url, form):
+    body = urllib.parse.urlencode(form).encode()
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, data=body, timeout=120) as response:
+            response.read()
+            ok = response.status == 200
+    except Exception:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:10000/travel-ui")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1, help="number of server workers, for the per-worker figure")
+    parser.add_argument("--days-ahead", type=int, default=30, help="departure date, in days from today")
+    args = parser.parse_args()
+
+    form = search_form(args.days_ahead)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda _: run_search(args.url, form), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for ok, latency in results if ok]
+    failures = len(results) - len(latencies)
+    print(f"requests:        {len(results)} ({failures} failed)")
+    print(f"concurrency:     {args.concurrency}")
+    print(f"wall time:       {elapsed:.2f}s")
+    print(f"searches/s:      {len(latencies) / elapsed:.2f}")
+    print(f"per worker:      {len(latencies) / elapsed / args.workers:.2f} searches/s")
+    if latencies:
+        print(f"latency p50/p99: {percentile(latencies, 50):.2f}s / {percentile(latencies, 99):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
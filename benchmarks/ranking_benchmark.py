@@ -0,0 +1,53 @@
+# benchmarks/ranking_benchmark.py — multi-criteria ranking and Pareto front over synthetic offers
+#
+#   python benchmarks/ranking_benchmark.py [offers]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ranking import SORT_MODES, pareto_front, rank  # noqa: E402
+
+
+def synthetic_offers(count, rng):
+    offers = []
+    for i in range(count):
+        stops = rng.choice((0, 0, 1, 1, 1, 2, 3))
+        duration = rng.randint(90, 240) + stops * rng.randint(60, 420)
+        offers.append({
+            "id": str(i),
+            "price": round(rng.uniform(40, 900) - stops * 30, 2),
+            "duration": duration,
+            "stops": stops,
+            "depart": f"2099-10-10 {rng.randint(0, 23):02d}:{rng.choice((0, 15, 30, 45)):02d}",
+        })
+    return offers
+
+
+def timed(label, fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label}: {best * 1000:.1f} ms")
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    offers = synthetic_offers(count, random.Random(3))
+    print(f"{count} offers")
+
+    front = timed("pareto_front", lambda: pareto_front(offers))
+    print(f"  {len(front)} offers on the Pareto front")
+    timed("rank, one mode (top 20)", lambda: rank(offers, modes=("best",), k=20))
+    timed(f"rank, all {len(SORT_MODES)} modes (top 20)", lambda: rank(offers, modes=tuple(SORT_MODES), k=20))
+    timed("baseline sort by price", lambda: sorted(offers, key=lambda f: f["price"])[:20])
+
+
+if __name__ == "__main__":
+    main()
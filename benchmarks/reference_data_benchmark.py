@@ -0,0 +1,47 @@
+# benchmarks/reference_data_benchmark.py — lookup speed and per-process memory of the compiled reference data
+#
+#   python benchmarks/reference_data_benchmark.py [lookups]
+
+import json
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reference_data import reference_data, SOURCE_FILES  # noqa: E402
+
+
+def max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main():
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    before = max_rss_kb()
+    codes = [a["iata"] for a in reference_data.airports()]
+    print(f"Mapped {len(codes)} airports from {reference_data.path}: +{max_rss_kb() - before} KB max RSS")
+
+    start = time.perf_counter()
+    for i in range(lookups):
+        reference_data.airport(codes[i % len(codes)])
+    elapsed = time.perf_counter() - start
+    print(f"airport():   {lookups / elapsed:,.0f} lookups/s")
+
+    start = time.perf_counter()
+    for i in range(lookups):
+        reference_data.city_code("London" if i % 2 else "Paris")
+    elapsed = time.perf_counter() - start
+    print(f"city_code(): {lookups / elapsed:,.0f} lookups/s")
+
+    # The old autocomplete path: parse airports.json on every request
+    start = time.perf_counter()
+    for _ in range(1000):
+        with open(SOURCE_FILES[0], "r", encoding="utf-8") as f:
+            json.load(f)
+    print(f"airports.json parse: {(time.perf_counter() - start):.2f} ms per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/render_benchmark.py — results page render time for 10/100/1000 offers
+#
+#   python benchmarks/render_benchmark.py
+#
+# "full" renders travel_results.html including the offer cards every time,
+# "fragment" reuses the cached _results_table.html markup as a repeated search does.
+
+import os
+import sys
+import time
+
+from flask import Blueprint, Flask, render_template
+from jinja2 import FileSystemBytecodeCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from render_cache import fragment_cache, render_cached_fragment  # noqa: E402
+
+ROUNDS = 20
+
+
+def make_app():
+    app = Flask(__name__, template_folder=os.path.join(ROOT, "templates"), static_folder=os.path.join(ROOT, "static"))
+    app.jinja_env.auto_reload = False
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+    # Stand-in for travel_bp so url_for("travel.view_offer") resolves
+    travel = Blueprint("travel", __name__)
+    travel.add_url_rule("/offer/<offer_id>", "view_offer", lambda offer_id: "")
+    app.register_blueprint(travel)
+    return app
+
+
+def make_offers(count):
+    return [{
+        "id": f"offer-{i}",
+        "price": 100 + i,
+        "depart": "2025-10-10 06:00",
+        "return": "2025-10-17 18:00",
+        "airline": ["Lufthansa", "Air France", "British Airways"][i % 3],
+        "flight_number": f"LH{100 + i}",
+        "duration": 390 + i,
+        "stops": i % 3,
+        "cabin_class": "Economy",
+        "vendor": "Travelpayouts",
+        "origin": "STO",
+        "destination": "LON",
+    } for i in range(count)]
+
+
+def time_render(app, flights, cached):
+    fragment_cache.clear()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        with app.test_request_context("/travel-ui"):
+            results_table = render_cached_fragment("_results_table.html", "bench", flights=flights, direct_only=False) if cached else None
+            render_template("travel_results.html", flights=flights, results_table=results_table, show_more=True)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main():
+    app = make_app()
+    print(f"{'offers':>7} {'full (ms)':>10} {'fragment (ms)':>14}")
+    for count in (10, 100, 1000):
+        flights = make_offers(count)
+        full = time_render(app, flights, cached=False)
+        fragment = time_render(app, flights, cached=True)
+        print(f"{count:>7} {full:>10.2f} {fragment:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
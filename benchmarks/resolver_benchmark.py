@@ -0,0 +1,66 @@
+# benchmarks/resolver_benchmark.py — accuracy and latency of place_resolver over a typo corpus
+#
+#   python benchmarks/resolver_benchmark.py [rounds]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from place_resolver import place_resolver  # noqa: E402
+
+# Hand-written misspellings and alternate names -> expected search code
+CORPUS = {
+    "Lodnon": "LON", "londn": "LON", "Pariss": "CDG", "Barcelonna": "BCN", "stockhlom": "STO",
+    "Amsterdm": "AMS", "new yrok": "NYC", "NYC": "NYC", "Tabiriz": "TBZ", "Tabriz": "TBZ",
+    "Köpenhamn": "CPH", "Kopenhagen": "CPH", "Munchen": "MUC", "Wien": "VIE", "Praha": "PRG",
+    "Heathrow": "LHR", "Gatwik": "LGW", "Istambul": "IST", "Lisabon": "LIS", "Edinbrugh": "EDI",
+    "Helsinky": "HEL", "Budapesht": "BUD", "Bruxelles": "BRU", "Zuerich": "ZRH", "Athene": "ATH",
+    "Singapur": "SIN", "Hongkong": "HKG", "Frankfort": "FRA", "Manchestr": "MAN", "Dubay": "DXB",
+}
+
+
+def mutate(word, rng):
+    """One random keyboard slip: drop, swap, double or replace a letter"""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(("drop", "swap", "double", "replace"))
+    if kind == "drop":
+        return word[:i] + word[i + 1:]
+    if kind == "swap":
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if kind == "double":
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + word[i + 1:]
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rng = random.Random(7)
+    place_resolver.search("warm up")
+
+    hits = sum(place_resolver.resolve_code(query) == code for query, code in CORPUS.items())
+    print(f"Hand corpus: {hits}/{len(CORPUS)} resolved correctly")
+
+    cities = [(c["city"], c["code"]) for c in place_resolver.reference.cities() if len(c["city"]) >= 5]
+    generated = [(mutate(city, rng), code) for _ in range(rounds) for city, code in cities]
+    hits = sum(place_resolver.resolve_code(query) == code for query, code in generated)
+    print(f"Generated typos: {hits}/{len(generated)} resolved correctly")
+
+    queries = [query for query, _ in generated]
+    start = time.perf_counter()
+    for query in queries:
+        place_resolver.search(query)
+    print(f"search(): {(time.perf_counter() - start) / len(queries) * 1e6:.1f} µs per query")
+
+    start = time.perf_counter()
+    for query in queries:
+        place_resolver.search(query[:3], prefix=True)
+    print(f"prefix search(): {(time.perf_counter() - start) / len(queries) * 1e6:.1f} µs per query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/startup_benchmark.py — time-to-first-request and per-worker memory of the gunicorn profile
+#
+# Starts gunicorn with and without preload_app, polls /health until it answers, then
+# reads every worker's RSS and PSS from /proc (Linux). PSS divides shared pages between
+# the processes mapping them, so it shows what copy-on-write sharing saves.
+#
+#   python benchmarks/startup_benchmark.py [workers]
+
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PORT = 18765
+
+
+def _kib(pid, path, field):
+    try:
+        with open(f"/proc/{pid}/{path}") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def _wait_for_health(timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{PORT}/health", timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.02)
+    return False
+
+
+def run(workers, preload):
+    env = {**os.environ, "PORT": str(PORT), "WEB_CONCURRENCY": str(workers),
+           "GUNICORN_PRELOAD": "true" if preload else "false", "GUNICORN_PROFILE": "sync"}
+    env.pop("DEFER_BACKGROUND_JOBS", None)
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", os.devnull],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not _wait_for_health():
+            print(f"preload={preload}: no answer from /health")
+            return
+        first_request = time.perf_counter() - started
+        time.sleep(1)  # let the remaining workers finish booting
+        pids = _children(server.pid)
+        rss = [_kib(pid, "status", "VmRSS") for pid in pids]
+        pss = [_kib(pid, "smaps_rollup", "Pss") for pid in pids]
+        print(f"preload={str(preload):5}  first request {first_request * 1000:7.0f} ms  "
+              f"{len(pids)} workers  RSS/worker {sum(rss) / max(1, len(rss)) / 1024:6.1f} MiB  "
+              f"PSS/worker {sum(pss) / max(1, len(pss)) / 1024:6.1f} MiB  "
+              f"master RSS {_kib(server.pid, 'status', 'VmRSS') / 1024:6.1f} MiB")
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    started = time.perf_counter()
+    import app  # noqa: F401
+    print(f"import app (create_app): {(time.perf_counter() - started) * 1000:.0f} ms")
+    for preload in (False, True):
+        run(workers, preload)
+
+
+if __name__ == "__main__":
+    main()
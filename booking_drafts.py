@@ -0,0 +1,106 @@
+# booking_drafts.py — server-side state for the booking flow, addressed by a short random token
+#
+# The selected offer is stored once, when "Book Now" is pressed, from the server's own
+# copy of the search results; every later step posts only the token. Request bodies stay
+# small, the flight is parsed once, and the price cannot be edited in the browser.
+
+import json
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+
+from config import DRAFT_DB_PATH, DRAFT_TTL
+from config import get_logger
+logger = get_logger(__name__)
+
+
+class DraftStore:
+    """Rows of zlib-compressed compact JSON that expire DRAFT_TTL seconds after their
+    last write. Each thread gets its own SQLite connection."""
+
+    def __init__(self, path=DRAFT_DB_PATH, ttl=DRAFT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS drafts ("
+                " token TEXT PRIMARY KEY,"
+                " expires_at REAL NOT NULL,"
+                " payload BLOB NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode(data):
+        return zlib.compress(json.dumps(data, separators=(",", ":"), default=str).encode("utf-8"))
+
+    def save(self, data, token=None):
+        """Store `data` under `token` (a new one if None) and return the token"""
+        if token is None:
+            token = secrets.token_urlsafe(12)
+            if secrets.randbelow(100) == 0:
+                self.prune()  # expired drafts go away without a separate job
+        self._connect().execute(
+            "INSERT OR REPLACE INTO drafts (token, expires_at, payload) VALUES (?, ?, ?)",
+            (token, time.time() + self.ttl, self._encode(data)),
+        )
+        return token
+
+    def get(self, token):
+        """The stored dict, or None for unknown or expired tokens"""
+        if not token:
+            return None
+        row = self._connect().execute(
+            "SELECT payload FROM drafts WHERE token = ? AND expires_at > ?", (token, time.time())
+        ).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def update(self, token, **changes):
+        """Merge `changes` into a live draft and extend its lifetime; returns the draft or None"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            draft = self.get(token)
+            if draft is not None:
+                draft.update(changes)
+                self.save(draft, token)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return draft
+
+    def pop(self, token):
+        """Remove and return a live draft, so a finished booking cannot be submitted twice"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            draft = self.get(token)
+            conn.execute("DELETE FROM drafts WHERE token = ?", (token,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return draft
+
+    def prune(self):
+        """Delete expired drafts; returns how many were removed"""
+        try:
+            return self._connect().execute("DELETE FROM drafts WHERE expires_at <= ?", (time.time(),)).rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Failed to prune booking drafts: {e}")
+            return 0
+
+
+booking_drafts = DraftStore()
@@ -0,0 +1,81 @@
+# booking_reference.py — collision-free booking references without a read-before-write
+#
+# Every reference encodes a number from one database-wide sequence, so two bookings can
+# never get the same one. Each process reserves a block of REFERENCE_BLOCK_SIZE numbers
+# with a single upsert on reference_counters (committed on its own connection, so a
+# failed booking never hands its block back) and then numbers bookings from memory.
+# The number is scrambled by an invertible multiplication before encoding, so consecutive
+# references don't reveal how many bookings were made in between.
+
+import os
+import threading
+from datetime import datetime
+
+from config import REFERENCE_BLOCK_SIZE
+from config import get_logger
+logger = get_logger(__name__)
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32: no I, L, O or U
+CODE_LENGTH = 8
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH  # 2**40
+_MULTIPLIER = 0x9E3779B97F  # odd, so n -> n * _MULTIPLIER is a bijection mod 2**40
+_MASK = 0x5A5A5A5A5A
+
+_RESERVE_SQL = (
+    "INSERT INTO reference_counters (name, next_value) VALUES (:name, :size) "
+    "ON CONFLICT (name) DO UPDATE SET next_value = reference_counters.next_value + :size "
+    "RETURNING next_value"
+)
+
+
+def encode(number):
+    """The CODE_LENGTH-character code of a sequence number; distinct numbers give distinct codes"""
+    if not 0 <= number < CODE_SPACE:
+        raise ValueError(f"Booking sequence exhausted: {number}")
+    value = (number * _MULTIPLIER % CODE_SPACE) ^ _MASK
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def format_reference(number, day=None):
+    """FF-YYYYMMDD-XXXXXXXX: 20 characters, the width of Booking.reference"""
+    return f"FF-{(day or datetime.now()).strftime('%Y%m%d')}-{encode(number)}"
+
+
+class ReferenceAllocator:
+    """Hands out sequence numbers from blocks reserved in the database, one block per process"""
+
+    def __init__(self, name="booking", block_size=REFERENCE_BLOCK_SIZE):
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._pid = None
+
+    def _reserve(self, engine):
+        from sqlalchemy import text  # imported here so the web modules load without SQLAlchemy
+        with engine.begin() as conn:
+            end = conn.execute(text(_RESERVE_SQL), {"name": self.name, "size": self.block_size}).scalar_one()
+        self._next, self._end, self._pid = end - self.block_size, end, os.getpid()
+        logger.debug(f"Reserved {self.name} numbers {self._next}..{end - 1}")
+
+    def next_number(self, engine=None):
+        with self._lock:
+            # A forked worker must not reuse the block its parent was handing out
+            if self._next >= self._end or self._pid != os.getpid():
+                if engine is None:
+                    from database import db
+                    engine = db.engine
+                self._reserve(engine)
+            number = self._next
+            self._next += 1
+            return number
+
+    def next_reference(self, engine=None):
+        return format_reference(self.next_number(engine))
+
+
+booking_references = ReferenceAllocator()
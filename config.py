@@ -1,9 +1,10 @@
 
 import logging
 import os
+import tempfile
 from dotenv import load_dotenv
 
-# Load .env file
+# Load .env file; the only place that does, every other module reads settings from here
 load_dotenv()
 
 def get_env_var(name):
@@ -12,6 +13,12 @@ def get_env_var(name):
         raise RuntimeError(f"{name} is not set in the environment")
     return value
 
+def get_optional_env_var(name, default):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value
+
 # === Local Development Settings ===
 FLASK_APP = get_env_var("FLASK_APP")
 FLASK_ENV = get_env_var("FLASK_ENV")
@@ -29,12 +36,132 @@ HOST = get_env_var("HOST")
 USER_IP = get_env_var("USER_IP")
 USE_REAL_API = get_env_var("USE_REAL_API").lower() == "true"
 
+# === Search Result Cache ===
+SEARCH_CACHE_TTL = int(get_optional_env_var("SEARCH_CACHE_TTL", 900))  # seconds
+SEARCH_CACHE_MAX_ENTRIES = int(get_optional_env_var("SEARCH_CACHE_MAX_ENTRIES", 512))
+
+# === Warm Cache Scheduler ===
+WARM_CACHE_ENABLED = get_optional_env_var("WARM_CACHE_ENABLED", "false").lower() == "true"
+WARM_CACHE_INTERVAL = int(get_optional_env_var("WARM_CACHE_INTERVAL", 300))  # seconds between cycles
+WARM_CACHE_MAX_CALLS = int(get_optional_env_var("WARM_CACHE_MAX_CALLS", 20))  # upstream budget per cycle
+WARM_CACHE_COVERAGE = float(get_optional_env_var("WARM_CACHE_COVERAGE", 0.8))  # share of traffic to keep warm
+WARM_CACHE_TRACKED_ROUTES = int(get_optional_env_var("WARM_CACHE_TRACKED_ROUTES", 1000))
+# Every worker adds its searches to one SQLite file; only the worker holding the lock file runs cycles
+WARM_CACHE_DB_PATH = get_optional_env_var("WARM_CACHE_DB_PATH", "warm_cache.db")
+WARM_CACHE_LOCK_FILE = get_optional_env_var(
+    "WARM_CACHE_LOCK_FILE", os.path.join(tempfile.gettempdir(), "flightfinder_warm_cache.lock")
+)
+WARM_CACHE_FLUSH_INTERVAL = float(get_optional_env_var("WARM_CACHE_FLUSH_INTERVAL", 5))  # seconds between count flushes
+
+# === Upstream Rate Limiter (shared by all workers on this host) ===
+UPSTREAM_RATE_LIMIT = float(get_optional_env_var("UPSTREAM_RATE_LIMIT", 5))  # requests per second
+UPSTREAM_BURST = int(get_optional_env_var("UPSTREAM_BURST", 10))
+UPSTREAM_RATE_LIMIT_WAIT = float(get_optional_env_var("UPSTREAM_RATE_LIMIT_WAIT", 2))  # max seconds to wait for a token
+UPSTREAM_BUCKET_FILE = get_optional_env_var(
+    "UPSTREAM_BUCKET_FILE", os.path.join(tempfile.gettempdir(), "flightfinder_upstream.bucket")
+)
+
+# === Upstream Circuit Breaker ===
+BREAKER_FAILURE_RATE = float(get_optional_env_var("BREAKER_FAILURE_RATE", 0.5))
+BREAKER_MIN_CALLS = int(get_optional_env_var("BREAKER_MIN_CALLS", 5))
+BREAKER_WINDOW = int(get_optional_env_var("BREAKER_WINDOW", 60))  # seconds of history considered
+BREAKER_SLOW_CALL_SECONDS = float(get_optional_env_var("BREAKER_SLOW_CALL_SECONDS", 25))
+BREAKER_RESET_TIMEOUT = int(get_optional_env_var("BREAKER_RESET_TIMEOUT", 30))  # seconds before half-open
+
+# === Last-Known-Good Snapshots ===
+SNAPSHOT_ENABLED = get_optional_env_var("SNAPSHOT_ENABLED", "true").lower() == "true"
+SNAPSHOT_DB_PATH = get_optional_env_var("SNAPSHOT_DB_PATH", "flight_snapshots.db")
+SNAPSHOT_MAX_AGE = int(get_optional_env_var("SNAPSHOT_MAX_AGE", 7 * 24 * 3600))  # never serve older snapshots
+SNAPSHOT_STALE_WHILE_REVALIDATE = get_optional_env_var("SNAPSHOT_STALE_WHILE_REVALIDATE", "true").lower() == "true"
+SEARCH_DEADLINE_SECONDS = float(get_optional_env_var("SEARCH_DEADLINE_SECONDS", 8))  # then serve the snapshot
+SEARCH_REFRESH_WORKERS = int(get_optional_env_var("SEARCH_REFRESH_WORKERS", 4))
+MOCK_UPSTREAM_LATENCY = float(get_optional_env_var("MOCK_UPSTREAM_LATENCY", 0))  # seconds, for load tests
+
+# === Template Rendering ===
+JINJA_BYTECODE_CACHE_DIR = get_optional_env_var(
+    "JINJA_BYTECODE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "flightfinder_jinja")
+)
+FRAGMENT_CACHE_MAX_ENTRIES = int(get_optional_env_var("FRAGMENT_CACHE_MAX_ENTRIES", 256))
+
+# === Batch Search API ===
+BATCH_SEARCH_WORKERS = int(get_optional_env_var("BATCH_SEARCH_WORKERS", 8))  # concurrent searches per process
+BATCH_SEARCH_MAX_ITEMS = int(get_optional_env_var("BATCH_SEARCH_MAX_ITEMS", 200))
+
+# === Explore ("anywhere") Search ===
+EXPLORE_LIVE_BUDGET = int(get_optional_env_var("EXPLORE_LIVE_BUDGET", 10))  # live searches per explore
+EXPLORE_WORKERS = int(get_optional_env_var("EXPLORE_WORKERS", 4))
+EXPLORE_MAX_DAYS = int(get_optional_env_var("EXPLORE_MAX_DAYS", 14))
+MIN_PRICE_INDEX_TTL = int(get_optional_env_var("MIN_PRICE_INDEX_TTL", 6 * 3600))  # seconds
+
+# === Price History ===
+PRICE_HISTORY_ENABLED = get_optional_env_var("PRICE_HISTORY_ENABLED", "true").lower() == "true"
+PRICE_HISTORY_DIR = get_optional_env_var("PRICE_HISTORY_DIR", "price_history")
+PRICE_HISTORY_COMPACT_INTERVAL = int(get_optional_env_var("PRICE_HISTORY_COMPACT_INTERVAL", 600))  # seconds
+PRICE_HISTORY_HOURLY_WINDOW = int(get_optional_env_var("PRICE_HISTORY_HOURLY_WINDOW", 2 * 86400))  # then daily
+PRICE_HISTORY_RETENTION_DAYS = int(get_optional_env_var("PRICE_HISTORY_RETENTION_DAYS", 30))  # after travel date
+
+# === Price Alerts ===
+ALERTS_ENABLED = get_optional_env_var("ALERTS_ENABLED", "true").lower() == "true"
+ALERTS_DB_PATH = get_optional_env_var("ALERTS_DB_PATH", "price_alerts.db")
+WATCH_MAX_DAYS = int(get_optional_env_var("WATCH_MAX_DAYS", 60))  # longest date range per watch
+WATCH_SYNC_INTERVAL = int(get_optional_env_var("WATCH_SYNC_INTERVAL", 30))  # seconds between index syncs
+
+# === Search Job Queue (web tier enqueues, search_worker.py executes) ===
+SEARCH_QUEUE_ENABLED = get_optional_env_var("SEARCH_QUEUE_ENABLED", "false").lower() == "true"
+SEARCH_QUEUE_DB_PATH = get_optional_env_var("SEARCH_QUEUE_DB_PATH", "search_queue.db")
+SEARCH_QUEUE_WAIT = float(get_optional_env_var("SEARCH_QUEUE_WAIT", 3))  # seconds a web request waits
+SEARCH_JOB_TIMEOUT = int(get_optional_env_var("SEARCH_JOB_TIMEOUT", 120))  # then a running job is requeued
+SEARCH_WORKER_PROCESSES = int(get_optional_env_var("SEARCH_WORKER_PROCESSES", 4))
+JOB_POLL_MAX_WAIT = float(get_optional_env_var("JOB_POLL_MAX_WAIT", 1.5))  # longest a job poll holds a web worker
+JOB_POLL_INTERVAL = float(get_optional_env_var("JOB_POLL_INTERVAL", 1))  # seconds clients wait between polls
+
+# === Reference Data (compiled airports/cities/airlines, memory-mapped per worker) ===
+REFERENCE_DATA_PATH = get_optional_env_var("REFERENCE_DATA_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "reference_data.bin"))
+AUTOCOMPLETE_LIMIT = int(get_optional_env_var("AUTOCOMPLETE_LIMIT", 10))  # place suggestions per keystroke
+AUTOCOMPLETE_MAX_AGE = int(get_optional_env_var("AUTOCOMPLETE_MAX_AGE", 86400))  # for requests naming the current data version
+
+# === Result Deduplication ===
+DEDUP_MAX_SEEN = int(get_optional_env_var("DEDUP_MAX_SEEN", 10000))  # itinerary ids remembered while merging
+
+# === Multi-City Search ===
+MULTI_CITY_MAX_SEGMENTS = int(get_optional_env_var("MULTI_CITY_MAX_SEGMENTS", 6))
+MULTI_CITY_LEG_RESULTS = int(get_optional_env_var("MULTI_CITY_LEG_RESULTS", 50))  # cheapest offers per leg fed to the merge
+MULTI_CITY_MIN_CONNECTION = int(get_optional_env_var("MULTI_CITY_MIN_CONNECTION", 120))  # minutes between separately ticketed legs
+
+# === Self-Transfer Connections ===
+SELF_TRANSFER_ENABLED = get_optional_env_var("SELF_TRANSFER_ENABLED", "true").lower() == "true"
+SELF_TRANSFER_MIN_CONNECTION = int(get_optional_env_var("SELF_TRANSFER_MIN_CONNECTION", 90))  # minutes, incl. bag re-check
+SELF_TRANSFER_MAX_WAIT = int(get_optional_env_var("SELF_TRANSFER_MAX_WAIT", 24 * 60))  # longest layover in minutes
+SELF_TRANSFER_MAX_LAYOVERS = int(get_optional_env_var("SELF_TRANSFER_MAX_LAYOVERS", 2))
+CONNECTION_GRAPH_TTL = int(get_optional_env_var("CONNECTION_GRAPH_TTL", 300))  # seconds before the graph is rebuilt
+
+# === Booking Drafts ===
+DRAFT_DB_PATH = get_optional_env_var("DRAFT_DB_PATH", "booking_drafts.db")
+DRAFT_TTL = int(get_optional_env_var("DRAFT_TTL", 1800))  # seconds a booking flow may sit idle
+SHOWN_OFFERS_LIMIT = int(get_optional_env_var("SHOWN_OFFERS_LIMIT", 200))  # offers kept per visitor for "Book Now"
+
+# === Serving ===
+DATABASE_URL = get_optional_env_var("DATABASE_URL", None)
+# Set by gunicorn.conf.py when preloading: background threads must start in each worker after the fork
+DEFER_BACKGROUND_JOBS = get_optional_env_var("DEFER_BACKGROUND_JOBS", "false").lower() == "true"
+ASGI_THREADS = int(get_optional_env_var("ASGI_THREADS", 32))  # concurrent requests per uvicorn worker
+
+# === Profiling ===
+PROFILING_SECRET = get_optional_env_var("PROFILING_SECRET", None)  # unset disables profiling and /admin routes
+PROFILE_SAMPLE_INTERVAL = float(get_optional_env_var("PROFILE_SAMPLE_INTERVAL", 0.005))  # seconds between samples
+SLOW_REQUEST_THRESHOLD = float(get_optional_env_var("SLOW_REQUEST_THRESHOLD", 2.0))  # seconds
+SLOW_REQUEST_BUFFER = int(get_optional_env_var("SLOW_REQUEST_BUFFER", 50))  # slow requests kept for /admin
+
+# === Booking History ===
+HISTORY_PAGE_SIZE = int(get_optional_env_var("HISTORY_PAGE_SIZE", 50))  # summary rows per page
+REFERENCE_BLOCK_SIZE = int(get_optional_env_var("REFERENCE_BLOCK_SIZE", 1000))  # booking numbers reserved per database round trip
+
 
 # === Logging Configuration ===
 log_level = logging.DEBUG if DEBUG_MODE else logging.INFO
 
 def setup_logging():
-    """Configure logging for the application"""
+    """Configure logging for the application; later calls are no-ops"""
     log_level = logging.DEBUG if DEBUG_MODE else logging.INFO
 
     logging.basicConfig(
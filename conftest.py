@@ -0,0 +1,15 @@
+# conftest.py: keep tests from writing snapshots, price history or alerts into the working tree
+# (and from composing self-transfers out of whatever other tests left in the cache)
+
+import pytest
+
+import flight_search
+
+
+@pytest.fixture(autouse=True)
+def isolated_search_storage(monkeypatch):
+    monkeypatch.setattr(flight_search, "SNAPSHOT_ENABLED", False)
+    monkeypatch.setattr(flight_search, "PRICE_HISTORY_ENABLED", False)
+    monkeypatch.setattr(flight_search, "ALERTS_ENABLED", False)
+    monkeypatch.setattr(flight_search, "SELF_TRANSFER_ENABLED", False)
+    monkeypatch.setattr("explore.SNAPSHOT_ENABLED", False)
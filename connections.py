@@ -0,0 +1,224 @@
+# connections.py — self-transfer itineraries composed from separately ticketed flights
+#
+# Cached one-way results of one cabin and party (plus the mock inventory when there is
+# no real API) form a directed graph: airports are nodes, every bookable flight is an
+# edge with a departure time, an arrival time and a price. Outgoing edges are kept
+# sorted by departure, so the flights that can follow an arrival (after the minimum connection time, within the longest allowed wait) are one
+# bisect away. A best-first search over (airport, arrival time) labels finds the k
+# cheapest paths; a label is dropped once k cheaper labels at the same airport arrived
+# no later with no more layovers, since every continuation of it is available to them too.
+
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from search_cache import search_cache, parse_search_key
+from itinerary import itinerary_id, make_leg
+from ranking import duration_minutes, price
+from facets import airline_code
+from config import SELF_TRANSFER_MIN_CONNECTION, SELF_TRANSFER_MAX_WAIT, SELF_TRANSFER_MAX_LAYOVERS
+from config import CONNECTION_GRAPH_TTL, FEATURED_FLIGHT_LIMIT, USE_REAL_API
+from config import get_logger
+logger = get_logger(__name__)
+
+Edge = namedtuple("Edge", ["depart", "arrive", "origin", "destination", "price", "offer"])
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_minutes(value):
+    """Minutes since the epoch for a datetime or an ISO-like "YYYY-MM-DD HH:MM" string, or None"""
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value or "").strip())
+        except ValueError:
+            return None
+    return int((value.replace(tzinfo=None) - _EPOCH).total_seconds() // 60)
+
+
+def from_minutes(minutes):
+    return (_EPOCH + timedelta(minutes=minutes)).strftime("%Y-%m-%d %H:%M")
+
+
+def make_edge(offer, origin=None, destination=None):
+    """Edge for one bookable flight, or None when its times or price are unknown"""
+    depart = to_minutes(offer.get("depart") or offer.get("departure"))
+    origin = origin or offer.get("origin")
+    destination = destination or offer.get("destination")
+    cost = price(offer)
+    if depart is None or not origin or not destination or cost == float("inf"):
+        return None
+    arrive = to_minutes(offer.get("arrive"))
+    if arrive is None:
+        minutes = duration_minutes(offer)
+        if minutes == float("inf"):
+            return None
+        arrive = depart + int(minutes)
+    return Edge(depart, arrive, origin.upper(), destination.upper(), cost, offer)
+
+
+class ConnectionGraph:
+    def __init__(self, edges=()):
+        adjacency = {}
+        for edge in edges:
+            adjacency.setdefault(edge.origin, []).append(edge)
+        self._edges, self._departs = {}, {}
+        for origin, outgoing in adjacency.items():
+            outgoing.sort(key=lambda e: e.depart)
+            self._edges[origin] = outgoing
+            self._departs[origin] = [e.depart for e in outgoing]
+        self.size = sum(len(outgoing) for outgoing in self._edges.values())
+
+    def departures(self, airport, earliest, latest):
+        """Edges leaving `airport` with earliest <= departure <= latest"""
+        departs = self._departs.get(airport)
+        if not departs:
+            return ()
+        return self._edges[airport][bisect_left(departs, earliest):bisect_right(departs, latest)]
+
+    def k_cheapest_paths(self, origin, destination, earliest, latest, k=FEATURED_FLIGHT_LIMIT,
+                         max_layovers=SELF_TRANSFER_MAX_LAYOVERS, min_connection=SELF_TRANSFER_MIN_CONNECTION,
+                         max_wait=SELF_TRANSFER_MAX_WAIT, min_legs=1):
+        """Up to `k` (price, [Edge, ...]) paths of at least `min_legs` flights, cheapest first,
+        leaving `origin` between `earliest` and `latest` (minutes since the epoch); no airport is visited twice"""
+        origin, destination = origin.upper(), destination.upper()
+        heap, counter = [], 0
+        for edge in self.departures(origin, earliest, latest):
+            heap.append((edge.price, counter, edge.arrive, edge.destination, (edge,)))
+            counter += 1
+        heapq.heapify(heap)
+
+        settled = {}  # airport -> [(arrival, legs)] of labels already expanded
+        paths = []
+        while heap and len(paths) < k:
+            cost, _, arrive, airport, path = heapq.heappop(heap)
+            if airport == destination:
+                if len(path) >= min_legs:
+                    paths.append((cost, list(path)))
+                continue
+            if len(path) > max_layovers:
+                continue
+            labels = settled.setdefault(airport, [])
+            if sum(1 for at, legs in labels if at <= arrive and legs <= len(path)) >= k:
+                continue  # k cheaper paths got here sooner; they can take any flight this one could
+            labels.append((arrive, len(path)))
+
+            visited = {origin, *(edge.destination for edge in path)}
+            for edge in self.departures(airport, arrive + min_connection, arrive + max_wait):
+                if edge.destination in visited:
+                    continue
+                heapq.heappush(heap, (cost + edge.price, counter, edge.arrive, edge.destination, path + (edge,)))
+                counter += 1
+        return paths
+
+
+def compose_offer(cost, edges, cabin_class="economy"):
+    """One self-transfer offer from a path of separately ticketed flights"""
+    first, last = edges[0], edges[-1]
+    legs = [make_leg(airline_code(e.offer), e.offer.get("flight_number"), from_minutes(e.depart), e.origin, e.destination)
+            for e in edges]
+    return {
+        "id": itinerary_id(legs, cabin_class),
+        "airline": airline_code(first.offer),
+        "flight_number": first.offer.get("flight_number", "N/A"),
+        "depart": from_minutes(first.depart),
+        "arrive": from_minutes(last.arrive),
+        "return": None,
+        "origin": first.origin,
+        "destination": last.destination,
+        "duration": last.arrive - first.depart,
+        "stops": len(edges) - 1 + sum(e.offer.get("stops") or 0 for e in edges),
+        "price": round(cost, 2),
+        "currency": first.offer.get("currency"),
+        "vendor": "Self-transfer",
+        "link": first.offer.get("link") or first.offer.get("deep_link"),
+        "trip_type": "one-way",
+        "cabin_class": cabin_class,
+        "separate_tickets": True,
+        "layovers": [{"airport": a.destination, "minutes": b.depart - a.arrive} for a, b in zip(edges, edges[1:])],
+        "segments": [e.offer for e in edges],
+    }
+
+
+def inventory_edges(cabin_class="economy", adults=1, children=0, infants=0):
+    """Edges from every fresh one-way search in the cache for this cabin and party, plus the
+    mock inventory when there is no real API. Prices depend on both, so a business or
+    3-adult fare never ends up in an economy single-adult itinerary."""
+    fare = (cabin_class, adults, children, infants)
+    edges = []
+    for key, flights in search_cache.items():
+        try:
+            spec = parse_search_key(key)
+        except ValueError:
+            continue  # multi-city and other composite entries
+        if spec.trip_type != "one-way" or (spec.cabin_class, spec.adults, spec.children, spec.infants) != fare:
+            continue
+        edges.extend(make_edge(f, spec.origin_code, spec.destination_code) for f in flights)
+
+    if not USE_REAL_API:
+        # The mock searches answer every cabin and party with these same flights
+        from mock_data import mock_kiwi_response
+        for flight in mock_kiwi_response():
+            edges.append(make_edge(flight))
+            if flight.get("return"):
+                edges.append(make_edge({**flight, "departure": flight["return"]}, flight["destination"], flight["origin"]))
+    return [edge for edge in edges if edge is not None]
+
+
+class ConnectionEngine:
+    """Process-wide graphs, one per cabin and party, each rebuilt from the cache and inventory
+    at most every CONNECTION_GRAPH_TTL seconds"""
+
+    def __init__(self, load_edges=inventory_edges, ttl=CONNECTION_GRAPH_TTL):
+        self.load_edges = load_edges
+        self.ttl = ttl
+        self._graphs = {}  # (cabin_class, adults, children, infants) -> (ConnectionGraph, built_at)
+        self._lock = threading.Lock()
+
+    def graph(self, cabin_class="economy", adults=1, children=0, infants=0):
+        fare = (cabin_class, adults, children, infants)
+        with self._lock:
+            now = time.time()
+            self._graphs = {key: entry for key, entry in self._graphs.items() if now - entry[1] <= self.ttl}
+            if fare not in self._graphs:
+                started = time.perf_counter()
+                self._graphs[fare] = (ConnectionGraph(self.load_edges(*fare)), now)
+                logger.info(f"Connection graph for {fare} built: {self._graphs[fare][0].size} flights "
+                            f"in {time.perf_counter() - started:.2f}s")
+            return self._graphs[fare][0]
+
+    def search(self, origin, destination, date_str, k=FEATURED_FLIGHT_LIMIT, cabin_class="economy",
+               adults=1, children=0, infants=0):
+        """The k cheapest self-transfer offers leaving on `date_str`, cheapest first"""
+        earliest = to_minutes(f"{date_str} 00:00")
+        if earliest is None:
+            return []
+        # Single flights are left out: a direct flight would have been a search result already
+        graph = self.graph(cabin_class, adults, children, infants)
+        paths = graph.k_cheapest_paths(origin, destination, earliest, earliest + 24 * 60 - 1, k=k, min_legs=2)
+        return [compose_offer(cost, edges, cabin_class) for cost, edges in paths]
+
+    def search_spec(self, spec, k=FEATURED_FLIGHT_LIMIT):
+        """Self-transfer offers for a search spec; round trips pair the cheapest ways out and back"""
+        fare = (spec.cabin_class, spec.adults, spec.children, spec.infants)
+        outbound = self.search(spec.origin_code, spec.destination_code, spec.date_from_str, k, *fare)
+        if spec.trip_type != "round-trip" or not outbound:
+            return outbound
+        from multi_city import MultiCityLeg, combine_offers, k_best_combinations
+
+        inbound = self.search(spec.destination_code, spec.origin_code, spec.date_to_str, k, *fare)
+        legs = [MultiCityLeg(spec.origin_code, spec.destination_code, spec.date_from_str),
+                MultiCityLeg(spec.destination_code, spec.origin_code, spec.date_to_str)]
+        offers = []
+        for total, pair in k_best_combinations([outbound, inbound], k):
+            offer = combine_offers(legs, pair, total, spec.cabin_class)
+            offer.update(trip_type="round-trip", vendor="Self-transfer", destination=spec.destination_code,
+                         **{"return": pair[1]["depart"]})
+            offers.append(offer)
+        return offers
+
+
+connection_engine = ConnectionEngine()
@@ -1,22 +1,11 @@
 # database.py
 
-import os
-from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-# Load environment variables from .env
-load_dotenv()
+from config import DATABASE_URL
 
-# Initialize Flask SQLAlchemy
+# Initialize Flask SQLAlchemy; the engine is created per app by db.init_app
 db = SQLAlchemy()
 
-# Get the DATABASE_URL from environment
-DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set in environment variables")
-
-# Create SQLAlchemy engine and session factory
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
\ No newline at end of file
@@ -1,33 +1,50 @@
 # db.py
 
-from flask_sqlalchemy import SQLAlchemy
+import json
 from datetime import datetime
-from dotenv import load_dotenv
-import os
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 
-from database import db
-from models import Booking
+from database import db  # raises if DATABASE_URL is not set
+from models import Booking, BookingSummary
+from config import HISTORY_PAGE_SIZE
 
 
-# === Load environment variables ===
-load_dotenv()
-
-# === Ensure DATABASE_URL is set ===
-if not os.getenv("DATABASE_URL"):
-    raise ValueError("DATABASE_URL environment variable is not set.")
-
 # --------------------------
 # Booking Helper Functions
 # --------------------------
 
-def get_booking_history():
-    return Booking.query.order_by(Booking.timestamp.desc()).all()
+def summary_fields(flight):
+    """Pre-formatted history columns for a booked flight dict"""
+    def minute(value):
+        return str(value or "")[:16].replace("T", " ")
+
+    route = f"{flight.get('origin') or '?'} → {flight.get('destination') or '?'}"
+    dates = minute(flight.get("departure_date") or flight.get("depart"))
+    if flight.get("return_date"):
+        dates = f"{dates} → {minute(flight['return_date'])}"
+    try:
+        price = float(flight.get("price"))
+        price_label = f"{price:.2f} {flight.get('currency') or ''}".strip()
+    except (TypeError, ValueError):
+        price, price_label = None, "—"
+    airline = " ".join(str(part) for part in (flight.get("airline"), flight.get("flight_number")) if part)
+    return {"route": route[:40], "dates": dates[:40], "airline": airline[:60] or "—", "price": price, "price_label": price_label}
 
 
-def save_booking(reference, passenger, flight_json):
-    from models import Booking  # Lazy import to avoid circular dependencies
+def make_summary(booking, flight):
+    return BookingSummary(
+        booking=booking,
+        reference=booking.reference,
+        passenger_name=booking.passenger_name,
+        passenger_email=booking.passenger_email,
+        passenger_phone=booking.passenger_phone,
+        booked_at=booking.timestamp,
+        **summary_fields(flight),
+    )
+
 
+def save_booking(reference, passenger, flight_json):
     try:
         new_booking = Booking(
             reference=reference,
@@ -38,6 +55,8 @@ def save_booking(reference, passenger, flight_json):
             timestamp=datetime.utcnow()
         )
         db.session.add(new_booking)
+        # Same transaction: the summary row exists exactly when the booking does
+        db.session.add(make_summary(new_booking, json.loads(flight_json)))
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -46,10 +65,39 @@ def save_booking(reference, passenger, flight_json):
     finally:
         db.session.close()
 
-def get_booking_history():
-    from models import Booking
+
+def get_booking_history(page=1, page_size=HISTORY_PAGE_SIZE):
+    """One page of summary rows, newest first, and whether there is a next page"""
+    columns = [getattr(BookingSummary, name) for name in BookingSummary.HISTORY_COLUMNS]
+    query = (select(*columns)
+             .order_by(BookingSummary.booked_at.desc(), BookingSummary.id.desc())
+             .limit(page_size + 1).offset((page - 1) * page_size))
     try:
-        return Booking.query.order_by(Booking.timestamp.desc()).all()
+        rows = db.session.execute(query).all()
     except SQLAlchemyError as e:
         print(f"Error fetching booking history: {e}")
-        return []
\ No newline at end of file
+        return [], False
+    return rows[:page_size], len(rows) > page_size
+
+
+def backfill_booking_summaries(batch_size=1000):
+    """Create the summary rows of bookings saved before the table existed; returns how many"""
+    created, last_id = 0, 0
+    while True:
+        batch = db.session.execute(
+            select(Booking)
+            .outerjoin(BookingSummary, BookingSummary.booking_id == Booking.id)
+            .where(BookingSummary.id.is_(None), Booking.id > last_id)
+            .order_by(Booking.id).limit(batch_size)
+        ).scalars().all()
+        if not batch:
+            return created
+        for booking in batch:
+            try:
+                flight = json.loads(booking.flight_data)
+            except ValueError:
+                flight = {}
+            db.session.add(make_summary(booking, flight if isinstance(flight, dict) else {}))
+        db.session.commit()
+        created += len(batch)
+        last_id = batch[-1].id
@@ -0,0 +1,109 @@
+# explore.py — "where can I fly cheaply?" across every airport in the reference data
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from flight_search import search_flights
+from price_index import min_price_index
+from reference_data import reference_data
+from search_cache import search_cache, make_search_spec, make_search_key
+from snapshot_store import snapshot_store
+from config import EXPLORE_LIVE_BUDGET, EXPLORE_WORKERS, EXPLORE_MAX_DAYS, SNAPSHOT_ENABLED
+from config import get_logger
+logger = get_logger(__name__)
+
+_explore_pool = ThreadPoolExecutor(max_workers=EXPLORE_WORKERS, thread_name_prefix="explore")
+
+
+def _date_range(date_from, date_to):
+    start = datetime.strptime(date_from, "%Y-%m-%d").date()
+    end = datetime.strptime(date_to or date_from, "%Y-%m-%d").date()
+    days = min((end - start).days, EXPLORE_MAX_DAYS - 1)
+    return [(start + timedelta(days=i)).isoformat() for i in range(max(days, 0) + 1)]
+
+
+def _known_price(spec):
+    """Cheapest price we already have without calling the upstream: index, then cache, then snapshot"""
+    entry = min_price_index.lookup(spec)
+    if entry:
+        return entry
+
+    key = make_search_key(spec)
+    flights = search_cache.get(key)
+    if flights:
+        return min_price_index.record(spec, flights, source="cache")
+    if SNAPSHOT_ENABLED:
+        flights, _ = snapshot_store.load(key)
+        if flights:
+            return min_price_index.record(spec, flights, source="snapshot")
+    return None
+
+
+def explore(origin, date_from, date_to=None, adults=1, cabin_class="economy", live_budget=EXPLORE_LIVE_BUDGET):
+    """Rank destinations by the cheapest one-way departure within [date_from, date_to].
+
+    Known prices are used first; at most `live_budget` missing (destination, day)
+    pairs are searched live, destinations with no price at all going first."""
+    origin = origin.upper()
+    airports = reference_data.airports()
+    origin_city = next((a["city"] for a in airports if a["iata"] == origin), None)
+    destinations = [a for a in airports if a["iata"] != origin and a["city"] != origin_city]
+    days = _date_range(date_from, date_to)
+
+    best = {}  # iata -> ranked entry
+    gaps = []
+
+    def keep_cheapest(airport, day, entry):
+        current = best.get(airport["iata"])
+        if current is None or entry["price"] < current["price"]:
+            best[airport["iata"]] = {
+                "destination": airport["iata"],
+                "city": airport["city"],
+                "name": airport["name"],
+                "date": day,
+                "price": entry["price"],
+                "currency": entry.get("currency"),
+                "airline": entry.get("airline"),
+                "source": entry["source"],
+            }
+
+    def spec_for(airport, day):
+        return make_search_spec(origin, airport["iata"], day, "", "one-way", adults, 0, 0, cabin_class)
+
+    for airport in destinations:
+        for day in days:
+            entry = _known_price(spec_for(airport, day))
+            if entry:
+                keep_cheapest(airport, day, entry)
+            else:
+                gaps.append((airport, day))
+
+    gaps.sort(key=lambda gap: gap[0]["iata"] in best)
+    live, skipped = gaps[:live_budget], gaps[live_budget:]
+    futures = {
+        _explore_pool.submit(search_flights, origin, airport["iata"], day, "", "one-way",
+                             adults=adults, cabin_class=cabin_class, track=False): (airport, day)
+        for airport, day in live
+    }
+    for future in as_completed(futures):
+        airport, day = futures[future]
+        try:
+            flights = future.result()
+        except Exception as e:
+            logger.warning(f"Explore search {origin}->{airport['iata']} on {day} failed: {e}")
+            continue
+        spec = spec_for(airport, day)
+        entry = min_price_index.lookup(spec) or min_price_index.record(spec, flights)
+        if entry:
+            keep_cheapest(airport, day, entry)
+
+    ranked = sorted(best.values(), key=lambda item: item["price"])
+    logger.info(f"Explore from {origin}: {len(ranked)} priced destinations, {len(live)} live searches")
+    return {
+        "origin": origin,
+        "date_from": days[0],
+        "date_to": days[-1],
+        "destinations": ranked,
+        "live_searches": len(live),
+        "unpriced": len(skipped),
+    }
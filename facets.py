@@ -0,0 +1,167 @@
+# facets.py — filter cached search results and count facet values in one pass
+#
+# Facet counts are disjunctive: the count shown next to a value is how many offers
+# would match if that facet's own filter were changed while the others stay as they
+# are. An offer failing no filter counts everywhere; an offer failing exactly one
+# filter counts only towards that filter's facet; anything else is skipped.
+
+from ranking import departure_minutes, duration_minutes, price
+from config import get_logger
+logger = get_logger(__name__)
+
+DEPARTURE_BUCKETS = (("night", 0, 6 * 60), ("morning", 6 * 60, 12 * 60),
+                     ("afternoon", 12 * 60, 18 * 60), ("evening", 18 * 60, 24 * 60))
+FACETS = ("stops", "airlines", "price", "depart", "duration")
+FILTER_PARAMS = ("stops", "airlines", "price_min", "price_max", "depart_after", "depart_before",
+                 "arrive_after", "arrive_before", "max_duration")
+
+
+def airline_code(flight):
+    """Marketing carrier code from the API's "airline" or the mock's "LH - Lufthansa" list entry"""
+    value = flight.get("airline") or (flight.get("airlines") or ["Unknown"])[0]
+    return str(value).split(" - ")[0].strip()
+
+
+def arrival_minutes(flight):
+    """Minutes after midnight of the final arrival, or None when the offer does not say"""
+    return departure_minutes({"depart": flight.get("arrive")})
+
+
+def _clock(value):
+    """Minutes after midnight for an "HH:MM" string"""
+    hours, minutes = value.split(":")
+    result = int(hours) * 60 + int(minutes)
+    if not 0 <= result <= 24 * 60:
+        raise ValueError(value)
+    return result
+
+
+def _in_window(minutes, after, before):
+    if minutes is None:
+        return True  # unknown times are not filtered out
+    if after is not None and minutes < after:
+        return False
+    return before is None or minutes <= before
+
+
+def parse_filters(args):
+    """Filters from query args; returns (filters, errors). Absent params are not filters."""
+    filters, errors = {}, []
+
+    def number(name, cast=float):
+        raw = str(args.get(name, "") or "").strip()
+        if not raw:
+            return None
+        try:
+            return cast(raw)
+        except ValueError:
+            errors.append(f"{name} must be a number.")
+            return None
+
+    def clock(name):
+        raw = str(args.get(name, "") or "").strip()
+        if not raw:
+            return None
+        try:
+            return _clock(raw)
+        except ValueError:
+            errors.append(f"{name} must be HH:MM.")
+            return None
+
+    raw_stops = str(args.get("stops", "") or "").strip()
+    if raw_stops:
+        try:
+            stops = {int(s) for s in raw_stops.split(",") if s.strip()}
+        except ValueError:
+            stops = set()
+        if stops:
+            filters["stops"] = stops
+        else:
+            errors.append("stops must be a comma-separated list of numbers, e.g. 0,1.")
+    raw_airlines = str(args.get("airlines", "") or "").strip()
+    if raw_airlines:
+        filters["airlines"] = {a.strip().upper() for a in raw_airlines.split(",") if a.strip()}
+
+    price_min, price_max = number("price_min"), number("price_max")
+    if price_min is not None or price_max is not None:
+        filters["price"] = (price_min, price_max)
+    depart = (clock("depart_after"), clock("depart_before"))
+    if depart != (None, None):
+        filters["depart"] = depart
+    arrive = (clock("arrive_after"), clock("arrive_before"))
+    if arrive != (None, None):
+        filters["arrive"] = arrive
+    max_duration = number("max_duration", int)
+    if max_duration is not None:
+        filters["duration"] = max_duration
+    return filters, errors
+
+
+def _tests(filters):
+    """filter name -> predicate, for the active filters only"""
+    tests = {}
+    if "stops" in filters:
+        # "2" selects two or more stops, matching the form's "2+ Stops"
+        wanted = filters["stops"]
+        top = max(wanted)
+        tests["stops"] = lambda f: (f.get("stops") or 0) in wanted or (top >= 2 and (f.get("stops") or 0) >= top)
+    if "airlines" in filters:
+        tests["airlines"] = lambda f: airline_code(f).upper() in filters["airlines"]
+    if "price" in filters:
+        low, high = filters["price"]
+        tests["price"] = lambda f: (low is None or price(f) >= low) and (high is None or price(f) <= high)
+    if "depart" in filters:
+        tests["depart"] = lambda f: _in_window(departure_minutes(f), *filters["depart"])
+    if "arrive" in filters:
+        tests["arrive"] = lambda f: _in_window(arrival_minutes(f), *filters["arrive"])
+    if "duration" in filters:
+        tests["duration"] = lambda f: duration_minutes(f) <= filters["duration"]
+    return tests
+
+
+def _empty_facets():
+    return {
+        "stops": {},
+        "airlines": {},
+        "price": {"min": None, "max": None},
+        "depart": {name: 0 for name, _, _ in DEPARTURE_BUCKETS},
+        "duration": {"min": None, "max": None},
+    }
+
+
+def _count(facets, facet, flight):
+    if facet == "stops":
+        key = str(flight.get("stops") or 0)
+        facets["stops"][key] = facets["stops"].get(key, 0) + 1
+    elif facet == "airlines":
+        key = airline_code(flight)
+        facets["airlines"][key] = facets["airlines"].get(key, 0) + 1
+    elif facet in ("price", "duration"):
+        value = price(flight) if facet == "price" else duration_minutes(flight)
+        if value != float("inf"):
+            bounds = facets[facet]
+            bounds["min"] = value if bounds["min"] is None else min(bounds["min"], value)
+            bounds["max"] = value if bounds["max"] is None else max(bounds["max"], value)
+    elif facet == "depart":
+        minutes = departure_minutes(flight)
+        if minutes is not None:
+            for name, start, end in DEPARTURE_BUCKETS:
+                if start <= minutes < end:
+                    facets["depart"][name] += 1
+                    break
+
+
+def filter_and_facet(flights, filters):
+    """(offers matching every filter, in input order; facet counts) from a single pass"""
+    tests = _tests(filters)
+    facets = _empty_facets()
+    matched = []
+    for flight in flights:
+        failed = [name for name, test in tests.items() if not test(flight)]
+        if not failed:
+            matched.append(flight)
+            for facet in FACETS:
+                _count(facets, facet, flight)
+        elif len(failed) == 1 and failed[0] in FACETS:
+            _count(facets, failed[0], flight)
+    return matched, facets
@@ -1,26 +1,233 @@
 from datetime import datetime
-import requests
+from lazy_imports import lazy_import
+requests = lazy_import("requests")  # only the real API needs the HTTP client
 #import os
 #from dotenv import load_dotenv
 from mock_data import mock_kiwi_response
 import time
 import json
 import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 #load_dotenv()
 from config import get_logger
 logger = get_logger(__name__)
 
 from config import AFFILIATE_MARKER, API_TOKEN,HOST,USER_IP,USE_REAL_API, FEATURED_FLIGHT_LIMIT,DEBUG_MODE
+from search_cache import search_cache, make_search_spec, make_search_key
+from warm_cache import popular_routes
+from upstream_guard import UpstreamError, upstream_breaker, acquire_upstream_token, record_metric
+from snapshot_store import snapshot_store
+from price_index import min_price_index
+from price_history import price_history
+from price_alerts import price_alerts
+from itinerary import itinerary_id, make_leg, sort_and_dedup
+from ranking import DEFAULT_SORT, sort_offers
+from facets import filter_and_facet, airline_code
+from search_queue import search_queue, SearchPending
+from profiling import timed_phase
+from config import SNAPSHOT_ENABLED, SNAPSHOT_STALE_WHILE_REVALIDATE, SEARCH_DEADLINE_SECONDS, SEARCH_REFRESH_WORKERS
+from config import MOCK_UPSTREAM_LATENCY, PRICE_HISTORY_ENABLED, ALERTS_ENABLED
+from config import SEARCH_QUEUE_ENABLED, SEARCH_QUEUE_WAIT, SELF_TRANSFER_ENABLED
+
+# Background refreshes, deduplicated per search key so a hot route is fetched once
+_refresh_pool = ThreadPoolExecutor(max_workers=SEARCH_REFRESH_WORKERS, thread_name_prefix="search-refresh")
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+
+
+def search_flights(origin_code, destination_code, date_from_str, date_to_str, trip_type, adults=1, children=0,infants=0, cabin_class="economy", limit=None, direct_only=False, track=True, sort=DEFAULT_SORT):
+    flights, _ = search_flights_with_meta(origin_code, destination_code, date_from_str, date_to_str, trip_type, adults, children, infants, cabin_class, limit=limit, direct_only=direct_only, track=track, sort=sort)
+    return flights
+
+
+def search_flights_with_meta(origin_code, destination_code, date_from_str, date_to_str, trip_type, adults=1, children=0,infants=0, cabin_class="economy", limit=None, direct_only=False, track=True, sort=DEFAULT_SORT, filters=None):
+    """Like search_flights, but also returns {"source": "cache"|"snapshot"|"live", "age": seconds, "key": search key}.
+    Cache hits also carry "stored_at", which identifies that exact version of the results.
+    With `filters` (see facets.parse_filters) the full result set is filtered first and
+    meta also carries "facets" and "total" (offers matching before the limit)."""
+    spec = make_search_spec(origin_code, destination_code, date_from_str, date_to_str, trip_type, adults, children, infants, cabin_class)
+    if track:
+        popular_routes.record(spec)
+
+    key = make_search_key(spec)
+    entry = search_cache.get_entry(key)
+    if entry is None:
+        flights, meta = _search_uncached(spec, key)
+        if not flights and SELF_TRANSFER_ENABLED:
+            flights = self_transfer_flights(spec)
+            if flights:
+                meta["source"] = "self-transfer"
+    else:
+        logger.info(f"Cache hit for {spec.origin_code}->{spec.destination_code} on {spec.date_from_str}")
+        stored_at, flights = entry
+        meta = {"source": "cache", "age": time.time() - stored_at, "stored_at": stored_at}
+    meta["key"] = key
+
+    if filters is not None:
+        flights, meta["facets"] = filter_and_facet(flights, filters)
+        meta["total"] = len(flights)
+
+    return select_featured(flights, limit=limit, direct_only=direct_only, sort=sort), meta
+
+
+def _search_uncached(spec, key):
+    entry = snapshot_store.load_entry(key) if SNAPSHOT_ENABLED else None
+    if entry is not None and time.time() - entry[0] <= search_cache.ttl:
+        # Saved within the cache TTL by another worker (e.g. the warm-cache leader): as good as a hit here
+        stored_at, flights = entry
+        search_cache.set(key, flights, stored_at=stored_at)
+        return flights, {"source": "cache", "age": time.time() - stored_at, "stored_at": stored_at}
+    snapshot, snapshot_age = (entry[1], time.time() - entry[0]) if entry else (None, None)
+    if not snapshot:
+        if SEARCH_QUEUE_ENABLED:
+            return run_queued_search(spec, SEARCH_QUEUE_WAIT), {"source": "live", "age": 0}
+        return refresh_search(spec), {"source": "live", "age": 0}
+
+    if SEARCH_QUEUE_ENABLED:
+        if SNAPSHOT_STALE_WHILE_REVALIDATE:
+            search_queue.enqueue(spec)
+            logger.info(f"Serving {int(snapshot_age)}s old snapshot for {key} while a search worker refreshes")
+            return snapshot, {"source": "snapshot", "age": snapshot_age}
+        try:
+            return run_queued_search(spec, SEARCH_DEADLINE_SECONDS), {"source": "live", "age": 0}
+        except SearchPending:
+            logger.warning(f"Search for {key} exceeded {SEARCH_DEADLINE_SECONDS}s, serving snapshot")
+            return snapshot, {"source": "snapshot", "age": snapshot_age}
+
+    future = refresh_in_background(spec)
+    if SNAPSHOT_STALE_WHILE_REVALIDATE:
+        logger.info(f"Serving {int(snapshot_age)}s old snapshot for {key} while refreshing")
+        return snapshot, {"source": "snapshot", "age": snapshot_age}
+
+    try:
+        return future.result(timeout=SEARCH_DEADLINE_SECONDS), {"source": "live", "age": 0}
+    except FutureTimeout:
+        logger.warning(f"Search for {key} exceeded {SEARCH_DEADLINE_SECONDS}s, serving snapshot")
+        return snapshot, {"source": "snapshot", "age": snapshot_age}
+
+
+def run_queued_search(spec, timeout):
+    """Hand `spec` to the search workers and wait up to `timeout` seconds; raises SearchPending when it is not done"""
+    flights = search_queue.run(spec, timeout)
+    if flights:
+        # The worker filled its own process cache; fill this one too
+        search_cache.set(make_search_key(spec), flights)
+        min_price_index.record(spec, flights)
+    return flights
+
+
+def refresh_in_background(spec):
+    """Submit refresh_search(spec) unless a refresh for the same key is already running"""
+    key = make_search_key(spec)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future
+        future = _refresh_pool.submit(refresh_search, spec)
+        _inflight[key] = future
+    future.add_done_callback(lambda _: _forget_inflight(key))
+    return future
+
+
+def _forget_inflight(key):
+    with _inflight_lock:
+        _inflight.pop(key, None)
+
+
+def fetch_flights(spec):
+    """Run one uncached upstream search and return the full price-sorted list, one offer per itinerary"""
+    with timed_phase("upstream"):
+        if USE_REAL_API:
+            flights = upstream_breaker.call(fetch_flights_api, *spec)
+        else:
+            flights = fetch_flights_mock(spec.origin_code, spec.destination_code, spec.date_from_str, spec.date_to_str, spec.trip_type)
+    with timed_phase("normalize"):
+        return sort_and_dedup(flights)
+
+
+def refresh_search(spec):
+    """Fetch `spec` from the upstream and store non-empty results in the search cache"""
+    try:
+        flights = fetch_flights(spec)
+    except UpstreamError as e:
+        logger.warning(f"Upstream unavailable for {spec.origin_code}->{spec.destination_code}: {e}")
+        return fallback_flights(spec)
+    if flights:
+        search_cache.set(make_search_key(spec), flights)
+        min_price_index.record(spec, flights)
+        if SNAPSHOT_ENABLED:
+            snapshot_store.save(make_search_key(spec), flights)
+        if PRICE_HISTORY_ENABLED:
+            try:
+                price_history.record(spec, flights)
+            except OSError as e:
+                logger.error(f"Failed to record price history: {e}")
+        if ALERTS_ENABLED:
+            price_alerts.submit(spec, flights)  # evaluated on the alerts thread
+    return flights
+
+
+def fallback_flights(spec):
+    """Results to show when the upstream is throttled, failing or short-circuited"""
+    key = make_search_key(spec)
+    stale = search_cache.peek(key)
+    if not stale and SNAPSHOT_ENABLED:
+        stale, _ = snapshot_store.load(key)
+    if stale:
+        record_metric("fallback_cached")
+        return stale
+    record_metric("fallback_mock")
+    flights = fetch_flights_mock(spec.origin_code, spec.destination_code, spec.date_from_str, spec.date_to_str, spec.trip_type)
+    return [mock_to_offer(flight, spec) for flight in flights]
+
+
+def mock_to_offer(flight, spec):
+    """A fetch_flights_mock row in the API's offer schema (depart, link, airline code, ...)"""
+    def minute(value):
+        return value.strftime("%Y-%m-%d %H:%M") if isinstance(value, datetime) else value
 
+    return {
+        "id": flight["id"],
+        "airline": airline_code(flight),
+        "flight_number": flight.get("flight_number", "N/A"),
+        "depart": minute(flight.get("departure")),
+        "return": minute(flight.get("return")),
+        "arrive": None,
+        "origin": spec.origin_code,
+        "destination": spec.destination_code,
+        "duration": flight.get("duration"),
+        "stops": flight.get("stops", 0),
+        "price": flight.get("price"),
+        "currency": flight.get("currency"),
+        "vendor": flight.get("vendor", "MockVendor"),
+        "link": flight.get("deep_link"),
+        "trip_type": flight.get("trip_type", spec.trip_type),
+        "cabin_class": flight.get("cabin_class", spec.cabin_class),
+    }
 
 
+def self_transfer_flights(spec):
+    """Itineraries built from separately ticketed cached/inventory flights, for searches with no results.
+    Not cached: they are recomputed from the connection graph, which already holds the cached legs."""
+    from connections import connection_engine
+    try:
+        return connection_engine.search_spec(spec)
+    except Exception as e:
+        logger.error(f"Self-transfer search failed for {spec.origin_code}->{spec.destination_code}: {e}")
+        return []
 
-def search_flights(origin_code, destination_code, date_from_str, date_to_str, trip_type, adults=1, children=0,infants=0, cabin_class="economy", limit=None, direct_only=False):
-    if USE_REAL_API:
-        return search_flights_api(origin_code, destination_code, date_from_str, date_to_str, trip_type, adults, children, infants, cabin_class,limit=limit, direct_only=direct_only)
-    else:
-        return search_flights_mock(origin_code, destination_code, date_from_str, date_to_str, trip_type,limit=limit, direct_only=direct_only)
+
+def select_featured(flights, limit=None, direct_only=False, sort=DEFAULT_SORT):
+    if direct_only:
+        flights = [f for f in flights if f.get("stops", 0) == 0]
+    if sort != DEFAULT_SORT:
+        # Stored results are already cheapest-first; other orders are ranked on demand
+        return sort_offers(flights, sort, k=limit or FEATURED_FLIGHT_LIMIT)
+    return flights[:limit or FEATURED_FLIGHT_LIMIT]
 
 def map_cabin_class(cabin_class):
     return {
@@ -29,40 +236,38 @@ def map_cabin_class(cabin_class):
         "first": "F"
     }.get(cabin_class.lower(), "Y")
 
-def generate_flight_id(link, airline, departure):
-    raw = f"{airline}_{departure}_{link}"
-    return hashlib.md5(raw.encode()).hexdigest()
-
 def generate_signature(token, marker, host, user_ip, locale, trip_class, passengers, segments):
-    outbound = segments[0]
-
-    if len(segments) == 1:
-        # One-way format
-        raw_string = (
-            f"{token}:{host}:{locale}:{marker}:"
-            f"{passengers['adults']}:{passengers['children']}:{passengers['infants']}:"
-            f"{outbound['date']}:{outbound['destination']}:{outbound['origin']}:"
-            f"{trip_class}:{user_ip}"
-        )
-    else:
-        # Round-trip format
-        return_seg = segments[1]
-        raw_string = (
-            f"{token}:{host}:{locale}:{marker}:"
-            f"{passengers['adults']}:{passengers['children']}:{passengers['infants']}:"
-            f"{outbound['date']}:{outbound['destination']}:{outbound['origin']}:"
-            f"{return_seg['date']}:{return_seg['destination']}:{return_seg['origin']}:"
-            f"{trip_class}:{user_ip}"
-        )
+    """MD5 of the request fields in the documented order; every segment adds date:destination:origin,
+    so one-way, round-trip and multi-city payloads share this builder"""
+    parts = [token, host, locale, marker, passengers['adults'], passengers['children'], passengers['infants']]
+    for segment in segments:
+        parts += [segment['date'], segment['destination'], segment['origin']]
+    parts += [trip_class, user_ip]
+    raw_string = ":".join(str(part) for part in parts)
     print("🔐 Raw signature string:", raw_string)
     # Hash it
     return hashlib.md5(raw_string.encode("utf-8")).hexdigest()
 
 
 def search_flights_api(origin_code, destination_code, date_from_str, date_to_str=None, trip_type="round-trip", adults=1, children=0, infants=0, cabin_class="economy", limit=None, direct_only=False):
+    try:
+        flights = sort_and_dedup(upstream_breaker.call(fetch_flights_api, origin_code, destination_code, date_from_str, date_to_str, trip_type, adults, children, infants, cabin_class))
+    except UpstreamError as e:
+        print(f"❌ Upstream unavailable: {e}")
+        return []
+    featured_flights = select_featured(flights, limit=limit, direct_only=direct_only)
+    if not featured_flights:
+        print("\n⚠️ No flights matched the criteria.")
+        return []
+
+    print(f"🌟 Featured (top {limit or FEATURED_FLIGHT_LIMIT} cheapest):")
+    for flight in featured_flights:
+        print(f"\n  ✈️   {flight}") # show the whole info of flights
+
+    return featured_flights
 
-    init_url = "https://api.travelpayouts.com/v1/flight_search"
 
+def fetch_flights_api(origin_code, destination_code, date_from_str, date_to_str=None, trip_type="round-trip", adults=1, children=0, infants=0, cabin_class="economy"):
     segments = [{
         "date": date_from_str,
         "destination": destination_code,
@@ -76,7 +281,12 @@ def search_flights_api(origin_code, destination_code, date_from_str, date_to_str
         })
         print(f"🧭 Trip type: {trip_type}")
         print(f"🧳 Segments sent: {json.dumps(segments, indent=2)}")
+    return fetch_segments_api(segments, trip_type, adults, children, infants, cabin_class)
+
 
+def fetch_segments_api(segments, trip_type, adults=1, children=0, infants=0, cabin_class="economy"):
+    """One upstream search for any segments payload: one-way, round-trip or multi-city"""
+    init_url = "https://api.travelpayouts.com/v1/flight_search"
 
     passengers = {
         "adults": int(adults),
@@ -123,20 +333,21 @@ def search_flights_api(origin_code, destination_code, date_from_str, date_to_str
             print("📦 Payload:")
             print(json.dumps(payload, indent=2))
 
+        acquire_upstream_token()
         response = requests.post(init_url, json=payload, headers=headers)
        # if DEBUG_MODE:
             # print(f"📥 Raw response: {response.text}")
         if response.status_code != 200:
             print(f"❌ API error: {response.status_code}")
-            return []
+            raise UpstreamError(f"flight_search returned {response.status_code}")
         search_id = response.json().get("search_id") or response.json().get("uuid")
         print(f"🔗 search_id: {search_id}")
         if not search_id:
             print("❌ No search_id returned")
-            return []
+            raise UpstreamError("flight_search returned no search_id")
     except requests.exceptions.RequestException as e:
         print(f"❌ Request failed: {e}")
-        return []
+        raise UpstreamError(f"flight_search request failed: {e}") from e
 
     results_url = f"https://api.travelpayouts.com/v1/flight_search_results?uuid={search_id}"
     print(f"📄 Polling results from: {results_url}")
@@ -145,6 +356,7 @@ def search_flights_api(origin_code, destination_code, date_from_str, date_to_str
     for attempt in range(5):
         try:
             time.sleep(3)
+            acquire_upstream_token()
             results_response = requests.get(results_url)
             print(f"🔗 results_response.status_code: {results_response.status_code}")
             # if DEBUG_MODE:
@@ -158,11 +370,14 @@ def search_flights_api(origin_code, destination_code, date_from_str, date_to_str
                         raw_proposals.extend(chunk_proposals)
                 if raw_proposals:
                     break
+            elif results_response.status_code == 429 or results_response.status_code >= 500:
+                # Server-side trouble: stop polling and let the circuit breaker count it
+                raise UpstreamError(f"flight_search_results returned {results_response.status_code}")
             else:
                 print(f"⚠️ Attempt {attempt+1}: Status {results_response.status_code}")
         except requests.exceptions.RequestException as e:
             print(f"❌ Polling failed: {e}")
-            return []
+            raise UpstreamError(f"flight_search_results request failed: {e}") from e
     else:
         print("❌ No results after polling")
         return []
@@ -205,12 +420,18 @@ def search_flights_api(origin_code, destination_code, date_from_str, date_to_str
                     print("⛔ Skipping incomplete proposal")
                 continue
 
+            legs = [make_leg(leg.get("marketing_carrier"), leg.get("number"),
+                             f"{leg.get('departure_date', '')} {leg.get('departure_time', '')}",
+                             leg.get("departure"), leg.get("arrival")) for leg in all_flights]
+
             filtered.append({
-                "id": generate_flight_id(booking_link, airline, departure),
+                # Same flights from different gates share an id; fetch_flights keeps the cheapest
+                "id": itinerary_id(legs, cabin_class),
                 "airline": airline or "Airline not specified",
                 "flight_number": flight_number or "Not available",
                 "depart": departure,
                 "return": arrival,
+                "arrive": arrival,
                 "origin": origin,
                 "destination": destination,
                 "duration": duration,
@@ -222,35 +443,23 @@ def search_flights_api(origin_code, destination_code, date_from_str, date_to_str
                 "trip_type": trip_type,
                 "cabin_class": cabin_class
             })
-    # ✅ Filter direct flights if requested
-    if direct_only:
-        filtered = [f for f in filtered if f.get("stops", 0) == 0]
-        #print(f"Filtered down to {len(filtered)} direct flights")
-        
-    #✅ Early exit if no flights
-    if not filtered:
-        print("\n⚠️ No flights matched the criteria.")
-        return []
-
-    # ✅ Sort by price ascending
-   
+    # ✅ Sort by price ascending; dedup, direct-only and limit are applied by the callers
     filtered.sort(key=lambda x: x.get("price", float("inf")))
 
-
-    # ✅ Slice top FEATURED_FLIGHT_LIMIT flights for featured display
-    limit = limit or FEATURED_FLIGHT_LIMIT
-    featured_flights = filtered[:limit]
-
     print(f"\n🎯 Total matching flights from API: {len(filtered)}")
-    print(f"🌟 Featured (top {FEATURED_FLIGHT_LIMIT} cheapest):")
-    for flight in featured_flights:
-        print(f"\n  ✈️   {flight}") # show the whole info of flights
-
-    # ✅ Return both full and featured lists
-    return featured_flights
+    return filtered
 
 # this function is only for demo
 def search_flights_mock(origin_code, destination_code, date_from_str, date_to_str, trip_type, limit=None, only_direct=False):
+    flights = sort_and_dedup(fetch_flights_mock(origin_code, destination_code, date_from_str, date_to_str, trip_type))
+    featured_flights = select_featured(flights, limit=limit, direct_only=only_direct)
+    print(f"\n🎯 Total featured_flights: {len(featured_flights)}")
+    return featured_flights
+
+
+def fetch_flights_mock(origin_code, destination_code, date_from_str, date_to_str, trip_type):
+    if MOCK_UPSTREAM_LATENCY:
+        time.sleep(MOCK_UPSTREAM_LATENCY)  # simulate upstream polling time in load tests
     try:
         date_from = datetime.strptime(date_from_str, "%Y-%m-%d").date()
         date_to = datetime.strptime(date_to_str, "%Y-%m-%d").date() if date_to_str else None
@@ -293,8 +502,13 @@ def search_flights_mock(origin_code, destination_code, date_from_str, date_to_st
 
         print(f"✅ Flight link: {deep_link}")
 
+        carrier = flight.get("airlines", ["Unknown"])[0]
+        legs = [make_leg(carrier, flight.get("flight_number"), flight.get("departure"), flight_origin, flight_destination)]
+        if trip_type == "round-trip" and flight.get("return"):
+            legs.append(make_leg(carrier, "", flight.get("return"), flight_destination, flight_origin))
+
         filtered.append({
-            "id": generate_flight_id(deep_link, flight.get("airlines", ["Unknown"])[0], flight.get("departure")),
+            "id": itinerary_id(legs, flight.get("cabin_class", "Economy")),
             "airlines": flight.get("airlines", ["Unknown"]),
             "flight_number": flight.get("flight_number", "N/A"),
             "duration": flight.get("duration", "N/A"),
@@ -309,13 +523,10 @@ def search_flights_mock(origin_code, destination_code, date_from_str, date_to_st
         })  
     print(f"\n🎯 Total matching flights: {len(filtered)}")
     filtered.sort(key=lambda x: x.get("price", float("inf")))
-    featured_flights = filtered[:limit or FEATURED_FLIGHT_LIMIT]
 
     if skipped_flights:
             print(f"\n🚫 Total skipped flights due to invalid deep_link: {len(skipped_flights)}")
             for i, f in enumerate(skipped_flights, 1):
                 print(f"{i}. {f}")
                 
-    print(f"\n🎯 Total featured_flights: {len(featured_flights)}")
-                
-    return featured_flights
\ No newline at end of file
+    return filtered
\ No newline at end of file
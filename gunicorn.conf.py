@@ -0,0 +1,71 @@
+# gunicorn.conf.py — serving presets, picked with GUNICORN_PROFILE
+#
+#   sync     one request per worker (default, matches the previous setup)
+#   gevent   cooperative workers; upstream polling yields instead of blocking
+#   uvicorn  ASGI workers serving asgi:asgi_app, ASGI_THREADS requests per worker
+#
+# Views are plain functions: concurrency comes from the worker class, not from the views.
+# Measured capacity of ONE worker with a 1 s upstream (benchmarks/load_test.py, 50 clients,
+# MOCK_UPSTREAM_LATENCY=1 SEARCH_CACHE_TTL=0 SNAPSHOT_ENABLED=false):
+#   sync      1.0 searches/s   p50 10 s already at 10 clients; requests queue behind each other
+#   gevent   47.3 searches/s   p50 1.03 s; bounded by clients, up to worker_connections
+#   uvicorn  27.4 searches/s   p50 1.28 s; bounded by ASGI_THREADS (32)
+# i.e. roughly min(concurrent requests, slots per worker) / upstream latency.
+#
+# The app is preloaded in the master (GUNICORN_PRELOAD=false to turn off): imports,
+# templates and the reference data are loaded once and shared copy-on-write by the
+# workers. Database tables are not created here; run `flask --app app migrate` first.
+
+import multiprocessing
+import os
+
+profile = os.getenv("GUNICORN_PROFILE", "sync").lower()
+cpus = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+keepalive = 5
+accesslog = "-"
+
+if profile == "gevent":
+    wsgi_app = "app:app"
+    worker_class = "gevent"
+    workers = int(os.getenv("WEB_CONCURRENCY", cpus))
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 200))
+elif profile == "uvicorn":
+    wsgi_app = "asgi:asgi_app"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    workers = int(os.getenv("WEB_CONCURRENCY", cpus))
+else:
+    wsgi_app = "app:app"
+    worker_class = "sync"
+    workers = int(os.getenv("WEB_CONCURRENCY", cpus * 2 + 1))
+
+# === Preloading and worker lifecycle ===
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+if preload_app:
+    # Read by config on import: background threads do not survive a fork, start them per worker
+    os.environ.setdefault("DEFER_BACKGROUND_JOBS", "true")
+
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))  # recycle workers before they grow too far
+max_requests_jitter = max_requests // 10  # ...but not all at once
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None  # heartbeat file off the disk
+
+
+def when_ready(server):
+    if preload_app:
+        from app import warm_shared_state
+        warm_shared_state()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    # Connection pools and sockets opened in the master must not be shared between processes
+    from app import app, start_background_jobs
+    from database import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+    if os.environ.get("DEFER_BACKGROUND_JOBS") == "true":
+        start_background_jobs()
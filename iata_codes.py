@@ -1,4 +1,5 @@
-# iata_codes.py
+# iata_codes.py — city -> search code source table; lookups go through reference_data
+
 
 city_to_iata = {
     "stockholm": "STO",
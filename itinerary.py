@@ -0,0 +1,94 @@
+# itinerary.py — canonical itinerary fingerprints and deduplication of merged results
+#
+# An itinerary is identified by what is flown: for every leg the carrier, flight
+# number, departure time and airports, plus the cabin. Booking links, gates and
+# prices are deliberately left out, so the same flights sold by two vendors
+# collapse into one offer (the cheapest, since results are merged in price order).
+
+import hashlib
+import heapq
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from config import DEDUP_MAX_SEEN
+from config import get_logger
+logger = get_logger(__name__)
+
+Leg = namedtuple("Leg", ["carrier", "number", "departure", "origin", "destination"])
+
+_TIME_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S")
+
+
+def _canonical_time(value):
+    """Minute-precision ISO time for datetimes and the upstream's date/time strings"""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M")
+    text = str(value or "").strip()
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%dT%H:%M")
+        except ValueError:
+            continue
+    return text
+
+
+def _carrier_code(value):
+    """Carrier code from either "LH" or the mock's "LH - Lufthansa" """
+    return str(value or "").split(" - ")[0].strip().upper()
+
+
+def _flight_number(carrier, number):
+    """Bare flight number: "LH0100", "100" and 100 all become "100" for carrier LH"""
+    text = str(number or "").strip().upper().replace(" ", "")
+    if carrier and text.startswith(carrier):
+        text = text[len(carrier):]
+    return text.lstrip("0") or text
+
+
+def make_leg(carrier, number, departure, origin="", destination=""):
+    carrier = _carrier_code(carrier)
+    return Leg(carrier, _flight_number(carrier, number), _canonical_time(departure),
+               str(origin or "").upper(), str(destination or "").upper())
+
+
+def itinerary_id(legs, cabin_class=""):
+    """Stable 16-hex-digit fingerprint of an ordered list of legs"""
+    raw = "|".join(f"{leg.carrier}{leg.number}@{leg.departure}:{leg.origin}>{leg.destination}" for leg in legs)
+    raw += "#" + str(cabin_class or "").lower()[:1]
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def dedup_itineraries(flights, max_seen=DEDUP_MAX_SEEN):
+    """Yield each itinerary the first time its id is seen.
+
+    Streaming: the seen-set is bounded to the `max_seen` most recent ids, so a very
+    long merge uses constant memory (a duplicate further back than that slips through)."""
+    seen = OrderedDict()
+    dropped = 0
+    for flight in flights:
+        key = flight.get("id")
+        if key in seen:
+            seen.move_to_end(key)
+            dropped += 1
+            continue
+        seen[key] = None
+        if len(seen) > max_seen:
+            seen.popitem(last=False)
+        yield flight
+    if dropped:
+        logger.debug(f"Dropped {dropped} duplicate itineraries")
+
+
+def _price(flight):
+    price = flight.get("price")
+    return price if isinstance(price, (int, float)) else float("inf")
+
+
+def merge_results(*result_lists):
+    """Merge price-sorted result lists into one price-sorted list with one offer per itinerary"""
+    return list(dedup_itineraries(heapq.merge(*result_lists, key=_price)))
+
+
+def sort_and_dedup(flights):
+    """Price-sort one unsorted list and keep the cheapest offer per itinerary"""
+    return list(dedup_itineraries(sorted(flights, key=_price)))
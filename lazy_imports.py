@@ -0,0 +1,52 @@
+# lazy_imports.py — defer heavy modules until the code that needs them first runs
+#
+# Health checks, autocomplete and mock-mode searches never touch the NLP stack or the
+# HTTP client, yet importing spaCy, dateparser or requests at module level made every
+# worker pay for them before serving its first request. lazy_import() returns a stand-in
+# that performs the real import on first attribute access; a module that is not installed
+# raises its ImportError there instead of at startup.
+
+import importlib
+import sys
+import threading
+
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """Placeholder for a module that is imported on first attribute access"""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with _lock:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__dict__["_name"])
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def lazy_import(name):
+    """The module `name` if it is already imported, otherwise a LazyModule for it"""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+
+def is_loaded(name):
+    """Whether `name` has really been imported in this process"""
+    return name in sys.modules
@@ -11,4 +11,41 @@ class Booking(db.Model):
     passenger_email = db.Column(db.String(100), nullable=False)
     passenger_phone = db.Column(db.String(20), nullable=False)
     flight_data = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+class BookingSummary(db.Model):
+    """One narrow, pre-formatted row per booking, written together with it by save_booking.
+    The history page and admin views read these instead of parsing flight_data."""
+    __tablename__ = "booking_summaries"
+
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey("bookings.id"), unique=True, nullable=False)
+    reference = db.Column(db.String(20), unique=True, nullable=False)
+    passenger_name = db.Column(db.String(100), nullable=False)
+    passenger_email = db.Column(db.String(100), nullable=False)
+    passenger_phone = db.Column(db.String(20), nullable=False)
+    route = db.Column(db.String(40), nullable=False)   # "ARN → LHR"
+    dates = db.Column(db.String(40), nullable=False)   # "2025-10-05 08:00 → 2025-10-12 18:30"
+    airline = db.Column(db.String(60), nullable=False)
+    price = db.Column(db.Float)
+    price_label = db.Column(db.String(24), nullable=False)  # "123.45 EUR"
+    booked_at = db.Column(db.DateTime, nullable=False)
+
+    booking = db.relationship("Booking", backref=db.backref("summary", uselist=False))
+
+    HISTORY_COLUMNS = ("reference", "passenger_name", "passenger_email", "passenger_phone",
+                       "route", "dates", "airline", "price_label", "booked_at")
+
+    # Newest-first pages walk this index; on PostgreSQL it also carries every column the page shows
+    __table_args__ = (
+        db.Index("ix_booking_summaries_booked_at", "booked_at", "id",
+                 postgresql_include=[c for c in HISTORY_COLUMNS if c != "booked_at"]),
+    )
+
+
+class ReferenceCounter(db.Model):
+    """Next unallocated number of a named sequence; processes reserve blocks from it"""
+    __tablename__ = "reference_counters"
+
+    name = db.Column(db.String(40), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False)
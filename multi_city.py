@@ -0,0 +1,197 @@
+# multi_city.py — open-jaw and multi-city searches of up to MULTI_CITY_MAX_SEGMENTS legs
+#
+# The upstream is first asked for the whole itinerary in one segments payload. When
+# that returns nothing, every leg is searched on its own, in parallel and through the
+# normal cached one-way path, and the cheapest feasible combinations are assembled by
+# a k-best merge over the price-sorted leg lists instead of the full cross product.
+
+import heapq
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flight_search import fetch_segments_api, search_flights_with_meta
+from search_cache import search_cache
+from search_queue import SearchPending
+from upstream_guard import UpstreamError, upstream_breaker
+from itinerary import itinerary_id, make_leg, sort_and_dedup
+from ranking import duration_minutes, price
+from facets import airline_code
+from config import USE_REAL_API, FEATURED_FLIGHT_LIMIT
+from config import MULTI_CITY_MAX_SEGMENTS, MULTI_CITY_LEG_RESULTS, MULTI_CITY_MIN_CONNECTION
+from config import get_logger
+logger = get_logger(__name__)
+
+MultiCityLeg = namedtuple("MultiCityLeg", ["origin_code", "destination_code", "date_str"])
+
+MAX_EXPANSIONS_PER_RESULT = 50  # bounds the merge when most combinations do not connect
+_TIME_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S")
+
+# One worker per leg; every upstream call still goes through the shared rate limiter
+_leg_pool = ThreadPoolExecutor(max_workers=MULTI_CITY_MAX_SEGMENTS, thread_name_prefix="multi-city")
+
+
+def make_multi_city_key(legs, adults=1, children=0, infants=0, cabin_class="economy"):
+    route = "|".join(f"{leg.origin_code}-{leg.destination_code}@{leg.date_str}" for leg in legs)
+    return f"multi:{route}:{adults}:{children}:{infants}:{cabin_class}"
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        return value
+    text = str(value or "").strip()
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def departure_time(offer):
+    return _parse_time(offer.get("depart") or offer.get("departure"))
+
+
+def arrival_time(offer):
+    """Final arrival, or departure plus duration when the offer does not carry it"""
+    arrival = _parse_time(offer.get("arrive"))
+    departure = departure_time(offer)
+    if arrival is None and departure is not None and duration_minutes(offer) != float("inf"):
+        arrival = departure + timedelta(minutes=duration_minutes(offer))
+    return arrival
+
+
+def connects(offers, min_connection=MULTI_CITY_MIN_CONNECTION):
+    """True when every leg departs at least `min_connection` minutes after the previous one lands.
+    Legs with unknown times are not rejected."""
+    gap = timedelta(minutes=min_connection)
+    for previous, following in zip(offers, offers[1:]):
+        landed, leaves = arrival_time(previous), departure_time(following)
+        if landed is not None and leaves is not None and leaves < landed + gap:
+            return False
+    return True
+
+
+def k_best_combinations(leg_offers, k, feasible=connects):
+    """The `k` cheapest combinations taking one offer per leg, cheapest first.
+
+    Every list must be price-sorted. The search starts from the all-cheapest
+    combination and each popped one only adds its neighbours that advance a single
+    leg, so roughly k * legs combinations are priced instead of the whole product.
+    Combinations `feasible` rejects are still expanded; their neighbours may connect."""
+    if not leg_offers or any(not offers for offers in leg_offers):
+        return []
+    prices = [[price(offer) for offer in offers] for offers in leg_offers]
+    start = (0,) * len(leg_offers)
+    heap = [(sum(column[0] for column in prices), start)]
+    seen = {start}
+    combinations = []
+    budget = k * MAX_EXPANSIONS_PER_RESULT
+
+    while heap and len(combinations) < k and budget > 0:
+        budget -= 1
+        total, positions = heapq.heappop(heap)
+        offers = [leg_offers[leg][i] for leg, i in enumerate(positions)]
+        if feasible is None or feasible(offers):
+            combinations.append((total, offers))
+        for leg, i in enumerate(positions):
+            if i + 1 < len(prices[leg]):
+                following = positions[:leg] + (i + 1,) + positions[leg + 1:]
+                if following not in seen:
+                    seen.add(following)
+                    heapq.heappush(heap, (total - prices[leg][i] + prices[leg][i + 1], following))
+    return combinations
+
+
+def combine_offers(legs, offers, total, cabin_class="economy"):
+    """One multi-city offer from one offer per leg, each booked as its own ticket"""
+    first, last = offers[0], offers[-1]
+    fingerprint = [make_leg(airline_code(offer), offer.get("flight_number"), departure_time(offer) or "",
+                            leg.origin_code, leg.destination_code) for leg, offer in zip(legs, offers)]
+    minutes = [duration_minutes(offer) for offer in offers]
+    arrival = arrival_time(last)
+    return {
+        "id": itinerary_id(fingerprint, cabin_class),
+        "airline": airline_code(first),
+        "flight_number": first.get("flight_number", "N/A"),
+        "depart": fingerprint[0].departure.replace("T", " "),
+        "arrive": arrival.strftime("%Y-%m-%d %H:%M") if arrival else None,
+        "return": None,
+        "origin": legs[0].origin_code,
+        "destination": legs[-1].destination_code,
+        "duration": int(sum(minutes)) if float("inf") not in minutes else "N/A",
+        "stops": sum(offer.get("stops") or 0 for offer in offers),
+        "price": round(total, 2),
+        "currency": first.get("currency"),
+        "vendor": "Combined",
+        "link": first.get("link") or first.get("deep_link"),
+        "trip_type": "multi-city",
+        "cabin_class": cabin_class,
+        "separate_tickets": True,
+        "segments": offers,
+    }
+
+
+def fetch_combined(legs, adults=1, children=0, infants=0, cabin_class="economy"):
+    """The whole itinerary as one upstream query; [] when it has nothing (or is unavailable)"""
+    if not USE_REAL_API:
+        return []  # the mock data only has single routes
+    segments = [{"date": leg.date_str, "destination": leg.destination_code, "origin": leg.origin_code} for leg in legs]
+    try:
+        return sort_and_dedup(upstream_breaker.call(
+            fetch_segments_api, segments, "multi-city", adults, children, infants, cabin_class))
+    except UpstreamError as e:
+        logger.warning(f"Combined multi-city search unavailable: {e}")
+        return []
+
+
+def search_legs(legs, adults=1, children=0, infants=0, cabin_class="economy"):
+    """Cheapest offers for every leg as a one-way search, all legs in parallel.
+    Returns one (offers, job_id) per leg; job_id is set, and offers None, for a leg still
+    running on the search workers."""
+    def one_leg(leg):
+        try:
+            flights, _ = search_flights_with_meta(
+                leg.origin_code, leg.destination_code, leg.date_str, "", "one-way",
+                adults, children, infants, cabin_class, limit=MULTI_CITY_LEG_RESULTS, track=False)
+        except SearchPending as pending:
+            return None, pending.job_id
+        return flights, None
+    return list(_leg_pool.map(one_leg, legs))
+
+
+def leg_states(legs, results):
+    return [{"origin": leg.origin_code, "destination": leg.destination_code, "date": leg.date_str,
+             "status": "pending" if job_id else "done", **({"job_id": job_id} if job_id else {})}
+            for leg, (_, job_id) in zip(legs, results)]
+
+
+def search_multi_city(legs, adults=1, children=0, infants=0, cabin_class="economy", limit=None):
+    """(cheapest offers, meta) for (origin, destination, date) legs; meta["source"] is cache, combined or legs.
+
+    When some legs are still running on the search workers, source is "pending" and
+    meta["legs"] gives every leg's state; the same search made again once they are
+    done finds their results and completes."""
+    legs = [MultiCityLeg(*leg) for leg in legs]
+    if not 2 <= len(legs) <= MULTI_CITY_MAX_SEGMENTS:
+        raise ValueError(f"A multi-city search needs 2 to {MULTI_CITY_MAX_SEGMENTS} legs")
+    limit = limit or FEATURED_FLIGHT_LIMIT
+    key = make_multi_city_key(legs, adults, children, infants, cabin_class)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached[:limit], {"source": "cache", "key": key}
+
+    offers, source = fetch_combined(legs, adults, children, infants, cabin_class), "combined"
+    if not offers:
+        source = "legs"
+        results = search_legs(legs, adults, children, infants, cabin_class)
+        if any(job_id for _, job_id in results):
+            return [], {"source": "pending", "key": key, "legs": leg_states(legs, results)}
+        leg_offers = [offers for offers, _ in results]
+        offers = [combine_offers(legs, combination, total, cabin_class)
+                  for total, combination in k_best_combinations(leg_offers, MULTI_CITY_LEG_RESULTS)]
+        logger.info(f"Combined {len(offers)} multi-city offers from {[len(o) for o in leg_offers]} leg offers")
+
+    if offers:
+        search_cache.set(key, offers)
+    return offers[:limit], {"source": source, "key": key}
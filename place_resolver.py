@@ -0,0 +1,198 @@
+# place_resolver.py — typo-tolerant city/airport lookup over a trigram index of the reference data
+#
+# Every searchable name (city, airport name, alias, IATA/metro code) is split into
+# padded character trigrams; an inverted index maps each trigram to the names that
+# contain it, so a query only scores names it shares at least one trigram with.
+
+import json
+import re
+import threading
+import unicodedata
+import zlib
+from collections import namedtuple
+
+from reference_data import reference_data
+from config import get_logger
+logger = get_logger(__name__)
+
+Place = namedtuple("Place", ["code", "kind", "city", "name", "label"])
+
+# Native spellings and nicknames that trigram similarity alone would not reach
+ALIASES = {
+    "Copenhagen": ["København", "Köpenhamn", "Kobenhavn"],
+    "Munich": ["München", "Muenchen"],
+    "Rome": ["Roma"],
+    "Milan": ["Milano"],
+    "Venice": ["Venezia"],
+    "Lisbon": ["Lisboa"],
+    "Prague": ["Praha"],
+    "Vienna": ["Wien"],
+    "Warsaw": ["Warszawa"],
+    "Athens": ["Athina"],
+    "Brussels": ["Bruxelles", "Brussel"],
+    "Geneva": ["Genève", "Genf"],
+    "Zurich": ["Zürich"],
+    "Moscow": ["Moskva"],
+    "St. Petersburg": ["Saint Petersburg", "Sankt Peterburg"],
+    "New York": ["New York City", "Big Apple"],
+    "Los Angeles": ["LA"],
+    "San Francisco": ["SF", "Frisco"],
+    "Tehran": ["Teheran"],
+    "Tabiriz": ["Tabriz"],
+}
+
+MIN_SCORE = 0.4          # below this a match is a guess, not a resolution
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+
+
+def normalize(text):
+    """Lowercase ASCII with accents folded and punctuation dropped"""
+    folded = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    return " ".join(_NON_WORD.sub(" ", folded.lower()).split())
+
+
+def trigrams(text, prefix=False):
+    """Padded trigrams; `prefix` leaves the end open so partial words still match"""
+    padded = f"  {text}" if prefix else f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlaceResolver:
+    def __init__(self, reference=reference_data, aliases=ALIASES):
+        self.reference = reference
+        self.aliases = aliases
+        self._aliases_crc = zlib.crc32(json.dumps(aliases, sort_keys=True).encode("utf-8"))
+        self._lock = threading.Lock()
+        self._built = False
+
+    def _build(self):
+        places, names, index, codes, place_names = [], [], {}, {}, []
+
+        def add_name(place_id, text):
+            normalized = normalize(text)
+            if not normalized:
+                return
+            name_id = len(names)
+            grams = trigrams(normalized)
+            names.append((place_id, normalized, len(grams)))
+            while len(place_names) <= place_id:
+                place_names.append([])
+            place_names[place_id].append(normalized)
+            for gram in grams:
+                index.setdefault(gram, []).append(name_id)
+
+        for city in self.reference.cities():
+            place_id = len(places)
+            places.append(Place(city["code"], "city", city["city"], city["city"], f'{city["city"]} ({city["code"]})'))
+            add_name(place_id, city["city"])
+            for alias in self.aliases.get(city["city"], ()):
+                add_name(place_id, alias)
+            codes.setdefault(city["code"].lower(), place_id)
+
+        for airport in self.reference.airports():
+            place_id = len(places)
+            places.append(Place(airport["iata"], "airport", airport["city"], airport["name"],
+                                f'{airport["name"]} — {airport["city"]} ({airport["iata"]})'))
+            add_name(place_id, airport["name"])
+            if not normalize(airport["name"]).startswith(normalize(airport["city"])):
+                add_name(place_id, f'{airport["city"]} {airport["name"]}')  # "london heathrow"
+            codes[airport["iata"].lower()] = place_id  # an airport code beats a city with the same code
+
+        self._places, self._names, self._index, self._codes = places, names, index, codes
+        self._place_names = place_names + [[] for _ in range(len(places) - len(place_names))]
+        self._built = True
+        logger.info(f"Place index built: {len(places)} places, {len(names)} names, {len(index)} trigrams")
+
+    def _ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._build()
+
+    def rebuild(self):
+        with self._lock:
+            self._build()
+
+    @property
+    def version(self):
+        """Changes whenever search results could: new reference data or new aliases"""
+        return f"{self.reference.get_version()}{self._aliases_crc:08x}"
+
+    def _scores(self, text, prefix):
+        """{place_id: score} for normalized `text`, and whether they are word-prefix matches
+        (as opposed to near misses kept because no name starts with the query)"""
+        scores = {}
+        code_match = self._codes.get(text) if len(text) == 3 else None
+        if code_match is not None:
+            scores[code_match] = 1.0
+
+        grams = trigrams(text, prefix=prefix)
+        shared = {}
+        for gram in grams:
+            for name_id in self._index.get(gram, ()):
+                shared[name_id] = shared.get(name_id, 0) + 1
+
+        word_prefix = set()
+        for name_id, common in shared.items():
+            place_id, name, name_grams = self._names[name_id]
+            if prefix:
+                # Containment of the query in the name; a true word prefix scores highest
+                score = 0.75 * common / len(grams)
+                if name.startswith(text) or f" {text}" in name:
+                    score += 0.25
+                    word_prefix.add(place_id)
+            else:
+                score = 2 * common / (len(grams) + name_grams)  # Dice coefficient
+            if score > scores.get(place_id, 0):
+                scores[place_id] = score
+
+        if word_prefix:
+            # While the user is typing a real name, near misses are only noise; they are
+            # kept for typos, where nothing starts with the query
+            scores = {place_id: score for place_id, score in scores.items()
+                      if place_id in word_prefix or place_id == code_match}
+        return scores, bool(word_prefix)
+
+    def _ranked(self, scores):
+        # Cities before their airports on ties, so "London" resolves to LON rather than LHR
+        return sorted(scores.items(), key=lambda item: (-item[1], self._places[item[0]].kind != "city", item[0]))
+
+    def search(self, query, limit=5, prefix=False):
+        """Best places for `query` as [(score, Place)], highest first.
+        `prefix` scores as-you-type input: names with a word starting with the query, if any."""
+        self._ensure_built()
+        text = normalize(query)
+        if not text:
+            return []
+        scores, _ = self._scores(text, prefix)
+        return [(round(score, 3), self._places[place_id]) for place_id, score in self._ranked(scores)[:limit]]
+
+    def suggest(self, query, limit=5):
+        """As-you-type suggestions: ([(Place, names)], prefix_only).
+
+        `names` are the normalized names the place is found by (aliases included).
+        `prefix_only` means the list holds every place with a name a word of which starts
+        with the query, and nothing else; a client may then narrow it for longer queries
+        by matching those names, instead of asking again."""
+        self._ensure_built()
+        text = normalize(query)
+        if not text:
+            return [], False
+        scores, word_prefix = self._scores(text, prefix=True)
+        ranked = self._ranked(scores)
+        suggestions = [(self._places[place_id], self._place_names[place_id]) for place_id, _ in ranked[:limit]]
+        return suggestions, word_prefix and len(ranked) <= limit
+
+    def resolve(self, query, min_score=MIN_SCORE):
+        """The single best place for free text, or None when nothing is close enough"""
+        results = self.search(query, limit=1)
+        if results and results[0][0] >= min_score:
+            return results[0][1]
+        return None
+
+    def resolve_code(self, query, min_score=MIN_SCORE):
+        place = self.resolve(query, min_score)
+        return place.code if place else None
+
+
+place_resolver = PlaceResolver()
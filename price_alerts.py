@@ -0,0 +1,353 @@
+# price_alerts.py — price watches matched against every fresh search result
+#
+# Watches live in SQLite; each worker keeps an in-memory index from the search
+# (route, travel date, trip type, cabin and passengers) to the watches covering it,
+# sorted by max price, so a result only touches the watches it actually matches.
+# Searches hand their results to a background thread, which evaluates them and writes
+# matches to an outbox table; the outbox is delivered in batches.
+#
+# Creating a watch returns a secret token; only its hash is stored, and removing the
+# watch requires the token.
+
+import hashlib
+import hmac
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+from bisect import insort
+from collections import namedtuple
+from datetime import date, timedelta
+
+from config import ALERTS_DB_PATH, WATCH_MAX_DAYS, WATCH_SYNC_INTERVAL
+from config import get_logger
+logger = get_logger(__name__)
+
+Watch = namedtuple("Watch", ["id", "email", "origin", "destination", "date_from", "date_to", "max_price",
+                             "trip_type", "cabin_class", "adults", "children", "infants"])
+
+# Columns added after the first release; older databases get them on connect
+_ADDED_COLUMNS = (
+    ("token_hash", "TEXT"),
+    ("trip_type", "TEXT NOT NULL DEFAULT 'round-trip'"),
+    ("cabin_class", "TEXT NOT NULL DEFAULT 'economy'"),
+    ("adults", "INTEGER NOT NULL DEFAULT 1"),
+    ("children", "INTEGER NOT NULL DEFAULT 0"),
+    ("infants", "INTEGER NOT NULL DEFAULT 0"),
+    ("removed_at", "REAL"),
+)
+_WATCH_COLUMNS = ", ".join(Watch._fields)
+_INSERT_COLUMNS = Watch._fields[1:] + ("token_hash", "created_at")
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    id INTEGER PRIMARY KEY,
+    email TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    date_from TEXT NOT NULL,
+    date_to TEXT NOT NULL,
+    max_price REAL NOT NULL,
+    last_notified_price REAL,
+    active INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alert_outbox (
+    id INTEGER PRIMARY KEY,
+    watch_id INTEGER NOT NULL,
+    email TEXT NOT NULL,
+    route TEXT NOT NULL,
+    travel_date TEXT NOT NULL,
+    price REAL NOT NULL,
+    airline TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_unsent ON alert_outbox (id) WHERE sent_at IS NULL;
+"""
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_watches_removed ON watches (removed_at) WHERE removed_at IS NOT NULL;
+"""
+
+
+def _days(date_from, date_to):
+    start, end = date.fromisoformat(date_from), date.fromisoformat(date_to)
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+def _watch_keys(watch):
+    return [(watch.origin, watch.destination, day, watch.trip_type, watch.cabin_class,
+             watch.adults, watch.children, watch.infants) for day in _days(watch.date_from, watch.date_to)]
+
+
+def _spec_key(spec):
+    return (spec.origin_code, spec.destination_code, spec.date_from_str, spec.trip_type, spec.cabin_class,
+            spec.adults, spec.children, spec.infants)
+
+
+def hash_token(token):
+    return hashlib.sha256(str(token).encode("utf-8")).hexdigest()
+
+
+def _migrate(conn):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(watches)")}
+    for name, declaration in _ADDED_COLUMNS:
+        if name in existing:
+            continue
+        try:
+            conn.execute(f"ALTER TABLE watches ADD COLUMN {name} {declaration}")
+        except sqlite3.OperationalError as e:
+            if "duplicate column" not in str(e):  # another worker added it first
+                raise
+
+
+class PriceAlerts:
+    def __init__(self, path=ALERTS_DB_PATH, sync_interval=WATCH_SYNC_INTERVAL):
+        self.path = path
+        self.sync_interval = sync_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._by_day = {}   # (origin, destination, day, trip_type, cabin, adults, children, infants) -> sorted [(-max_price, watch_id)]
+        self._watches = {}  # watch_id -> Watch
+        self._max_loaded_id = 0
+        self._last_sync = 0.0
+        self._removals_checked = time.time()
+        self._pruned_for = None  # the day expired watches were last dropped
+        # Results waiting for the evaluator thread, latest per search
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._evaluator = None
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            _migrate(conn)
+            conn.executescript(_INDEXES)
+            self._local.conn = conn
+        return conn
+
+    # === Watches ===
+
+    def add_watch(self, email, origin, destination, date_from, date_to, max_price,
+                  trip_type="round-trip", cabin_class="economy", adults=1, children=0, infants=0):
+        """Store a watch; returns (watch, token), the token being needed to remove it"""
+        days = _days(date_from, date_to)  # raises ValueError on bad dates
+        if not days or len(days) > WATCH_MAX_DAYS:
+            raise ValueError(f"Date range must cover 1 to {WATCH_MAX_DAYS} days.")
+        if date_to < date.today().isoformat():
+            raise ValueError("Date range is already over.")
+        token = secrets.token_urlsafe(24)
+        values = (email, origin.upper(), destination.upper(), date_from, date_to, float(max_price),
+                  trip_type, cabin_class, int(adults), int(children), int(infants))
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                f"INSERT INTO watches ({', '.join(_INSERT_COLUMNS)}) VALUES ({', '.join('?' * len(_INSERT_COLUMNS))})",
+                (*values, hash_token(token), time.time()),
+            )
+        watch = Watch(cursor.lastrowid, *values)
+        with self._lock:
+            self._index(watch)
+        return watch, token
+
+    def remove_watch(self, watch_id, token):
+        """Deactivate a watch if `token` is the one it was created with"""
+        row = self._connect().execute(
+            "SELECT token_hash FROM watches WHERE id = ? AND active = 1", (watch_id,)
+        ).fetchone()
+        if row is None or row[0] is None or not hmac.compare_digest(row[0], hash_token(token)):
+            return False
+        conn = self._connect()
+        with conn:
+            removed = conn.execute(
+                "UPDATE watches SET active = 0, removed_at = ? WHERE id = ? AND active = 1", (time.time(), watch_id)
+            ).rowcount
+        with self._lock:
+            self._evict(watch_id)
+        return bool(removed)
+
+    def _index(self, watch, touched=None):
+        """Add `watch` to the day index; with `touched`, append unsorted and record the keys to sort"""
+        if watch.id in self._watches:
+            return
+        self._watches[watch.id] = watch
+        for key in _watch_keys(watch):
+            entries = self._by_day.setdefault(key, [])
+            if touched is None:
+                insort(entries, (-watch.max_price, watch.id))
+            else:
+                entries.append((-watch.max_price, watch.id))
+                touched.add(key)
+
+    def _evict(self, watch_id):
+        watch = self._watches.pop(watch_id, None)
+        if watch is None:
+            return
+        for key in _watch_keys(watch):
+            entries = self._by_day.get(key)
+            if entries is None:
+                continue  # day already pruned
+            entries.remove((-watch.max_price, watch.id))
+            if not entries:
+                del self._by_day[key]
+
+    def _prune_expired(self, today):
+        """Drop past days from the index, and watches whose whole range is past"""
+        self._by_day = {key: entries for key, entries in self._by_day.items() if key[2] >= today}
+        self._watches = {watch_id: watch for watch_id, watch in self._watches.items() if watch.date_to >= today}
+        self._pruned_for = today
+
+    def sync(self, force=False):
+        """Pick up watches created and removed by other workers, and drop expired ones"""
+        if not force and time.monotonic() - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = time.monotonic()
+        today = date.today().isoformat()
+        conn = self._connect()
+        rows = conn.execute(
+            f"SELECT {_WATCH_COLUMNS} FROM watches WHERE active = 1 AND id > ? AND date_to >= ?",
+            (self._max_loaded_id, today),
+        ).fetchall()
+        # A removal committed just before the previous check may carry an older timestamp
+        checked = time.time()
+        removed = conn.execute(
+            "SELECT id FROM watches WHERE removed_at >= ?", (self._removals_checked - 60,)
+        ).fetchall()
+        self._removals_checked = checked
+        with self._lock:
+            touched = set()
+            for row in rows:
+                self._index(Watch(*row), touched)
+            # Only rows read here advance the mark: a local add may have a higher id than
+            # watches other workers created since the last sync
+            if rows:
+                self._max_loaded_id = max(self._max_loaded_id, max(row[0] for row in rows))
+            for key in touched:
+                self._by_day[key].sort()
+            for (watch_id,) in removed:
+                self._evict(watch_id)
+            if self._pruned_for != today:
+                self._prune_expired(today)
+
+    # === Matching ===
+
+    def match(self, spec, price):
+        """Watches for this search whose max price is at least `price`"""
+        with self._lock:
+            entries = self._by_day.get(_spec_key(spec), ())
+            matched = []
+            for neg_max_price, watch_id in entries:
+                if -neg_max_price < price:
+                    break  # sorted by max price, descending
+                matched.append(self._watches[watch_id])
+            return matched
+
+    def evaluate(self, spec, flights):
+        """Queue an alert for every watch this result undercuts; returns how many were queued"""
+        self.sync()
+        priced = [f for f in flights if isinstance(f.get("price"), (int, float))]
+        if not priced:
+            return 0
+        cheapest = min(priced, key=lambda f: f["price"])
+        matched = self.match(spec, cheapest["price"])
+        if not matched:
+            return 0
+
+        route = f"{spec.origin_code}-{spec.destination_code}"
+        travel_date = spec.date_from_str
+        airline = cheapest.get("airline") or (cheapest.get("airlines") or [None])[0]
+        now = time.time()
+        queued = 0
+        conn = self._connect()
+        with conn:
+            for watch in matched:
+                # Only alert on a new low, and only for watches that are still active
+                updated = conn.execute(
+                    "UPDATE watches SET last_notified_price = ? WHERE id = ? AND active = 1"
+                    " AND (last_notified_price IS NULL OR last_notified_price > ?)",
+                    (cheapest["price"], watch.id, cheapest["price"]),
+                ).rowcount
+                if updated:
+                    conn.execute(
+                        "INSERT INTO alert_outbox (watch_id, email, route, travel_date, price, airline, created_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (watch.id, watch.email, route, travel_date, cheapest["price"], airline, now),
+                    )
+                    queued += 1
+        if queued:
+            logger.info(f"Queued {queued} price alert(s) for {route} on {travel_date}")
+        return queued
+
+    # === Background evaluation ===
+
+    def submit(self, spec, flights):
+        """Hand a search result to the evaluator thread; the caller never waits on SQLite"""
+        priced = [f for f in flights if isinstance(f.get("price"), (int, float))]
+        if not priced:
+            return
+        with self._pending_lock:
+            self._pending[spec] = [min(priced, key=lambda f: f["price"])]
+            # Also restarts the thread in a freshly forked worker
+            if self._evaluator is None or not self._evaluator.is_alive():
+                self._evaluator = threading.Thread(target=self._evaluate_forever, name="price-alerts", daemon=True)
+                self._evaluator.start()
+        self._wakeup.set()
+
+    def drain(self):
+        """Evaluate every submitted result; returns how many alerts were queued"""
+        with self._drain_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            queued = 0
+            for spec, flights in pending.items():
+                try:
+                    queued += self.evaluate(spec, flights)
+                except (sqlite3.Error, ValueError) as e:
+                    logger.error(f"Failed to evaluate price alerts for {spec.origin_code}-{spec.destination_code}: {e}")
+            return queued
+
+    def _evaluate_forever(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.drain()
+
+    # === Outbox ===
+
+    def deliver_pending(self, send=None, batch_size=100):
+        """Hand unsent alerts to `send(batch)` in batches and mark them sent"""
+        send = send or _log_alerts
+        conn = self._connect()
+        delivered = 0
+        while True:
+            batch = conn.execute(
+                "SELECT id, watch_id, email, route, travel_date, price, airline FROM alert_outbox"
+                " WHERE sent_at IS NULL ORDER BY id LIMIT ?",
+                (batch_size,),
+            ).fetchall()
+            if not batch:
+                return delivered
+            send(batch)
+            with conn:
+                conn.executemany("UPDATE alert_outbox SET sent_at = ? WHERE id = ?", [(time.time(), row[0]) for row in batch])
+            delivered += len(batch)
+
+
+def _log_alerts(batch):
+    for _, watch_id, email, route, travel_date, price, airline in batch:
+        logger.info(f"📣 Price alert for {email}: {route} on {travel_date} now {price} ({airline}), watch {watch_id}")
+
+
+price_alerts = PriceAlerts()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["deliver"]:
+        print(f"Delivered {price_alerts.deliver_pending()} alert(s)")
+    else:
+        print("Usage: python price_alerts.py deliver")
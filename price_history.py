@@ -0,0 +1,306 @@
+# price_history.py — price time series per route, trip type and cabin
+#
+# Every successful single-adult search appends one summary line to raw.log. Compaction
+# folds the log into one columnar block file per series (hourly points for recent data,
+# daily after that, nothing past the retention window) and trend queries memory-map
+# those blocks instead of reading raw records. A series is a route with one trip type
+# and cabin, so round-trip or business fares never show up in a one-way economy trend.
+#
+#   python price_history.py compact     # force a compaction
+
+import fcntl
+import json
+import mmap
+import os
+import re
+import statistics
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import date
+
+from config import (
+    PRICE_HISTORY_DIR,
+    PRICE_HISTORY_COMPACT_INTERVAL,
+    PRICE_HISTORY_HOURLY_WINDOW,
+    PRICE_HISTORY_RETENTION_DAYS,
+)
+from config import get_logger
+logger = get_logger(__name__)
+
+# Block layout: header, then n-length columns in this order. 8-byte columns come
+# first so every column starts aligned.
+_HEADER = struct.Struct("<4sH2xI4x")
+_MAGIC = b"FFPH"
+_VERSION = 1
+_COLUMNS = (("time", "q"), ("min", "d"), ("median", "d"), ("day", "i"), ("offers", "i"))
+
+
+_SERIES_PART = re.compile(r"[a-z_-]+")
+
+
+def series_name(origin, destination, trip_type, cabin_class):
+    """File-safe series name, or None when a part could not come from a real search"""
+    if not (origin.isalnum() and destination.isalnum()):
+        return None
+    if not (_SERIES_PART.fullmatch(trip_type) and _SERIES_PART.fullmatch(cabin_class)):
+        return None
+    return f"{origin}-{destination}.{trip_type}.{cabin_class}"
+
+
+def summarize(flights):
+    """min/median price, offer count and cheapest price per airline for one result list"""
+    priced = [f for f in flights if isinstance(f.get("price"), (int, float))]
+    if not priced:
+        return None
+    airlines = {}
+    for flight in priced:
+        airline = flight.get("airline") or (flight.get("airlines") or ["Unknown"])[0]
+        if airline not in airlines or flight["price"] < airlines[airline]:
+            airlines[airline] = flight["price"]
+    prices = [f["price"] for f in priced]
+    return {"min": min(prices), "median": statistics.median(prices), "offers": len(prices), "airlines": airlines}
+
+
+@contextmanager
+def _flock(path, mode):
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, mode)
+        yield
+    finally:
+        os.close(fd)
+
+
+class _Block:
+    """Read-only, memory-mapped view of one series' columns"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n = _HEADER.unpack_from(self._mm)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not a price history block")
+        view = memoryview(self._mm)
+        offset = _HEADER.size
+        for name, typecode in _COLUMNS:
+            size = n * array(typecode).itemsize
+            setattr(self, name, view[offset:offset + size].cast(typecode))
+            offset += size
+        self.size = n
+
+    def rows(self, start=0, stop=None):
+        stop = self.size if stop is None else stop
+        return [(self.time[i], self.day[i], self.min[i], self.median[i], self.offers[i]) for i in range(start, stop)]
+
+
+class PriceHistory:
+    def __init__(self, directory=PRICE_HISTORY_DIR, compact_interval=PRICE_HISTORY_COMPACT_INTERVAL,
+                 hourly_window=PRICE_HISTORY_HOURLY_WINDOW, retention_days=PRICE_HISTORY_RETENTION_DAYS):
+        self.directory = directory
+        self.compact_interval = compact_interval
+        self.hourly_window = hourly_window
+        self.retention_days = retention_days
+        self._last_compact = time.monotonic()
+        self._blocks = {}  # series -> (mtime_ns, _Block)
+        self._blocks_lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    # === Writing ===
+
+    def record(self, spec, flights, now=None):
+        """Append the summary of one search's results; searches for more than one adult are
+        skipped, since their prices are totals for the whole party"""
+        if (spec.adults, spec.children, spec.infants) != (1, 0, 0):
+            return None
+        series = series_name(spec.origin_code, spec.destination_code, spec.trip_type, spec.cabin_class)
+        summary = summarize(flights)
+        if summary is None or series is None:
+            return None
+        line = json.dumps({
+            "series": series,
+            "date": spec.date_from_str,
+            "time": int(now or time.time()),
+            **summary,
+        }, separators=(",", ":")) + "\n"
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Shared lock: appends from many workers may interleave, but never with the log rotation
+        with _flock(self._path("append.lock"), fcntl.LOCK_SH):
+            fd = os.open(self._path("raw.log"), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+        self.maybe_compact()
+        return summary
+
+    def maybe_compact(self):
+        if time.monotonic() - self._last_compact < self.compact_interval:
+            return
+        self._last_compact = time.monotonic()
+        threading.Thread(target=self._compact_quietly, name="price-history-compact", daemon=True).start()
+
+    def _compact_quietly(self):
+        try:
+            self.compact()
+        except Exception:
+            logger.exception("Price history compaction failed")
+
+    def compact(self, now=None):
+        """Fold raw.log into the series blocks; returns the number of raw records consumed"""
+        now = now or time.time()
+        os.makedirs(self.directory, exist_ok=True)
+        pending = self._path("raw.log.compacting")
+
+        lock_fd = os.open(self._path("compact.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0  # another worker is compacting
+
+            # A previous run may have died after rotating; finish that log first
+            if not os.path.exists(pending):
+                with _flock(self._path("append.lock"), fcntl.LOCK_EX):
+                    if not os.path.exists(self._path("raw.log")):
+                        return 0
+                    os.replace(self._path("raw.log"), pending)
+
+            by_series, airlines, consumed = {}, {}, 0
+            with open(pending, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        series = record["series"]  # lines without one mixed every trip type and cabin
+                        day = date.fromisoformat(record["date"]).toordinal()
+                    except (ValueError, KeyError):
+                        continue  # torn or foreign line
+                    consumed += 1
+                    by_series.setdefault(series, []).append(
+                        (record["time"], day, record["min"], record["median"], record["offers"])
+                    )
+                    latest = airlines.setdefault(series, {})
+                    if record["date"] not in latest or latest[record["date"]][0] <= record["time"]:
+                        latest[record["date"]] = [record["time"], record.get("airlines", {})]
+
+            for series, points in by_series.items():
+                block = self._block(series)
+                existing = block.rows() if block else []
+                self._write_block(series, self._downsample(existing + points, now))
+                self._merge_airlines(series, airlines[series], now)
+
+            os.remove(pending)
+            logger.info(f"Compacted {consumed} price records into {len(by_series)} series")
+            return consumed
+        finally:
+            os.close(lock_fd)
+
+    def _downsample(self, points, now):
+        oldest_day = date.fromtimestamp(now).toordinal() - self.retention_days
+        buckets = {}
+        for ts, day, low, median, offers in points:
+            if day < oldest_day:
+                continue
+            width = 3600 if now - ts <= self.hourly_window else 86400
+            key = (day, ts - ts % width)
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [low, [median], offers]
+            else:
+                bucket[0] = min(bucket[0], low)
+                bucket[1].append(median)
+                bucket[2] = max(bucket[2], offers)
+        # Sorted by travel day first so queries can bisect the day column
+        return [(ts, day, low, statistics.median(medians), offers)
+                for (day, ts), (low, medians, offers) in sorted(buckets.items())]
+
+    def _write_block(self, series, points):
+        columns = [array(typecode) for _, typecode in _COLUMNS]
+        for ts, day, low, median, offers in points:
+            for column, value in zip(columns, (ts, low, median, day, offers)):
+                column.append(value)
+        tmp = self._path(f"{series}.blk.tmp")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, len(points)))
+            for column in columns:
+                column.tofile(f)
+        os.replace(tmp, self._path(f"{series}.blk"))  # readers keep their old mapping
+
+    def _merge_airlines(self, series, latest, now):
+        path = self._path(f"{series}.airlines.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                merged = json.load(f)
+        except (OSError, ValueError):
+            merged = {}
+        for day, (ts, mins) in latest.items():
+            if day not in merged or merged[day][0] <= ts:
+                merged[day] = [ts, mins]
+        oldest = date.fromordinal(date.fromtimestamp(now).toordinal() - self.retention_days).isoformat()
+        merged = {day: mins for day, mins in merged.items() if day >= oldest}
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(merged, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+
+    # === Reading ===
+
+    def _block(self, series):
+        path = self._path(f"{series}.blk")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._blocks_lock:
+            cached = self._blocks.get(series)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, _Block(path))
+                self._blocks[series] = cached
+            return cached[1]
+
+    def trend(self, origin, destination, travel_date=None, trip_type="round-trip", cabin_class="economy"):
+        """Compacted price points for one series, optionally for one travel date, oldest first"""
+        series = series_name(origin, destination, trip_type, cabin_class)
+        if series is None:
+            return []
+        block = self._block(series)
+        if block is None:
+            return []
+        if travel_date:
+            day = date.fromisoformat(travel_date).toordinal()
+            rows = block.rows(bisect_left(block.day, day), bisect_right(block.day, day))
+        else:
+            rows = block.rows()
+        return [{
+            "date": date.fromordinal(day).isoformat(),
+            "time": ts,
+            "min": low,
+            "median": median,
+            "offers": offers,
+        } for ts, day, low, median, offers in rows]
+
+    def airline_mins(self, origin, destination, travel_date, trip_type="round-trip", cabin_class="economy"):
+        series = series_name(origin, destination, trip_type, cabin_class)
+        if series is None:
+            return {}
+        try:
+            with open(self._path(f"{series}.airlines.json"), "r", encoding="utf-8") as f:
+                return json.load(f).get(travel_date, [0, {}])[1]
+        except (OSError, ValueError):
+            return {}
+
+
+price_history = PriceHistory()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["compact"]:
+        print(f"Compacted {price_history.compact()} record(s)")
+    else:
+        print("Usage: python price_history.py compact")
@@ -0,0 +1,47 @@
+# price_index.py — cheapest known price per search spec (route, dates, trip type, cabin, passengers)
+
+import threading
+import time
+
+from config import MIN_PRICE_INDEX_TTL
+
+
+class MinPriceIndex:
+    """Updated from every successful search so "anywhere" lookups never rescan result lists.
+    Entries are keyed by the full SearchSpec: a round-trip, business or 3-adult price is
+    never returned for a one-way economy single-adult lookup."""
+
+    def __init__(self, ttl=MIN_PRICE_INDEX_TTL):
+        self.ttl = ttl
+        self._prices = {}  # SearchSpec -> entry dict
+        self._lock = threading.Lock()
+
+    def record(self, spec, flights, source="live"):
+        prices = [f for f in flights if isinstance(f.get("price"), (int, float))]
+        if not prices:
+            return None
+        cheapest = min(prices, key=lambda f: f["price"])
+        entry = {
+            "price": cheapest["price"],
+            "currency": cheapest.get("currency"),
+            "airline": cheapest.get("airline") or (cheapest.get("airlines") or [None])[0],
+            "source": source,
+            "recorded_at": time.time(),
+        }
+        with self._lock:
+            self._prices[spec] = entry
+        return entry
+
+    def lookup(self, spec):
+        with self._lock:
+            entry = self._prices.get(spec)
+        if entry is None or time.time() - entry["recorded_at"] > self.ttl:
+            return None
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._prices.clear()
+
+
+min_price_index = MinPriceIndex()
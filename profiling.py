@@ -0,0 +1,248 @@
+# profiling.py — opt-in per-request profiling and automatic capture of slow requests
+#
+# A request is profiled when it sends "X-Profile: <PROFILING_SECRET>" or the signed
+# query parameter "_profile=<profile_signature(path)>". The response body is then
+# replaced by the profile: folded stacks ("frame;frame;frame count" lines, readable by
+# flamegraph.pl and speedscope) from a sampling profiler, or cProfile statistics with
+# "_profile_mode=cprofile" (which only sees the request thread, so suits sync views).
+#
+# Independently, a watchdog thread snapshots the stack of any request that runs longer
+# than SLOW_REQUEST_THRESHOLD seconds; finished slow requests land in a bounded ring
+# buffer together with their phase timings (upstream, normalize, render).
+
+import cProfile
+import hashlib
+import hmac
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from flask import Response, before_render_template, g, has_request_context, request, template_rendered
+
+from config import PROFILING_SECRET, PROFILE_SAMPLE_INTERVAL, SLOW_REQUEST_THRESHOLD, SLOW_REQUEST_BUFFER
+from config import get_logger
+logger = get_logger(__name__)
+
+slow_requests = deque(maxlen=SLOW_REQUEST_BUFFER)
+_inflight = {}  # thread id -> request record, for the watchdog
+_inflight_lock = threading.Lock()
+_watchdog = None
+_watchdog_pid = None
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def profile_signature(path, secret=None):
+    """Value of the _profile query parameter that enables profiling for `path`"""
+    secret = secret or PROFILING_SECRET
+    return hmac.new(secret.encode("utf-8"), path.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+
+def _profiling_requested():
+    if not PROFILING_SECRET:
+        return False
+    header = request.headers.get("X-Profile", "")
+    if header and hmac.compare_digest(header, PROFILING_SECRET):
+        return True
+    signature = request.args.get("_profile", "")
+    return bool(signature) and hmac.compare_digest(signature, profile_signature(request.path))
+
+
+# === Phase timings ===
+
+@contextmanager
+def timed_phase(name):
+    """Add the time spent in the block to the current request's phase timings (no-op elsewhere)"""
+    if not has_request_context():
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = g.setdefault("phase_timings", {})
+        timings[name] = round(timings.get(name, 0.0) + time.perf_counter() - started, 4)
+
+
+def _render_started(sender, template, context, **extra):
+    g.setdefault("render_started", []).append(time.perf_counter())
+
+
+def _render_finished(sender, template, context, **extra):
+    stack = g.get("render_started")
+    if stack:
+        timings = g.setdefault("phase_timings", {})
+        timings["render"] = round(timings.get("render", 0.0) + time.perf_counter() - stack.pop(), 4)
+
+
+# === Sampling profiler ===
+
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval into folded-stack counts.
+
+    All threads are sampled because searches fan out to pools (multi-city legs, batch
+    items, background refreshes); each stack is rooted at its thread name. Under a sync
+    worker (one request at a time) that is exactly the request's work."""
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+# === Slow-request watchdog ===
+
+def _watch():
+    while True:
+        time.sleep(min(0.1, SLOW_REQUEST_THRESHOLD / 4))
+        now = time.perf_counter()
+        with _inflight_lock:
+            overdue = [(tid, record) for tid, record in _inflight.items()
+                       if record["stacks"] is None and now - record["started"] > SLOW_REQUEST_THRESHOLD]
+        if not overdue:
+            continue
+        stacks = _busy_stacks()
+        for thread_id, record in overdue:
+            record["stacks"] = stacks
+            record["stack_at"] = round(now - record["started"], 3)
+
+
+def _busy_stacks():
+    """{thread name: formatted stack} for every thread currently inside this project's code.
+    Searches fan out to thread pools, so every thread is checked;
+    idle pool threads (parked in the standard library) are left out."""
+    names = {t.ident: t.name for t in threading.enumerate()}
+    stacks = {}
+    for thread_id, frame in sys._current_frames().items():
+        if thread_id == threading.get_ident():
+            continue
+        summary = traceback.extract_stack(frame)
+        if any(entry.filename.startswith(_PROJECT_DIR) and "site-packages" not in entry.filename for entry in summary):
+            stacks[names.get(thread_id, str(thread_id))] = traceback.format_list(summary)
+    return stacks
+
+
+def _ensure_watchdog():
+    """One watchdog per process; started lazily so it exists in every forked worker"""
+    global _watchdog, _watchdog_pid
+    if _watchdog_pid != os.getpid() or _watchdog is None or not _watchdog.is_alive():
+        with _inflight_lock:
+            if _watchdog_pid != os.getpid() or _watchdog is None or not _watchdog.is_alive():
+                _watchdog = threading.Thread(target=_watch, name="slow-request-watchdog", daemon=True)
+                _watchdog.start()
+                _watchdog_pid = os.getpid()
+
+
+# === Request hooks ===
+
+def _before_request():
+    _ensure_watchdog()
+    g.request_started = time.perf_counter()
+    with _inflight_lock:
+        _inflight[threading.get_ident()] = g.slow_record = {
+            "method": request.method, "path": request.full_path.rstrip("?"),
+            "started": g.request_started, "stacks": None,
+        }
+
+    if _profiling_requested():
+        if request.args.get("_profile_mode") == "cprofile":
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                g.profiler = profiler
+            except ValueError:
+                logger.warning("cProfile is already active in this process; request not profiled")
+        else:
+            g.profiler = SamplingProfiler()
+            g.profiler.start()
+
+
+def _after_request(response):
+    with _inflight_lock:
+        _inflight.pop(threading.get_ident(), None)
+    duration = time.perf_counter() - g.get("request_started", time.perf_counter())
+
+    record = g.get("slow_record")
+    if record is not None and duration > SLOW_REQUEST_THRESHOLD:
+        slow_requests.append({
+            "method": record["method"],
+            "path": record["path"],
+            "status": response.status_code,
+            "duration": round(duration, 3),
+            "at": time.time(),
+            "phases": g.get("phase_timings", {}),
+            "stack_at": record.get("stack_at"),
+            "stacks": record["stacks"] or {},
+        })
+        logger.warning(f"Slow request {record['method']} {record['path']}: {duration:.2f}s {g.get('phase_timings', {})}")
+
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    if isinstance(profiler, SamplingProfiler):
+        profiler.stop()
+        body = profiler.folded()
+    else:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(60)
+        body = out.getvalue()
+    profiled = Response(body, mimetype="text/plain")
+    profiled.headers["X-Profiled-Status"] = str(response.status_code)
+    profiled.headers["X-Profiled-Duration"] = f"{duration:.4f}"
+    profiled.headers["Cache-Control"] = "no-store"
+    return profiled
+
+
+def _teardown_request(exc):
+    """Clean up after requests whose view raised, where after_request never ran"""
+    with _inflight_lock:
+        _inflight.pop(threading.get_ident(), None)
+    profiler = g.pop("profiler", None)
+    if isinstance(profiler, SamplingProfiler):
+        profiler.stop()
+    elif profiler is not None:
+        profiler.disable()
+
+
+def init_profiling(app):
+    """Install the request hooks on `app`"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
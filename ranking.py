@@ -0,0 +1,157 @@
+# ranking.py — multi-criteria ranking of offers: weighted scores per sort mode plus the Pareto front
+#
+# Every criterion maps an offer to a number where lower is better. One pass extracts
+# all criteria, min-max normalizes them and scores each sort mode; the Pareto front
+# over price, duration and stops comes from a single sort (skyline). Criteria and
+# modes are plain dicts, so new ones can be registered without touching the engine.
+
+import heapq
+import re
+from datetime import datetime
+
+from config import get_logger
+logger = get_logger(__name__)
+
+_DURATION = re.compile(r"(?:(\d+)\s*h)?\s*(?:(\d+)\s*m)?", re.IGNORECASE)
+_CLOCK = re.compile(r"(\d{1,2}):(\d{2})")
+PREFERRED_DEPARTURE = (8 * 60, 20 * 60)  # minutes after midnight; nothing is penalized inside
+
+
+def duration_minutes(flight):
+    """Total duration in minutes from the API's integer or the mock's "6h 30m" string"""
+    value = flight.get("duration")
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _DURATION.fullmatch(str(value or "").strip())
+    if match and any(match.groups()):
+        return float(int(match.group(1) or 0) * 60 + int(match.group(2) or 0))
+    return float("inf")
+
+
+def departure_minutes(flight):
+    """Minutes after midnight of the outbound departure, or None"""
+    value = flight.get("depart") or flight.get("departure")
+    if isinstance(value, datetime):
+        return value.hour * 60 + value.minute
+    match = _CLOCK.search(str(value or ""))
+    return int(match.group(1)) * 60 + int(match.group(2)) if match else None
+
+
+def departure_penalty(flight):
+    """Minutes outside the preferred departure window (red-eyes and dawn flights)"""
+    minutes = departure_minutes(flight)
+    if minutes is None:
+        return 0.0
+    start, end = PREFERRED_DEPARTURE
+    return float(max(start - minutes, minutes - end, 0))
+
+
+def price(flight):
+    value = flight.get("price")
+    return float(value) if isinstance(value, (int, float)) else float("inf")
+
+
+def stops(flight):
+    return float(flight.get("stops") or 0)
+
+
+CRITERIA = {
+    "price": price,
+    "duration": duration_minutes,
+    "stops": stops,
+    "departure": departure_penalty,
+}
+
+SORT_MODES = {
+    "cheapest": {"price": 1.0, "duration": 0.001},  # small tie-breaker
+    "fastest": {"duration": 1.0, "price": 0.001},
+    "best": {"price": 0.5, "duration": 0.3, "stops": 0.15, "departure": 0.05},
+}
+DEFAULT_SORT = "cheapest"
+
+
+def register_criterion(name, extract):
+    """Add a criterion; `extract(flight)` returns a number, lower is better"""
+    CRITERIA[name] = extract
+
+
+def register_sort_mode(name, weights):
+    unknown = set(weights) - set(CRITERIA)
+    if unknown:
+        raise ValueError(f"Unknown ranking criteria: {', '.join(sorted(unknown))}")
+    SORT_MODES[name] = dict(weights)
+
+
+def _normalize(values):
+    """Scale to 0..1; unknown (infinite) values score worst"""
+    known = [v for v in values if v != float("inf")]
+    low, high = (min(known), max(known)) if known else (0.0, 0.0)
+    span = (high - low) or 1.0
+    return [1.0 if v == float("inf") else (v - low) / span for v in values]
+
+
+def pareto_front(flights, _raw=None):
+    """Indexes of offers no other offer beats on price, duration and stops at once.
+
+    Skyline in one sort: after ordering by price, an offer is dominated only by an
+    earlier one, and stop counts are a handful of values, so remembering the
+    shortest duration seen per stop count makes each check constant time."""
+    raw = _raw or {name: [CRITERIA[name](f) for f in flights] for name in ("price", "duration", "stops")}
+    points = sorted(zip(raw["price"], raw["duration"], raw["stops"], range(len(flights))))
+    shortest = {}  # stops -> (shortest duration, price of the first offer with it)
+    front = []
+    for cost, minutes, stop_count, index in points:
+        dominated = False
+        for level, (best_minutes, best_cost) in shortest.items():
+            if level > stop_count or best_minutes > minutes:
+                continue
+            if best_minutes < minutes or level < stop_count or best_cost < cost:
+                dominated = True
+                break
+        if not dominated:
+            front.append(index)
+        current = shortest.get(stop_count)
+        if current is None or minutes < current[0]:
+            shortest[stop_count] = (minutes, cost)
+    return front
+
+
+def rank(flights, modes=(DEFAULT_SORT,), k=None):
+    """Top-`k` offers per sort mode from one shared computation.
+
+    Returns {mode: [offer, ...], "pareto": [offer, ...]}; returned offers are
+    copies carrying "score" (0 is ideal) and "pareto" keys."""
+    flights = list(flights)
+    if not flights:
+        return {**{mode: [] for mode in modes}, "pareto": []}
+    k = k or len(flights)
+
+    # Each criterion is extracted once and shared by every mode and the skyline
+    weights = {mode: SORT_MODES[mode] for mode in modes}
+    names = {name for mode_weights in weights.values() for name in mode_weights} | {"price", "duration", "stops"}
+    raw = {name: [CRITERIA[name](f) for f in flights] for name in names}
+    columns = {name: _normalize(values) for name, values in raw.items()}
+    on_front = set(pareto_front(flights, raw))
+
+    def decorate(index, score):
+        return {**flights[index], "score": round(score, 4), "pareto": index in on_front}
+
+    ranked = {}
+    for mode, mode_weights in weights.items():
+        total = sum(mode_weights.values())
+        scores = [0.0] * len(flights)
+        for name, weight in mode_weights.items():
+            share = weight / total
+            scores = [score + share * value for score, value in zip(scores, columns[name])]
+        top = heapq.nsmallest(k, range(len(flights)), key=scores.__getitem__)
+        ranked[mode] = [decorate(i, scores[i]) for i in top]
+
+    ranked["pareto"] = [{**flights[i], "pareto": True} for i in sorted(on_front, key=raw["price"].__getitem__)]
+    return ranked
+
+
+def sort_offers(flights, mode=DEFAULT_SORT, k=None):
+    """Offers ordered by one sort mode (unknown modes fall back to the default)"""
+    if mode not in SORT_MODES:
+        mode = DEFAULT_SORT
+    return rank(flights, modes=(mode,), k=k)[mode]
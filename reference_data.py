@@ -0,0 +1,273 @@
+# reference_data.py — airports, cities/metro areas and airline names compiled into one memory-mapped file
+#
+# Sources: airports.json, iata_codes.city_to_iata (metro codes) and mock_data.AIRLINE_NAMES.
+# The compiled file holds fixed-size records sorted by key plus a shared string table,
+# so every worker maps the same pages and lookups are a binary search.
+#
+#   python reference_data.py build      # regenerate after editing a source table
+
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from bisect import bisect_left
+
+from config import REFERENCE_DATA_PATH
+from config import get_logger
+logger = get_logger(__name__)
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_FILES = [os.path.join(SOURCE_DIR, name) for name in ("airports.json", "iata_codes.py", "mock_data.py")]
+
+_MAGIC = b"FFRD"
+_VERSION = 1
+# magic, version, airport/city/airline/city-airport counts
+_HEADER = struct.Struct("<4sHxxIIII")
+# iata, metro code, name (offset, length), city (offset, length)
+_AIRPORT = struct.Struct("<4s4sIHIH")
+# lowercase city name, display name (offset, length each), code used for searches,
+# first index into the city-airports array, count
+_CITY = struct.Struct("<IHIH4sIH")
+# code, name (offset, length)
+_AIRLINE = struct.Struct("<4sIH")
+_INDEX = struct.Struct("<H")
+
+
+def _code(value):
+    return value.upper().encode("ascii").ljust(4, b"\0")
+
+
+def _lookup_code(value):
+    """Padded key for a code lookup, or None for input that cannot be a code"""
+    value = (value or "").strip()
+    if not value or len(value) > 4 or not value.isascii():
+        return None
+    return _code(value)
+
+
+class _StringTable:
+    def __init__(self):
+        self.data = bytearray()
+        self._offsets = {}
+
+    def add(self, text):
+        raw = text.encode("utf-8")
+        if raw not in self._offsets:
+            self._offsets[raw] = len(self.data)
+            self.data += raw
+        return self._offsets[raw], len(raw)
+
+
+def load_sources():
+    """(airports, city -> code, airline code -> name) from the source tables"""
+    from iata_codes import city_to_iata
+    from mock_data import AIRLINE_NAMES
+    with open(SOURCE_FILES[0], "r", encoding="utf-8") as f:
+        airports = json.load(f)
+    return airports, city_to_iata, AIRLINE_NAMES
+
+
+def build(path=REFERENCE_DATA_PATH, sources=None):
+    """Compile the source tables into `path`; returns (airports, cities, airlines) counts"""
+    airports, city_codes, airline_names = sources or load_sources()
+    strings = _StringTable()
+
+    airports = sorted({a["iata"].upper(): a for a in airports}.values(), key=lambda a: a["iata"].upper())
+    position = {a["iata"].upper(): i for i, a in enumerate(airports)}
+
+    cities = {}  # lowercase name -> [display name, code, airport indexes]
+    for name, code in city_codes.items():
+        cities[name.lower()] = [name.title(), code.upper(), []]
+    for a in airports:
+        entry = cities.setdefault(a["city"].lower(), [a["city"], a["iata"].upper(), []])
+        entry[0] = a["city"]
+        entry[2].append(position[a["iata"].upper()])
+
+    airport_records = bytearray()
+    for a in airports:
+        iata = a["iata"].upper()
+        metro = cities[a["city"].lower()][1]
+        airport_records += _AIRPORT.pack(_code(iata), _code(metro if metro != iata else ""),
+                                         *strings.add(a["name"]), *strings.add(a["city"]))
+
+    city_records, city_airports = bytearray(), bytearray()
+    for name in sorted(cities, key=lambda n: n.encode("utf-8")):
+        display, code, indexes = cities[name]
+        city_records += _CITY.pack(*strings.add(name), *strings.add(display), _code(code),
+                                   len(city_airports) // _INDEX.size, len(indexes))
+        for index in indexes:
+            city_airports += _INDEX.pack(index)
+
+    airlines = {code.upper(): name for code, name in airline_names.items()}
+    airline_records = bytearray()
+    for code in sorted(airlines):
+        airline_records += _AIRLINE.pack(_code(code), *strings.add(airlines[code]))
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(airports), len(cities), len(airlines), len(city_airports) // _INDEX.size))
+        for section in (airport_records, city_records, airline_records, city_airports, strings.data):
+            f.write(section)
+    os.replace(tmp, path)  # workers that already mapped the old file keep it
+    return len(airports), len(cities), len(airlines)
+
+
+class _Keys:
+    """Sequence view of the sort keys of one record section, for bisect"""
+
+    def __init__(self, key_at, size):
+        self._key_at = key_at
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        return self._key_at(i)
+
+
+class ReferenceData:
+    def __init__(self, path=REFERENCE_DATA_PATH, auto_build=True):
+        self.path = path
+        self.auto_build = auto_build
+        self._mm = None
+        self._lock = threading.Lock()
+
+    def _map(self):
+        if self._mm is not None:
+            return self._mm
+        with self._lock:
+            if self._mm is None:
+                if self.auto_build and self._is_stale():
+                    logger.info(f"Building reference data into {self.path}")
+                    build(self.path)
+                with open(self.path, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, version, *counts = _HEADER.unpack_from(mm)
+                if magic != _MAGIC or version != _VERSION:
+                    raise ValueError(f"{self.path} is not a reference data file")
+                self._layout(counts)
+                self.version = f"{zlib.crc32(mm):08x}"  # changes whenever the compiled data does
+                self._mm = mm
+        return self._mm
+
+    def get_version(self):
+        self._map()
+        return self.version
+
+    def _is_stale(self):
+        try:
+            built = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return True
+        return any(os.stat(source).st_mtime > built for source in SOURCE_FILES if os.path.exists(source))
+
+    def _layout(self, counts):
+        self.n_airports, self.n_cities, self.n_airlines, n_city_airports = counts
+        self._airports_at = _HEADER.size
+        self._cities_at = self._airports_at + self.n_airports * _AIRPORT.size
+        self._airlines_at = self._cities_at + self.n_cities * _CITY.size
+        self._city_airports_at = self._airlines_at + self.n_airlines * _AIRLINE.size
+        self._strings_at = self._city_airports_at + n_city_airports * _INDEX.size
+
+    def reload(self):
+        """Drop the current mapping; the next lookup maps (and if needed rebuilds) the file again"""
+        with self._lock:
+            self._mm = None
+
+    # === Record access ===
+
+    def _string(self, offset, length):
+        start = self._strings_at + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _airport(self, i):
+        iata, metro, name_off, name_len, city_off, city_len = _AIRPORT.unpack_from(self._mm, self._airports_at + i * _AIRPORT.size)
+        return {
+            "iata": iata.rstrip(b"\0").decode("ascii"),
+            "name": self._string(name_off, name_len),
+            "city": self._string(city_off, city_len),
+            "metro": metro.rstrip(b"\0").decode("ascii") or None,
+        }
+
+    def _find(self, size, key_at, key):
+        keys = _Keys(key_at, size)
+        i = bisect_left(keys, key)
+        if i < size and keys[i] == key:
+            return i
+        return None
+
+    # === Lookups ===
+
+    def airport(self, iata):
+        """Airport dict by IATA code, or None"""
+        mm = self._map()
+        key = _lookup_code(iata)
+        if key is None:
+            return None
+        start = self._airports_at
+        i = self._find(self.n_airports, lambda j: mm[start + j * _AIRPORT.size:start + j * _AIRPORT.size + 4], key)
+        return self._airport(i) if i is not None else None
+
+    def airports(self):
+        """Every airport, in IATA order"""
+        self._map()
+        return [self._airport(i) for i in range(self.n_airports)]
+
+    def city(self, name):
+        """{"city", "code", "airports": [iata, ...]} for a city name (case-insensitive), or None"""
+        mm = self._map()
+        key = (name or "").strip().lower().encode("utf-8")
+
+        def city_name(j):
+            name_off, name_len = struct.unpack_from("<IH", mm, self._cities_at + j * _CITY.size)
+            return mm[self._strings_at + name_off:self._strings_at + name_off + name_len]
+
+        i = self._find(self.n_cities, city_name, key)
+        return self._city(i) if i is not None else None
+
+    def cities(self):
+        """Every city, in name order"""
+        self._map()
+        return [self._city(i) for i in range(self.n_cities)]
+
+    def _city(self, i):
+        mm = self._mm
+        _, _, display_off, display_len, code, first, count = _CITY.unpack_from(mm, self._cities_at + i * _CITY.size)
+        indexes = [_INDEX.unpack_from(mm, self._city_airports_at + (first + k) * _INDEX.size)[0] for k in range(count)]
+        return {
+            "city": self._string(display_off, display_len),
+            "code": code.rstrip(b"\0").decode("ascii"),
+            "airports": [self._airport(index)["iata"] for index in indexes],
+        }
+
+    def city_code(self, name):
+        """Search code for a city name (metro code where one exists), or None"""
+        city = self.city(name)
+        return city["code"] if city else None
+
+    def airline_name(self, code, default=None):
+        mm = self._map()
+        key = _lookup_code(code)
+        if key is None:
+            return default
+        start = self._airlines_at
+        i = self._find(self.n_airlines, lambda j: mm[start + j * _AIRLINE.size:start + j * _AIRLINE.size + 4], key)
+        if i is None:
+            return default
+        _, name_off, name_len = _AIRLINE.unpack_from(mm, self._airlines_at + i * _AIRLINE.size)
+        return self._string(name_off, name_len)
+
+
+reference_data = ReferenceData()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["build"]:
+        airports, cities, airlines = build()
+        print(f"Built {REFERENCE_DATA_PATH}: {airports} airports, {cities} cities, {airlines} airlines")
+    else:
+        print("Usage: python reference_data.py build")
@@ -0,0 +1,22 @@
+# render_cache.py — caches rendered HTML fragments that are identical for every user of a search
+
+from flask import render_template
+from markupsafe import Markup
+
+from search_cache import SearchCache
+from config import SEARCH_CACHE_TTL, FRAGMENT_CACHE_MAX_ENTRIES
+from config import get_logger
+logger = get_logger(__name__)
+
+fragment_cache = SearchCache(ttl=SEARCH_CACHE_TTL, max_entries=FRAGMENT_CACHE_MAX_ENTRIES)
+
+
+def render_cached_fragment(template_name, cache_key, **context):
+    """Render `template_name` once per `cache_key` and reuse the markup afterwards.
+    The key must change whenever the data behind the fragment changes."""
+    key = f"{template_name}:{cache_key}"
+    html = fragment_cache.get(key)
+    if html is None:
+        html = Markup(render_template(template_name, **context))
+        fragment_cache.set(key, html)
+    return html
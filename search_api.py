@@ -0,0 +1,207 @@
+# search_api.py — request parsing and compact, cacheable JSON responses for the search API
+
+import gzip
+import hashlib
+import json
+import re
+from datetime import datetime
+
+from flask import Response, request
+
+try:
+    import brotli  # optional, gives ~15-20% smaller bodies than gzip
+except ImportError:
+    brotli = None
+
+from config import MULTI_CITY_MAX_SEGMENTS
+from config import get_logger
+logger = get_logger(__name__)
+
+API_MAX_OFFERS = 500
+API_DEFAULT_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_CACHE_CONTROL = "public, max-age=60, must-revalidate"
+MIN_COMPRESS_BYTES = 512
+
+DEFAULT_FIELDS = ["id", "price", "currency", "airline", "depart", "return", "duration", "stops", "link"]
+ALLOWED_FIELDS = set(DEFAULT_FIELDS) | {
+    "flight_number", "cabin_class", "vendor", "origin", "destination", "trip_type", "score", "pareto",
+    "arrive", "segments", "separate_tickets",
+}
+CABIN_CLASSES = {"economy", "business", "first"}
+TRIP_TYPES = {"one-way", "round-trip"}
+IATA_PATTERN = re.compile(r"^[A-Z]{3}$")
+
+
+def _as_bool(value):
+    return str(value).lower() in ("1", "true", "on", "yes")
+
+
+def _as_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_search_request(data):
+    """Validate a search spec from query args or a JSON object.
+    Returns (params, errors); params holds search_flights keyword arguments."""
+    errors = []
+    origin = str(data.get("origin", "")).strip().upper()
+    destination = str(data.get("destination", "")).strip().upper()
+    date_from = str(data.get("date_from", "")).strip()
+    date_to = str(data.get("date_to", "") or "").strip()
+    trip_type = str(data.get("trip_type", "round-trip")).strip()
+    cabin_class = str(data.get("cabin_class", "economy")).strip().lower()
+    adults = _as_int(data.get("adults", 1), 0)
+
+    if not IATA_PATTERN.match(origin):
+        errors.append("origin must be a 3-letter IATA code.")
+    if not IATA_PATTERN.match(destination):
+        errors.append("destination must be a 3-letter IATA code.")
+    if trip_type not in TRIP_TYPES:
+        errors.append("trip_type must be one-way or round-trip.")
+    if cabin_class not in CABIN_CLASSES:
+        errors.append("cabin_class must be economy, business or first.")
+    if adults < 1:
+        errors.append("adults must be at least 1.")
+
+    try:
+        departure = datetime.strptime(date_from, "%Y-%m-%d")
+    except ValueError:
+        errors.append("date_from must be YYYY-MM-DD.")
+        departure = None
+    if trip_type == "round-trip":
+        try:
+            returning = datetime.strptime(date_to, "%Y-%m-%d")
+            if departure and returning < departure:
+                errors.append("date_to must be after date_from.")
+        except ValueError:
+            errors.append("date_to must be YYYY-MM-DD for round-trip.")
+    else:
+        date_to = ""
+
+    params = {
+        "origin_code": origin,
+        "destination_code": destination,
+        "date_from_str": date_from,
+        "date_to_str": date_to,
+        "trip_type": trip_type,
+        "adults": adults,
+        "children": _as_int(data.get("children", 0), 0),
+        "infants": _as_int(data.get("infants", 0), 0),
+        "cabin_class": cabin_class,
+        "direct_only": _as_bool(data.get("direct_only", False)),
+    }
+    return params, errors
+
+
+def parse_multi_city_request(data):
+    """Validate {"legs": [{"origin", "destination", "date"}, ...], "adults", ...}.
+    Returns (params, errors); params holds multi_city.search_multi_city keyword arguments."""
+    errors = []
+    raw_legs = data.get("legs")
+    if not isinstance(raw_legs, list) or not 2 <= len(raw_legs) <= MULTI_CITY_MAX_SEGMENTS:
+        return {}, [f"legs must be a list of 2 to {MULTI_CITY_MAX_SEGMENTS} flights."]
+
+    legs, previous = [], None
+    for number, leg in enumerate(raw_legs, 1):
+        leg = leg if isinstance(leg, dict) else {}
+        origin = str(leg.get("origin", "")).strip().upper()
+        destination = str(leg.get("destination", "")).strip().upper()
+        date = str(leg.get("date", "")).strip()
+        if not IATA_PATTERN.match(origin) or not IATA_PATTERN.match(destination):
+            errors.append(f"leg {number}: origin and destination must be 3-letter IATA codes.")
+        try:
+            day = datetime.strptime(date, "%Y-%m-%d")
+            if previous and day < previous:
+                errors.append(f"leg {number}: date must not be before the previous leg.")
+            previous = day
+        except ValueError:
+            errors.append(f"leg {number}: date must be YYYY-MM-DD.")
+        legs.append((origin, destination, date))
+
+    cabin_class = str(data.get("cabin_class", "economy")).strip().lower()
+    if cabin_class not in CABIN_CLASSES:
+        errors.append("cabin_class must be economy, business or first.")
+    adults = _as_int(data.get("adults", 1), 0)
+    if adults < 1:
+        errors.append("adults must be at least 1.")
+
+    params = {
+        "legs": legs,
+        "adults": adults,
+        "children": _as_int(data.get("children", 0), 0),
+        "infants": _as_int(data.get("infants", 0), 0),
+        "cabin_class": cabin_class,
+    }
+    return params, errors
+
+
+def parse_fields(raw):
+    """Comma-separated field list -> validated list, defaulting to DEFAULT_FIELDS"""
+    if not raw:
+        return DEFAULT_FIELDS
+    fields = [f.strip() for f in raw.split(",") if f.strip() in ALLOWED_FIELDS]
+    return fields or DEFAULT_FIELDS
+
+
+def shape_offers(offers, fields, page, page_size):
+    start = (page - 1) * page_size
+    return [{field: offer.get(field) for field in fields} for offer in offers[start:start + page_size]]
+
+
+# === Conditional, compressed responses ===
+
+def _pick_encoding():
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(candidates)
+
+
+def _variant_etag(etag, encoding):
+    # Encoded bodies differ byte-for-byte, so each encoding gets its own strong ETag
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def make_etag(*parts):
+    return hashlib.sha1(":".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def not_modified_response(etag, cache_control=API_CACHE_CONTROL):
+    """A 304 response if the client already holds `etag` (for the encoding it accepts), else None"""
+    # Small bodies are sent uncompressed, so the plain ETag is also a valid match
+    for candidate in (_variant_etag(etag, _pick_encoding()), etag):
+        if request.if_none_match.contains(candidate):
+            break
+    else:
+        return None
+    response = Response(status=304)
+    response.set_etag(candidate)
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def compact_json_response(payload, etag=None, status=200, cache_control=API_CACHE_CONTROL):
+    """Whitespace-free JSON with a strong ETag, compressed when the client accepts it"""
+    body = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    if etag is None:
+        etag = hashlib.sha1(body).hexdigest()
+        cached = not_modified_response(etag, cache_control)
+        if cached is not None:
+            return cached
+
+    encoding = _pick_encoding() if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding == "br":
+        body = brotli.compress(body, quality=5)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=6)
+
+    response = Response(body, status=status, mimetype="application/json")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.set_etag(_variant_etag(etag, encoding))
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    return response
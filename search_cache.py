@@ -0,0 +1,108 @@
+# search_cache.py — in-process TTL cache for normalized flight search results
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from config import SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES
+from config import get_logger
+logger = get_logger(__name__)
+
+
+# Everything that changes what the upstream returns. `limit` and `direct_only`
+# are applied after the lookup, so they are deliberately not part of the key.
+SearchSpec = namedtuple(
+    "SearchSpec",
+    ["origin_code", "destination_code", "date_from_str", "date_to_str", "trip_type",
+     "adults", "children", "infants", "cabin_class"],
+)
+
+
+def make_search_spec(origin_code, destination_code, date_from_str, date_to_str, trip_type,
+                     adults=1, children=0, infants=0, cabin_class="economy"):
+    return SearchSpec(
+        (origin_code or "").upper(),
+        (destination_code or "").upper(),
+        date_from_str or "",
+        (date_to_str or "") if trip_type != "one-way" else "",
+        trip_type or "round-trip",
+        int(adults),
+        int(children),
+        int(infants),
+        (cabin_class or "economy").lower(),
+    )
+
+
+def make_search_key(spec: SearchSpec) -> str:
+    return ":".join(str(part) for part in spec)
+
+
+def parse_search_key(key):
+    """Inverse of make_search_key; raises ValueError for anything that is not a search key"""
+    parts = str(key).split(":")
+    if len(parts) != len(SearchSpec._fields):
+        raise ValueError(f"Not a search key: {key!r}")
+    return make_search_spec(*parts)
+
+
+class SearchCache:
+    """Thread-safe LRU with a per-entry TTL, holding full price-sorted result lists"""
+
+    def __init__(self, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (stored_at, flights)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return None if entry is None else entry[1]
+
+    def get_entry(self, key):
+        """Return (stored_at, flights) for a fresh entry, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, flights, stored_at=None):
+        with self._lock:
+            self._entries[key] = (stored_at or time.time(), flights)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def peek(self, key):
+        """Return the stored flights for `key` even if they are past their TTL"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[1]
+
+    def age(self, key):
+        """Seconds since `key` was stored, or None if it is not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else time.time() - entry[0]
+
+    def items(self):
+        """[(key, flights)] for every fresh entry, without touching LRU order or hit counts"""
+        now = time.time()
+        with self._lock:
+            return [(key, flights) for key, (stored_at, flights) in self._entries.items() if now - stored_at <= self.ttl]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+search_cache = SearchCache()
@@ -0,0 +1,174 @@
+# search_queue.py — SQLite-backed queue of upstream search jobs shared by web and worker processes
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+from search_cache import SearchSpec, make_search_key
+from config import SEARCH_QUEUE_DB_PATH, SEARCH_QUEUE_WAIT, SEARCH_JOB_TIMEOUT, SEARCH_CACHE_TTL
+from config import get_logger
+logger = get_logger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_jobs (
+    id TEXT PRIMARY KEY,
+    search_key TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result BLOB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_search_jobs_key ON search_jobs (search_key, status);
+CREATE INDEX IF NOT EXISTS idx_search_jobs_queued ON search_jobs (created_at) WHERE status = 'queued';
+"""
+
+
+class SearchPending(Exception):
+    """The search was queued and has not finished within the web request's wait budget"""
+
+    def __init__(self, job_id):
+        super().__init__(f"Search job {job_id} is still running")
+        self.job_id = job_id
+
+
+class SearchQueue:
+    def __init__(self, path=SEARCH_QUEUE_DB_PATH, job_timeout=SEARCH_JOB_TIMEOUT, result_ttl=SEARCH_CACHE_TTL):
+        self.path = path
+        self.job_timeout = job_timeout
+        self.result_ttl = result_ttl
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)  # explicit transactions
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # === Web tier ===
+
+    def enqueue(self, spec):
+        """Return the id of a pending or fresh finished job for `spec`, creating one if needed"""
+        key = make_search_key(spec)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM search_jobs WHERE search_key = ?"
+                " AND (status IN (?, ?) OR (status = ? AND finished_at > ?))"
+                " ORDER BY created_at DESC LIMIT 1",
+                (key, QUEUED, RUNNING, DONE, time.time() - self.result_ttl),
+            ).fetchone()
+            if row:
+                job_id = row[0]
+            else:
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO search_jobs (id, search_key, spec, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, key, json.dumps(spec._asdict()), QUEUED, time.time()),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def get(self, job_id):
+        row = self._connect().execute(
+            "SELECT status, result, error, created_at, finished_at FROM search_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, result, error, created_at, finished_at = row
+        return {
+            "id": job_id,
+            "status": status,
+            "flights": json.loads(zlib.decompress(result)) if result else None,
+            "error": error,
+            "created_at": created_at,
+            "finished_at": finished_at,
+        }
+
+    def wait(self, job_id, timeout, poll_interval=0.2):
+        """Long-poll until the job finishes or `timeout` seconds pass; returns the latest job state"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in (DONE, FAILED) or time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_interval)
+
+    def run(self, spec, timeout=SEARCH_QUEUE_WAIT):
+        """Enqueue `spec` and wait briefly; returns the flights or raises SearchPending"""
+        job_id = self.enqueue(spec)
+        job = self.wait(job_id, timeout)
+        if job and job["status"] == DONE:
+            return job["flights"]
+        if job and job["status"] == FAILED:
+            logger.warning(f"Search job {job_id} failed: {job['error']}")
+            return []
+        raise SearchPending(job_id)
+
+    # === Worker side ===
+
+    def claim(self, worker_id):
+        """Atomically take the oldest queued job (or a timed-out running one); returns (job_id, spec) or None"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, spec FROM search_jobs WHERE status = ? OR (status = ? AND started_at < ?)"
+                " ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now - self.job_timeout),
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE search_jobs SET status = ?, started_at = ?, worker = ?, attempts = attempts + 1 WHERE id = ?",
+                    (RUNNING, now, worker_id, row[0]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return row[0], SearchSpec(**json.loads(row[1]))
+
+    def complete(self, job_id, flights):
+        payload = zlib.compress(json.dumps(flights, separators=(",", ":"), default=str).encode("utf-8"))
+        self._connect().execute(
+            "UPDATE search_jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+            (DONE, payload, time.time(), job_id),
+        )
+
+    def fail(self, job_id, error):
+        self._connect().execute(
+            "UPDATE search_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (FAILED, str(error), time.time(), job_id),
+        )
+
+    def prune(self, older_than=24 * 3600):
+        """Delete finished jobs older than `older_than` seconds"""
+        return self._connect().execute(
+            "DELETE FROM search_jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (DONE, FAILED, time.time() - older_than),
+        ).rowcount
+
+
+search_queue = SearchQueue()
@@ -0,0 +1,73 @@
+# search_worker.py — pool of processes executing queued upstream searches
+#
+#   SEARCH_QUEUE_ENABLED=true python search_worker.py [--processes N]
+#
+# Web workers only enqueue and poll; search capacity scales with the number of
+# processes started here, independently of gunicorn's worker count.
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from config import SEARCH_WORKER_PROCESSES
+from config import get_logger
+logger = get_logger(__name__)
+
+IDLE_SLEEP = 0.5
+PRUNE_EVERY = 3600
+
+
+def work_forever(stop_event):
+    from flight_search import refresh_search
+    from search_queue import search_queue
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    last_prune = time.monotonic()
+    logger.info(f"Search worker {worker_id} started")
+
+    while not stop_event.is_set():
+        claimed = search_queue.claim(worker_id)
+        if claimed is None:
+            if time.monotonic() - last_prune > PRUNE_EVERY:
+                search_queue.prune()
+                last_prune = time.monotonic()
+            stop_event.wait(IDLE_SLEEP)
+            continue
+
+        job_id, spec = claimed
+        try:
+            # refresh_search never enqueues, so a worker cannot feed itself
+            flights = refresh_search(spec)
+        except Exception as e:
+            logger.exception(f"Search job {job_id} failed")
+            search_queue.fail(job_id, e)
+        else:
+            search_queue.complete(job_id, flights)
+            logger.info(f"Search job {job_id} done: {len(flights)} flights")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued FlightFinder searches")
+    parser.add_argument("--processes", type=int, default=SEARCH_WORKER_PROCESSES)
+    args = parser.parse_args()
+
+    stop_event = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=work_forever, args=(stop_event,), name=f"search-worker-{i}")
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    def shutdown(*_):
+        stop_event.set()
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
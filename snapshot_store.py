@@ -0,0 +1,82 @@
+# snapshot_store.py — persistent last-known-good search results, keyed by search key
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from config import SNAPSHOT_DB_PATH, SNAPSHOT_MAX_AGE
+from config import get_logger
+logger = get_logger(__name__)
+
+
+class SnapshotStore:
+    """One row per search key holding the latest non-empty normalized results as
+    zlib-compressed compact JSON. Each thread gets its own SQLite connection."""
+
+    def __init__(self, path=SNAPSHOT_DB_PATH, max_age=SNAPSHOT_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                " search_key TEXT PRIMARY KEY,"
+                " stored_at REAL NOT NULL,"
+                " offer_count INTEGER NOT NULL,"
+                " payload BLOB NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    def save(self, key, flights, stored_at=None):
+        payload = zlib.compress(json.dumps(flights, separators=(",", ":"), default=str).encode("utf-8"))
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO snapshots (search_key, stored_at, offer_count, payload) VALUES (?, ?, ?, ?)",
+                    (key, stored_at or time.time(), len(flights), payload),
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to save snapshot for {key}: {e}")
+
+    def load_entry(self, key):
+        """Return (stored_at, flights), or None if missing or older than max_age"""
+        try:
+            row = self._connect().execute(
+                "SELECT stored_at, payload FROM snapshots WHERE search_key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to load snapshot for {key}: {e}")
+            return None
+        if row is None or time.time() - row[0] > self.max_age:
+            return None
+        return row[0], json.loads(zlib.decompress(row[1]))
+
+    def load(self, key):
+        """Return (flights, age_seconds), or (None, None) if missing or older than max_age"""
+        entry = self.load_entry(key)
+        if entry is None:
+            return None, None
+        return entry[1], time.time() - entry[0]
+
+    def prune(self):
+        """Delete snapshots that are too old to be served"""
+        conn = self._connect()
+        with conn:
+            deleted = conn.execute(
+                "DELETE FROM snapshots WHERE stored_at < ?", (time.time() - self.max_age,)
+            ).rowcount
+        return deleted
+
+
+snapshot_store = SnapshotStore()
@@ -0,0 +1,39 @@
+# test_batch_search.py: checks batch dedup, per-item errors and that every search is answered
+
+import flight_search
+from batch_search import run_batch
+from search_cache import search_cache
+
+
+def test_batch_dedupes_and_reports_item_errors(monkeypatch):
+    calls = []
+    monkeypatch.setattr(flight_search, "fetch_flights", lambda spec: calls.append(spec) or [{"id": spec.destination_code, "price": 99}])
+    search_cache.clear()
+
+    lon = {"origin": "STO", "destination": "LON", "date_from": "2099-10-10", "trip_type": "one-way"}
+    par = {"origin": "STO", "destination": "PAR", "date_from": "2099-10-10", "trip_type": "one-way"}
+    items = [lon, par, dict(lon), {"origin": "nope"}]
+
+    results = list(run_batch(items, shape=lambda flights: [f["id"] for f in flights]))
+
+    assert len(calls) == 2
+    by_route = {r.get("route"): r for r in results}
+    assert by_route["STO-LON"]["indexes"] == [0, 2]
+    assert by_route["STO-PAR"]["offers"] == ["PAR"]
+    assert by_route[None]["indexes"] == [3] and by_route[None]["errors"]
+
+
+def test_batch_keeps_streaming_after_an_item_fails(monkeypatch):
+    monkeypatch.setattr(flight_search, "fetch_flights", lambda spec: [{"id": spec.destination_code, "price": 99}])
+    search_cache.clear()
+
+    def shape(flights):
+        if flights[0]["id"] == "LON":
+            raise ValueError("cannot shape")
+        return [f["id"] for f in flights]
+
+    items = [{"origin": "STO", "destination": dest, "date_from": "2099-10-10", "trip_type": "one-way"} for dest in ("LON", "PAR")]
+    by_route = {r["route"]: r for r in run_batch(items, shape)}
+
+    assert by_route["STO-LON"]["error"] == "cannot shape"
+    assert by_route["STO-PAR"]["offers"] == ["PAR"]
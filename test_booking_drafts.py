@@ -0,0 +1,59 @@
+# test_booking_drafts.py: checks drafts round-trip, merge updates, expire and can be taken only once
+
+import time
+
+from booking_drafts import DraftStore
+
+
+def test_draft_lifecycle(tmp_path):
+    drafts = DraftStore(path=str(tmp_path / "drafts.db"))
+    token = drafts.save({"flight": {"id": "abc", "price": 120}})
+    assert len(token) == 16
+    assert drafts.get(token) == {"flight": {"id": "abc", "price": 120}}
+
+    drafts.update(token, passenger={"name": "Ada"})
+    assert drafts.get(token)["passenger"] == {"name": "Ada"}
+    assert drafts.update("missing", passenger={}) is None
+
+    assert drafts.pop(token)["flight"]["price"] == 120
+    assert drafts.pop(token) is None  # a second submit finds nothing
+
+
+def test_drafts_expire(tmp_path):
+    drafts = DraftStore(path=str(tmp_path / "drafts.db"), ttl=0.05)
+    token = drafts.save({"flight": {}})
+    time.sleep(0.1)
+    assert drafts.get(token) is None
+    assert drafts.prune() == 1
+
+
+def test_book_now_finds_the_offers_each_visitor_was_shown(tmp_path, monkeypatch):
+    from flask import Flask
+    import travel_ui
+    from search_cache import make_search_spec, make_search_key
+
+    monkeypatch.setattr(travel_ui, "booking_drafts", DraftStore(path=str(tmp_path / "drafts.db")))
+    monkeypatch.setattr(travel_ui, "search_flights_with_meta", lambda destination_code, **kwargs: (
+        [{"id": destination_code, "price": 100, "airlines": ["SK"], "route": [], "deep_link": "x"}],
+        {"total": 1, "facets": {}}))
+
+    def worker():
+        # Every worker is its own app; the session cookie and the draft store are all they share
+        app = Flask(__name__)
+        app.secret_key = "test"
+        app.register_blueprint(travel_ui.travel_bp)
+        return app
+
+    def show(client, destination):
+        key = make_search_key(make_search_spec("STO", destination, "2099-10-10", "", "one-way"))
+        assert client.get(f"/results/filter?key={key}").status_code == 200
+
+    first, second = worker().test_client(), worker().test_client()
+    show(first, "LON")
+    show(second, "PAR")  # another visitor's search no longer wipes the first one's offers
+
+    other_worker = worker().test_client()
+    other_worker.set_cookie("session", first.get_cookie("session").value)
+    booked = other_worker.post("/book-flight", data={"flight_id": "LON"})
+    assert booked.status_code == 200 and b"no longer available" not in booked.data and b"draft" in booked.data
+    assert b"no longer available" in other_worker.post("/book-flight", data={"flight_id": "PAR"}).data
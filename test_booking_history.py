@@ -0,0 +1,54 @@
+# test_booking_history.py: summary rows are written with each booking and paged newest first
+
+import json
+
+import pytest
+from flask import Flask
+
+from database import db
+from db import backfill_booking_summaries, get_booking_history, save_booking, summary_fields
+from models import Booking, BookingSummary
+
+PASSENGER = {"name": "Ada Lovelace", "email": "ada@example.com", "phone": "0700000000"}
+FLIGHT = {"origin": "ARN", "destination": "LHR", "departure_date": "2025-10-05 08:00", "return_date": "2025-10-12T18:30:00",
+          "price": 123.4, "currency": "EUR", "airline": "SK", "flight_number": "SK1527"}
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'bookings.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def test_summary_fields_are_preformatted():
+    assert summary_fields(FLIGHT) == {"route": "ARN → LHR", "dates": "2025-10-05 08:00 → 2025-10-12 18:30",
+                                      "airline": "SK SK1527", "price": 123.4, "price_label": "123.40 EUR"}
+    assert summary_fields({"price": "n/a"})["price_label"] == "—"
+
+
+def test_save_booking_writes_summary_and_history_pages(app):
+    for i in range(5):
+        save_booking(f"REF{i}", PASSENGER, json.dumps({**FLIGHT, "price": 100 + i}))
+    assert BookingSummary.query.count() == 5
+
+    rows, has_more = get_booking_history(page=1, page_size=3)
+    assert [r.reference for r in rows] == ["REF4", "REF3", "REF2"] and has_more
+    assert rows[0].route == "ARN → LHR" and rows[0].price_label == "104.00 EUR"
+    rows, has_more = get_booking_history(page=2, page_size=3)
+    assert [r.reference for r in rows] == ["REF1", "REF0"] and not has_more
+
+
+def test_backfill_creates_missing_summaries_once(app):
+    db.session.add(Booking(reference="OLD1", passenger_name="A", passenger_email="a@x", passenger_phone="1",
+                           flight_data=json.dumps(FLIGHT)))
+    db.session.add(Booking(reference="OLD2", passenger_name="B", passenger_email="b@x", passenger_phone="2",
+                           flight_data="not json"))
+    db.session.commit()
+
+    assert backfill_booking_summaries(batch_size=1) == 2
+    assert backfill_booking_summaries() == 0
+    assert {s.reference: s.route for s in BookingSummary.query} == {"OLD1": "ARN → LHR", "OLD2": "? → ?"}
@@ -0,0 +1,86 @@
+# test_booking_reference.py: references come from reserved sequence blocks and never collide
+
+import json
+import threading
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+
+from booking_reference import CODE_SPACE, ReferenceAllocator, encode, format_reference
+from database import db
+from db import save_booking
+from models import Booking, ReferenceCounter
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'refs.db'}")
+    ReferenceCounter.__table__.create(engine)
+    return engine
+
+
+def test_codes_are_distinct_and_fit_the_column():
+    codes = {encode(n) for n in range(100_000)}
+    assert len(codes) == 100_000
+    assert encode(CODE_SPACE - 1) not in codes
+    with pytest.raises(ValueError):
+        encode(CODE_SPACE)
+    assert len(format_reference(12345)) == 20 == Booking.__table__.c.reference.type.length
+
+
+def test_allocators_reserve_disjoint_blocks(engine):
+    first, second = ReferenceAllocator(block_size=10), ReferenceAllocator(block_size=10)
+    assert [first.next_number(engine) for _ in range(3)] == [0, 1, 2]
+    assert second.next_number(engine) == 10  # another process gets the next block
+    assert [first.next_number(engine) for _ in range(8)][-1] == 20  # first block used up after 9
+
+    first._pid = -1  # as seen from a forked child
+    assert first.next_number(engine) == 30
+
+
+def test_concurrent_allocation_never_repeats(engine):
+    allocators = [ReferenceAllocator(block_size=7) for _ in range(3)]
+    numbers, lock = [], threading.Lock()
+
+    def worker(allocator):
+        got = [allocator.next_number(engine) for _ in range(200)]
+        with lock:
+            numbers.extend(got)
+
+    threads = [threading.Thread(target=worker, args=(allocators[i % 3],)) for i in range(9)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(numbers) == len(set(numbers)) == 1800
+
+
+def test_concurrent_save_booking_without_collisions(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'bookings.db'}"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 30}}
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    allocator = ReferenceAllocator(block_size=16)
+    errors = []
+
+    def worker(n):
+        with app.app_context():
+            for i in range(50):
+                try:
+                    save_booking(allocator.next_reference(), {"name": "A", "email": "a@x", "phone": "1"},
+                                 json.dumps({"origin": "ARN", "destination": "LHR", "price": n * 100 + i}))
+                except Exception as e:
+                    errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    with app.app_context():
+        assert Booking.query.count() == 400
+        assert db.session.query(db.func.count(db.distinct(Booking.reference))).scalar() == 400
@@ -0,0 +1,79 @@
+# test_connections.py: checks self-transfer paths honour connection times and layover limits,
+# and that k-cheapest search agrees with brute-force enumeration
+
+import itertools
+import random
+
+import connections
+from connections import ConnectionEngine, ConnectionGraph, inventory_edges, make_edge, to_minutes
+from search_cache import search_cache, make_search_spec, make_search_key
+
+
+def _flight(origin, destination, depart, arrive, price, number="X1"):
+    return make_edge({"origin": origin, "destination": destination, "depart": depart, "arrive": arrive,
+                      "price": price, "airline": number[:2], "flight_number": number})
+
+
+def test_minimum_connection_time_and_layovers():
+    day = to_minutes("2099-10-10 00:00")
+    graph = ConnectionGraph([
+        _flight("STO", "CPH", "2099-10-10 08:00", "2099-10-10 09:10", 40),
+        _flight("CPH", "LIS", "2099-10-10 09:40", "2099-10-10 13:00", 30),  # too tight after 09:10
+        _flight("CPH", "LIS", "2099-10-10 12:00", "2099-10-10 15:20", 60),
+        _flight("CPH", "MAD", "2099-10-10 11:00", "2099-10-10 14:00", 20),
+        _flight("MAD", "LIS", "2099-10-10 16:00", "2099-10-10 17:10", 10),
+        _flight("STO", "LIS", "2099-10-10 07:00", "2099-10-10 12:00", 300),
+    ])
+    paths = graph.k_cheapest_paths("STO", "LIS", day, day + 1439, k=5, min_legs=2)
+    assert [(cost, [e.destination for e in edges]) for cost, edges in paths] == [
+        (70, ["CPH", "MAD", "LIS"]), (100, ["CPH", "LIS"])]
+    one_stop = graph.k_cheapest_paths("STO", "LIS", day, day + 1439, k=5, max_layovers=1)
+    assert [cost for cost, _ in one_stop] == [100, 300]
+
+
+def test_k_cheapest_matches_brute_force():
+    rng = random.Random(7)
+    airports = ["A", "B", "C", "D"]
+    start = to_minutes("2099-10-10 00:00")
+    edges = []
+    for _ in range(60):
+        origin, destination = rng.sample(airports, 2)
+        depart = start + rng.randint(0, 36 * 60)
+        edges.append(make_edge({"origin": origin, "destination": destination, "depart": f"2099-10-10 00:00",
+                                "duration": 0, "price": rng.randint(10, 99)})._replace(depart=depart, arrive=depart + 60))
+    graph = ConnectionGraph(edges)
+
+    def valid(path):
+        stops = [path[0].origin] + [e.destination for e in path]
+        return (path[0].origin == "A" and path[-1].destination == "D" and len(set(stops)) == len(stops)
+                and start <= path[0].depart <= start + 1439
+                and all(a.destination == b.origin and a.arrive + 90 <= b.depart <= a.arrive + 1440
+                        for a, b in zip(path, path[1:])))
+    expected = sorted(sum(e.price for e in p) for n in (1, 2, 3) for p in itertools.permutations(edges, n) if valid(p))
+    found = graph.k_cheapest_paths("A", "D", start, start + 1439, k=8, max_layovers=2)
+    assert [cost for cost, _ in found] == expected[:8]
+
+
+def test_engine_composes_offers():
+    engine = ConnectionEngine(load_edges=lambda *fare: [
+        _flight("STO", "CPH", "2099-10-10 08:00", "2099-10-10 09:10", 40, "SK1"),
+        _flight("CPH", "LIS", "2099-10-10 12:00", "2099-10-10 15:20", 60, "TP2"),
+    ])
+    offer, = engine.search("sto", "lis", "2099-10-10")
+    assert offer["price"] == 100 and offer["stops"] == 1 and offer["duration"] == 440
+    assert offer["layovers"] == [{"airport": "CPH", "minutes": 170}]
+    assert offer["separate_tickets"] is True
+
+
+def test_inventory_only_holds_fares_of_the_same_cabin_and_party(monkeypatch):
+    monkeypatch.setattr(connections, "USE_REAL_API", True)
+    search_cache.clear()
+    leg = [{"id": "1", "depart": "2099-10-10 08:00", "arrive": "2099-10-10 09:10", "price": 40}]
+    for adults, cabin in ((1, "economy"), (3, "economy"), (1, "business")):
+        spec = make_search_spec("STO", "CPH", "2099-10-10", "", "one-way", adults, 0, 0, cabin)
+        search_cache.set(make_search_key(spec), [{**leg[0], "price": 40 * adults * (5 if cabin == "business" else 1)}])
+
+    assert [e.price for e in inventory_edges()] == [40]  # no mock inventory with a real API
+    assert [e.price for e in inventory_edges("economy", 3)] == [120]
+    assert [e.price for e in inventory_edges("business")] == [200]
+    search_cache.clear()
@@ -0,0 +1,32 @@
+# test_explore.py: checks that explore ranks destinations and only searches live within budget
+
+import flight_search
+from explore import explore
+from price_index import min_price_index
+from search_cache import search_cache, make_search_spec
+
+
+def test_explore_uses_index_then_live_budget(monkeypatch):
+    calls = []
+    monkeypatch.setattr(flight_search, "fetch_flights", lambda spec: calls.append(spec) or [{"id": "x", "price": 300}])
+    search_cache.clear()
+    min_price_index.clear()
+    min_price_index.record(make_search_spec("ARN", "LHR", "2099-10-10", "", "one-way"), [{"price": 80, "airline": "BA"}])
+    # Prices of other specs for the same route and day must not leak into the ranking
+    min_price_index.record(make_search_spec("ARN", "CDG", "2099-10-10", "2099-10-17", "round-trip"), [{"price": 10}])
+    min_price_index.record(make_search_spec("ARN", "CDG", "2099-10-10", "", "one-way", 3, 0, 0, "business"), [{"price": 5}])
+
+    result = explore("ARN", "2099-10-10", "2099-10-11", live_budget=3)
+
+    assert len(calls) == 3
+    assert result["live_searches"] == 3
+    assert result["destinations"][0]["destination"] == "LHR"
+    assert result["destinations"][0]["price"] == 80
+    assert all(d["city"] != "Stockholm" for d in result["destinations"])
+    assert all(d["price"] >= 80 for d in result["destinations"])
+
+    # The live results are now indexed, so exploring again needs fewer upstream calls
+    calls.clear()
+    again = explore("ARN", "2099-10-10", "2099-10-11", live_budget=0)
+    assert calls == []
+    assert len(again["destinations"]) == len(result["destinations"])
@@ -0,0 +1,37 @@
+# test_facets.py: checks filter parsing and that facet counts are disjunctive
+
+from facets import filter_and_facet, parse_filters
+
+OFFERS = [
+    {"id": "a", "airline": "LH", "price": 120, "stops": 0, "duration": 90, "depart": "2099-10-10 07:15", "arrive": "2099-10-10 08:45"},
+    {"id": "b", "airline": "LH", "price": 90, "stops": 1, "duration": 200, "depart": "2099-10-10 13:00", "arrive": "2099-10-10 16:20"},
+    {"id": "c", "airline": "BA", "price": 150, "stops": 0, "duration": 95, "depart": "2099-10-10 19:30", "arrive": "2099-10-10 21:05"},
+    {"id": "d", "airlines": ["KL - KLM"], "price": 80, "stops": 3, "duration": "9h 0m", "depart": "2099-10-10 23:00", "arrive": "2099-10-11 08:00"},
+]
+
+
+def test_parse_filters_reports_bad_values():
+    filters, errors = parse_filters({"stops": "0,1", "airlines": "lh, ba", "price_max": "200", "depart_after": "06:00"})
+    assert errors == []
+    assert filters == {"stops": {0, 1}, "airlines": {"LH", "BA"}, "price": (None, 200.0), "depart": (360, None)}
+    assert parse_filters({"price_max": "cheap", "depart_before": "25:99"})[1] == [
+        "price_max must be a number.", "depart_before must be HH:MM."]
+    for blank in (",", " , "):
+        assert parse_filters({"stops": blank}) == (
+            {}, ["stops must be a comma-separated list of numbers, e.g. 0,1."])
+
+
+def test_counts_are_disjunctive():
+    matched, facets = filter_and_facet(OFFERS, {"stops": {0}, "airlines": {"LH"}})
+    assert [o["id"] for o in matched] == ["a"]
+    # Each facet counts what its own filter would let through with the others applied
+    assert facets["stops"] == {"0": 1, "1": 1}
+    assert facets["airlines"] == {"LH": 1, "BA": 1}
+    assert facets["depart"]["morning"] == 1
+
+
+def test_two_stops_means_two_or_more():
+    matched, facets = filter_and_facet(OFFERS, {"stops": {2}})
+    assert [o["id"] for o in matched] == ["d"]
+    assert facets["airlines"] == {"KL": 1}
+    assert filter_and_facet(OFFERS, {})[1]["price"] == {"min": 80.0, "max": 150.0}
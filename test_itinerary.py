@@ -0,0 +1,27 @@
+# test_itinerary.py: checks that fingerprints ignore links and formats, and that merges keep the cheapest offer
+
+from datetime import datetime
+
+from itinerary import dedup_itineraries, itinerary_id, make_leg, merge_results
+
+
+def test_fingerprint_is_canonical():
+    mock_leg = make_leg("LH - Lufthansa", "LH100", datetime(2099, 10, 10, 6, 0), "sto", "lon")
+    api_leg = make_leg("LH", "0100", "2099-10-10 06:00", "STO", "LON")
+    assert itinerary_id([mock_leg], "Economy") == itinerary_id([api_leg], "economy")
+    assert itinerary_id([mock_leg], "economy") != itinerary_id([mock_leg], "business")
+    later = make_leg("LH", "100", "2099-10-10 08:00", "STO", "LON")
+    assert itinerary_id([api_leg]) != itinerary_id([later])
+
+
+def test_merge_keeps_cheapest_per_itinerary():
+    gate_a = [{"id": "x", "price": 120, "link": "a"}, {"id": "y", "price": 200, "link": "a"}]
+    gate_b = [{"id": "x", "price": 100, "link": "b"}, {"id": "z", "price": 150, "link": "b"}]
+    merged = merge_results(gate_a, gate_b)
+    assert [(f["id"], f["price"]) for f in merged] == [("x", 100), ("z", 150), ("y", 200)]
+
+
+def test_seen_set_is_bounded():
+    flights = [{"id": i % 3} for i in range(9)]
+    assert len(list(dedup_itineraries(flights))) == 3
+    assert len(list(dedup_itineraries(iter([{"id": 1}, {"id": 2}, {"id": 1}]), max_seen=1))) == 3
@@ -0,0 +1,33 @@
+# test_lazy_imports.py: heavy modules are imported on first use, not at startup
+
+import subprocess
+import sys
+
+import pytest
+
+from lazy_imports import LazyModule, is_loaded, lazy_import
+
+
+def test_module_is_imported_on_first_attribute_access():
+    sys.modules.pop("colorsys", None)
+    colorsys = lazy_import("colorsys")
+    assert isinstance(colorsys, LazyModule) and not is_loaded("colorsys")
+    assert "not loaded" in repr(colorsys)
+
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert is_loaded("colorsys") and "(loaded)" in repr(colorsys)
+    assert lazy_import("colorsys") is sys.modules["colorsys"]
+
+
+def test_missing_module_fails_on_use_not_on_import():
+    missing = lazy_import("no_such_module_for_flightfinder")
+    with pytest.raises(ImportError):
+        missing.anything
+
+
+def test_web_modules_do_not_import_heavy_dependencies():
+    code = ("import sys, utils, flight_search, travel_ui; "
+            "print(sorted(m for m in ('spacy', 'dateparser', 'word2number', 'requests', 'sqlalchemy') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
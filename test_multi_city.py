@@ -0,0 +1,82 @@
+# test_multi_city.py: checks the generic signature, the k-best leg merge against brute force
+# and the per-leg fallback of a multi-city search
+
+import itertools
+import random
+
+import multi_city
+from flight_search import generate_signature
+from multi_city import k_best_combinations, search_multi_city
+from search_cache import search_cache
+
+
+def test_signature_covers_every_segment():
+    passengers = {"adults": 1, "children": 0, "infants": 0}
+    segments = [{"date": f"2099-10-1{i}", "origin": o, "destination": d}
+                for i, (o, d) in enumerate([("STO", "LON"), ("LON", "ROM"), ("ROM", "STO")])]
+    two = generate_signature("t", "m", "h", "ip", "en", "Y", passengers, segments[:2])
+    three = generate_signature("t", "m", "h", "ip", "en", "Y", passengers, segments)
+    assert two != three
+    assert three == generate_signature("t", "m", "h", "ip", "en", "Y", passengers, list(segments))
+
+
+def test_k_best_matches_brute_force():
+    rng = random.Random(3)
+    legs = [sorted(({"price": rng.randint(10, 200)} for _ in range(8)), key=lambda o: o["price"]) for _ in range(3)]
+    expected = sorted(sum(o["price"] for o in combo) for combo in itertools.product(*legs))[:15]
+    assert [total for total, _ in k_best_combinations(legs, 15, feasible=None)] == expected
+
+
+def test_legs_that_do_not_connect_are_skipped():
+    first = [{"price": 50, "depart": "2099-10-10 08:00", "arrive": "2099-10-10 12:00"},
+             {"price": 80, "depart": "2099-10-10 06:00", "arrive": "2099-10-10 08:00"}]
+    second = [{"price": 40, "depart": "2099-10-10 12:30", "duration": 60}]
+    assert [total for total, _ in k_best_combinations([first, second], 5)] == [120]
+
+
+def test_falls_back_to_per_leg_searches(monkeypatch):
+    search_cache.clear()
+    offers = {
+        "STO": [{"id": "a", "airline": "LH", "flight_number": "LH1", "price": 100, "stops": 0, "duration": 120,
+                 "depart": "2099-10-10 08:00"}],
+        "LON": [{"id": "b", "airline": "BA", "flight_number": "BA2", "price": 70, "stops": 1, "duration": 150,
+                 "depart": "2099-10-12 09:00"}],
+    }
+    monkeypatch.setattr(multi_city, "search_flights_with_meta", lambda origin, *args, **kwargs: (offers[origin], {}))
+    flights, meta = search_multi_city([("STO", "LON", "2099-10-10"), ("LON", "ROM", "2099-10-12")])
+    assert meta["source"] == "legs"
+    assert flights[0]["price"] == 170 and flights[0]["stops"] == 1 and flights[0]["duration"] == 270
+    assert (flights[0]["origin"], flights[0]["destination"]) == ("STO", "ROM")
+    assert search_multi_city([("STO", "LON", "2099-10-10"), ("LON", "ROM", "2099-10-12")])[1]["source"] == "cache"
+
+
+def test_pending_legs_report_the_combined_state(monkeypatch):
+    from search_queue import SearchPending
+    search_cache.clear()
+    offers = {"STO": [{"id": "a", "price": 100, "depart": "2099-10-10 08:00"}],
+              "LON": [{"id": "b", "price": 70, "depart": "2099-10-12 09:00"}]}
+    pending = {"LON"}
+
+    def search(origin, *args, **kwargs):
+        if origin in pending:
+            raise SearchPending(f"job-{origin}")
+        return offers[origin], {}
+
+    monkeypatch.setattr(multi_city, "search_flights_with_meta", search)
+    legs = [("STO", "LON", "2099-10-10"), ("LON", "ROM", "2099-10-12")]
+    flights, meta = search_multi_city(legs)
+    assert flights == [] and meta["source"] == "pending"
+    assert [(leg["status"], leg.get("job_id")) for leg in meta["legs"]] == [("done", None), ("pending", "job-LON")]
+
+    # Once the leg is done, the same search completes
+    pending.clear()
+    flights, meta = search_multi_city(legs)
+    assert meta["source"] == "legs" and flights[0]["price"] == 170
+
+
+def test_api_rejects_a_body_that_is_not_an_object():
+    from flask import Flask
+    import travel_ui
+    app = Flask(__name__)
+    app.register_blueprint(travel_ui.travel_bp)
+    assert app.test_client().post("/api/search/multi-city", json=[["STO", "LON", "2099-10-10"]]).status_code == 400
@@ -0,0 +1,56 @@
+# test_place_resolver.py: checks typo, alias and code resolution and as-you-type ranking
+
+from place_resolver import PlaceResolver, normalize
+from reference_data import ReferenceData, build
+
+AIRPORTS = [
+    {"city": "London", "name": "Heathrow Airport", "iata": "LHR"},
+    {"city": "London", "name": "Gatwick Airport", "iata": "LGW"},
+    {"city": "Los Angeles", "name": "Los Angeles International Airport", "iata": "LAX"},
+    {"city": "Copenhagen", "name": "Copenhagen Kastrup Airport", "iata": "CPH"},
+]
+CITIES = {"london": "LON", "new york": "NYC"}
+
+
+def _resolver(tmp_path):
+    path = str(tmp_path / "ref.bin")
+    build(path, sources=(AIRPORTS, CITIES, {}))
+    return PlaceResolver(ReferenceData(path, auto_build=False), aliases={"Copenhagen": ["Köpenhamn"]})
+
+
+def test_resolves_typos_aliases_and_codes(tmp_path):
+    resolver = _resolver(tmp_path)
+    assert normalize("  Zürich-Flughafen ") == "zurich flughafen"
+    assert resolver.resolve_code("Lodnon") == "LON"
+    assert resolver.resolve_code("kopenhamn") == "CPH"
+    assert resolver.resolve_code("nyc") == "NYC"
+    assert resolver.resolve_code("heathrow") == "LHR"
+    assert resolver.resolve_code("Atlantis") is None
+
+
+def test_prefix_search_prefers_word_prefixes(tmp_path):
+    resolver = _resolver(tmp_path)
+    codes = [place.code for _, place in resolver.search("lon", prefix=True)]
+    assert codes == ["LON", "LGW", "LHR"]  # Los Angeles shares trigrams but no word starts with "lon"
+    assert [place.code for _, place in resolver.search("lodn", prefix=True)][0] == "LON"  # typos still match
+
+
+def test_version_tracks_reference_data_and_aliases(tmp_path):
+    resolver = _resolver(tmp_path)
+    version = resolver.version
+    assert PlaceResolver(resolver.reference, aliases={}).version != version
+
+
+def test_suggestions_say_when_they_can_be_narrowed_locally(tmp_path):
+    resolver = _resolver(tmp_path)
+
+    suggestions, prefix_only = resolver.suggest("ko", limit=10)
+    assert prefix_only  # every place with a word starting "ko", found through its alias
+    assert [place.code for place, _ in suggestions] == ["CPH"]
+    assert "kopenhamn" in suggestions[0][1]  # the client narrows on names, not on the label
+
+    _, prefix_only = resolver.suggest("lodn", limit=10)
+    assert not prefix_only  # near misses: "lodnx" could match something else entirely
+
+    _, prefix_only = resolver.suggest("lon", limit=2)
+    assert not prefix_only  # truncated
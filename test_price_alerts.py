@@ -0,0 +1,115 @@
+# test_price_alerts.py: checks watch matching, new-low dedup, token-guarded removal and batched outbox delivery
+
+import time
+
+from flask import Flask
+
+import price_alerts
+from price_alerts import PriceAlerts
+from search_cache import make_search_spec
+
+
+def one_way(destination, day, **kwargs):
+    return make_search_spec("STO", destination, day, "", "one-way", **kwargs)
+
+
+def test_alerts_match_only_relevant_watches(tmp_path):
+    alerts = PriceAlerts(path=str(tmp_path / "alerts.db"))
+    cheap, _ = alerts.add_watch("a@example.com", "STO", "LON", "2099-10-01", "2099-10-15", 100, "one-way")
+    alerts.add_watch("b@example.com", "STO", "LON", "2099-10-01", "2099-10-15", 50, "one-way")   # price too low
+    alerts.add_watch("c@example.com", "STO", "PAR", "2099-10-01", "2099-10-15", 500, "one-way")  # other route
+    alerts.add_watch("d@example.com", "STO", "LON", "2099-11-01", "2099-11-02", 500, "one-way")  # other dates
+
+    assert [w.id for w in alerts.match(one_way("LON", "2099-10-10"), 90)] == [cheap.id]
+
+    assert alerts.evaluate(one_way("LON", "2099-10-10"), [{"price": 95}, {"price": 90, "airline": "SK"}]) == 1
+    assert alerts.evaluate(one_way("LON", "2099-10-11"), [{"price": 92}]) == 0  # not a new low
+    assert alerts.evaluate(one_way("LON", "2099-10-12"), [{"price": 80}]) == 1
+
+    delivered = []
+    assert alerts.deliver_pending(send=delivered.extend, batch_size=1) == 2
+    assert [row[5] for row in delivered] == [90, 80]
+    assert alerts.deliver_pending(send=delivered.extend) == 0
+
+
+def test_watches_only_see_searches_of_their_cabin_trip_type_and_party(tmp_path):
+    alerts = PriceAlerts(path=str(tmp_path / "alerts.db"))
+    alerts.add_watch("a@example.com", "STO", "LON", "2099-10-01", "2099-10-15", 100, "one-way", "economy", 1)
+
+    assert alerts.evaluate(one_way("LON", "2099-10-10", cabin_class="business"), [{"price": 50}]) == 0
+    assert alerts.evaluate(one_way("LON", "2099-10-10", adults=3), [{"price": 50}]) == 0
+    assert alerts.evaluate(make_search_spec("STO", "LON", "2099-10-10", "2099-10-12", "round-trip"), [{"price": 50}]) == 0
+    assert alerts.evaluate(one_way("LON", "2099-10-10"), [{"price": 50}]) == 1
+
+
+def test_removal_needs_the_token_and_evicts_the_watch(tmp_path):
+    alerts = PriceAlerts(path=str(tmp_path / "alerts.db"))
+    watch, token = alerts.add_watch("a@example.com", "STO", "LON", "2099-10-01", "2099-10-02", 100, "one-way")
+    assert not alerts.remove_watch(watch.id, "guess")
+    assert not alerts.remove_watch(watch.id + 1, token)
+    assert alerts.remove_watch(watch.id, token)
+    assert alerts.evaluate(one_way("LON", "2099-10-01"), [{"price": 10}]) == 0
+    assert alerts._watches == {} and alerts._by_day == {}
+
+
+def test_sync_evicts_watches_removed_elsewhere_and_expired(tmp_path):
+    path = str(tmp_path / "alerts.db")
+    web, other = PriceAlerts(path=path), PriceAlerts(path=path)
+    removed, token = other.add_watch("a@example.com", "STO", "LON", "2099-10-01", "2099-10-02", 100, "one-way")
+    web.sync(force=True)
+    assert removed.id in web._watches
+
+    other.remove_watch(removed.id, token)
+    web.sync(force=True)
+    assert web._watches == {} and web._by_day == {}
+
+    # Once a day, past days and watches whose range is over leave the index
+    web.add_watch("b@example.com", "STO", "PAR", "2099-10-01", "2099-10-02", 100, "one-way")
+    running, _ = web.add_watch("c@example.com", "STO", "PAR", "2099-10-01", "2099-10-05", 100, "one-way")
+    web._prune_expired("2099-10-04")
+    assert list(web._watches) == [running.id]
+    assert sorted(key[2] for key in web._by_day) == ["2099-10-04", "2099-10-05"]
+
+
+def test_sync_picks_up_older_watches_after_a_local_add(tmp_path):
+    path = str(tmp_path / "alerts.db")
+    a, b = PriceAlerts(path=path), PriceAlerts(path=path)
+    a.sync(force=True)
+    elsewhere, _ = b.add_watch("a@example.com", "STO", "LON", "2099-10-01", "2099-10-15", 100, "one-way")
+    local, _ = a.add_watch("b@example.com", "STO", "LON", "2099-10-01", "2099-10-15", 100, "one-way")
+    assert elsewhere.id < local.id
+
+    a.sync(force=True)
+    assert sorted(w.id for w in a.match(one_way("LON", "2099-10-10"), 90)) == [elsewhere.id, local.id]
+
+
+def test_results_are_evaluated_off_the_request_path(tmp_path):
+    alerts = PriceAlerts(path=str(tmp_path / "alerts.db"))
+    alerts.add_watch("a@example.com", "STO", "LON", "2099-10-01", "2099-10-15", 100, "one-way")
+    alerts.submit(one_way("LON", "2099-10-10"), [{"price": 120}, {"price": 90}])
+
+    deadline = time.monotonic() + 5
+    delivered = []
+    while not delivered and time.monotonic() < deadline:
+        alerts.drain()
+        alerts.deliver_pending(send=delivered.extend)
+    assert [row[5] for row in delivered] == [90]
+
+
+def test_watch_api_hides_the_email_and_guards_removal(tmp_path, monkeypatch):
+    import travel_ui
+    monkeypatch.setattr(price_alerts, "price_alerts", PriceAlerts(path=str(tmp_path / "alerts.db")))
+    app = Flask(__name__)
+    app.register_blueprint(travel_ui.travel_bp)
+    client = app.test_client()
+
+    assert client.post("/api/watches", json=[{"email": "a@example.com"}]).status_code == 400
+    created = client.post("/api/watches", json={"email": "a@example.com", "origin": "STO", "destination": "LON",
+                                                "date_from": "2099-10-01", "max_price": 100, "trip_type": "one-way"})
+    assert created.status_code == 201
+    body = created.get_json()
+    assert "email" not in body and body["token"]
+
+    assert client.delete(f"/api/watches/{body['id']}").status_code == 404
+    assert client.delete(f"/api/watches/{body['id']}", headers={"X-Watch-Token": "guess"}).status_code == 404
+    assert client.delete(body["unsubscribe"]).status_code == 204
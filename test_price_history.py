@@ -0,0 +1,60 @@
+# test_price_history.py: checks summaries, compaction/downsampling, per-series trends over blocks
+
+import time
+
+from price_history import PriceHistory, summarize
+from search_cache import make_search_spec
+
+LON_10 = make_search_spec("STO", "LON", "2099-10-10", "", "one-way")
+LON_11 = make_search_spec("STO", "LON", "2099-10-11", "", "one-way")
+
+FLIGHTS = [
+    {"price": 120, "airline": "BA"},
+    {"price": 90, "airline": "SK"},
+    {"price": 150, "airline": "BA"},
+]
+
+
+def test_summarize():
+    assert summarize(FLIGHTS) == {"min": 90, "median": 120, "offers": 3, "airlines": {"BA": 120, "SK": 90}}
+
+
+def test_compaction_downsamples_and_trend_reads_blocks(tmp_path):
+    history = PriceHistory(directory=str(tmp_path), compact_interval=3600, hourly_window=86400, retention_days=30)
+    now = time.time()
+    hour = now - now % 3600
+    # Three searches within the same recent hour collapse into one point
+    for minute, price in ((1, 120), (2, 100), (3, 110)):
+        history.record(LON_10, [{"price": price, "airline": "BA"}], now=hour + minute * 60)
+    # Two searches a week ago fall into one daily point
+    for offset in (0, 600):
+        history.record(LON_10, FLIGHTS, now=now - 7 * 86400 + offset)
+    history.record(LON_11, FLIGHTS, now=now)
+
+    assert history.compact(now=now) == 6
+    assert not (tmp_path / "raw.log").exists()
+
+    points = history.trend("STO", "LON", "2099-10-10", "one-way")
+    assert len(points) == 2
+    assert points[-1]["min"] == 100
+    assert len(history.trend("STO", "LON", trip_type="one-way")) == 3
+    assert history.airline_mins("STO", "LON", "2099-10-10", "one-way") == {"BA": 110}
+
+    # A second compaction merges new records into the existing block
+    history.record(LON_10, [{"price": 80, "airline": "SK"}], now=hour + 300)
+    history.compact(now=now)
+    assert history.trend("STO", "LON", "2099-10-10", "one-way")[-1]["min"] == 80
+
+
+def test_series_are_kept_apart_by_trip_type_and_cabin(tmp_path):
+    history = PriceHistory(directory=str(tmp_path))
+    now = time.time()
+    history.record(LON_10, [{"price": 100, "airline": "BA"}], now=now)
+    history.record(make_search_spec("STO", "LON", "2099-10-10", "2099-10-17", "round-trip"), [{"price": 180}], now=now)
+    history.record(make_search_spec("STO", "LON", "2099-10-10", "", "one-way", cabin_class="business"), [{"price": 900}], now=now)
+    assert history.record(make_search_spec("STO", "LON", "2099-10-10", "", "one-way", adults=3), [{"price": 300}], now=now) is None
+
+    assert history.compact(now=now) == 3
+    assert [p["min"] for p in history.trend("STO", "LON", "2099-10-10", "one-way")] == [100]
+    assert [p["min"] for p in history.trend("STO", "LON", "2099-10-10", "round-trip")] == [180]
+    assert [p["min"] for p in history.trend("STO", "LON", "2099-10-10", "one-way", "business")] == [900]
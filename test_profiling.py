@@ -0,0 +1,49 @@
+# test_profiling.py: checks opt-in profiling dumps and the slow-request ring buffer
+
+import time
+
+from flask import Flask
+
+import profiling
+
+
+def _app():
+    app = Flask(__name__)
+    profiling.init_profiling(app)
+
+    @app.route("/work")
+    def work():
+        with profiling.timed_phase("upstream"):
+            deadline = time.perf_counter() + 0.2
+            while time.perf_counter() < deadline:
+                pass
+        return "done"
+
+    return app
+
+
+def test_profile_is_opt_in_and_signed(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_SECRET", "s3cret")
+    client = _app().test_client()
+    assert client.get("/work").data == b"done"
+    assert client.get("/work?_profile=0000").data == b"done"
+
+    signature = profiling.profile_signature("/work", "s3cret")
+    response = client.get(f"/work?_profile={signature}")
+    assert response.headers["X-Profiled-Status"] == "200"
+    lines = response.get_data(as_text=True).splitlines()
+    assert any("work (test_profiling.py" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)  # folded "stack count"
+
+    cprofile = client.get("/work?_profile_mode=cprofile", headers={"X-Profile": "s3cret"})
+    assert "function calls" in cprofile.get_data(as_text=True)
+
+
+def test_slow_requests_are_captured_with_phases(monkeypatch):
+    monkeypatch.setattr(profiling, "SLOW_REQUEST_THRESHOLD", 0.05)
+    profiling.slow_requests.clear()
+    assert _app().test_client().get("/work").data == b"done"
+    entry, = profiling.slow_requests
+    assert entry["path"] == "/work" and entry["status"] == 200
+    assert entry["phases"]["upstream"] >= 0.2
+    assert any("test_profiling.py" in "".join(stack) for stack in entry["stacks"].values())
@@ -0,0 +1,34 @@
+# test_ranking.py: checks sort modes, duration parsing and the Pareto front against brute force
+
+import random
+
+from ranking import duration_minutes, pareto_front, rank
+
+
+def _dominates(a, b):
+    keys = ("price", "duration", "stops")
+    return all(a[k] <= b[k] for k in keys) and any(a[k] < b[k] for k in keys)
+
+
+def test_pareto_front_matches_brute_force():
+    rng = random.Random(1)
+    offers = [{"price": rng.randint(50, 80), "duration": rng.randint(60, 90), "stops": rng.randint(0, 2)}
+              for _ in range(300)]
+    expected = {i for i, a in enumerate(offers) if not any(_dominates(b, a) for b in offers)}
+    assert set(pareto_front(offers)) == expected
+
+
+def test_modes_rank_from_one_computation():
+    offers = [
+        {"id": "cheap", "price": 100, "duration": "14h 0m", "stops": 2, "depart": "2099-10-10 05:00"},
+        {"id": "fast", "price": 300, "duration": 120, "stops": 0, "depart": "2099-10-10 10:00"},
+        {"id": "balanced", "price": 140, "duration": "3h 30m", "stops": 0, "depart": "2099-10-10 09:00"},
+        {"id": "worse", "price": 150, "duration": 240, "stops": 1, "depart": "2099-10-10 09:00"},
+    ]
+    assert duration_minutes(offers[0]) == 840
+    ranked = rank(offers, modes=("cheapest", "fastest", "best"), k=2)
+    assert [o["id"] for o in ranked["cheapest"]] == ["cheap", "balanced"]
+    assert [o["id"] for o in ranked["fastest"]] == ["fast", "balanced"]
+    assert ranked["best"][0]["id"] == "balanced"
+    assert [o["id"] for o in ranked["pareto"]] == ["cheap", "balanced", "fast"]
+    assert ranked["best"][0]["pareto"] is True
@@ -0,0 +1,30 @@
+# test_reference_data.py: checks the compiled reference file against its source tables
+
+from reference_data import ReferenceData, build
+
+AIRPORTS = [
+    {"city": "London", "name": "Heathrow Airport", "iata": "LHR"},
+    {"city": "London", "name": "Gatwick Airport", "iata": "LGW"},
+    {"city": "Zürich", "name": "Zürich Airport", "iata": "ZRH"},
+]
+CITIES = {"london": "LON", "new york": "NYC"}
+AIRLINES = {"BA": "British Airways", "SAS": "Scandinavian Airlines"}
+
+
+def test_lookups_by_code_city_and_airline(tmp_path):
+    path = str(tmp_path / "ref.bin")
+    assert build(path, sources=(AIRPORTS, CITIES, AIRLINES)) == (3, 3, 2)
+    ref = ReferenceData(path, auto_build=False)
+
+    assert ref.airport("lhr") == {"iata": "LHR", "name": "Heathrow Airport", "city": "London", "metro": "LON"}
+    assert ref.airport("ZRH")["metro"] is None
+    assert ref.airport("XXX") is None and ref.airport("") is None
+    assert [a["iata"] for a in ref.airports()] == ["LGW", "LHR", "ZRH"]
+
+    assert ref.city(" London ") == {"city": "London", "code": "LON", "airports": ["LGW", "LHR"]}
+    assert ref.city("zürich")["code"] == "ZRH"
+    assert ref.city_code("New York") == "NYC"
+    assert ref.city_code("Atlantis") is None
+
+    assert ref.airline_name("SAS") == "Scandinavian Airlines"
+    assert ref.airline_name("ZZ", "ZZ") == "ZZ"
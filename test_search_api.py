@@ -0,0 +1,99 @@
+# test_search_api.py: checks search spec validation, field selection and conditional/compressed responses
+
+import gzip
+import json
+
+from flask import Flask
+
+from search_api import compact_json_response, parse_fields, parse_search_request, shape_offers
+
+app = Flask(__name__)
+
+
+def test_parse_search_request_validates_spec():
+    params, errors = parse_search_request({"origin": "sto", "destination": "LON", "date_from": "2099-10-10", "trip_type": "one-way"})
+    assert errors == []
+    assert params["origin_code"] == "STO"
+    assert params["date_to_str"] == ""
+
+    _, errors = parse_search_request({"origin": "Stockholm", "destination": "LON", "date_from": "10/10"})
+    assert len(errors) == 3  # bad origin, bad date_from, missing round-trip return
+
+
+def test_field_selection_and_pagination():
+    offers = [{"id": str(i), "price": i, "link": "x"} for i in range(5)]
+    page = shape_offers(offers, parse_fields("id,price,bogus"), page=2, page_size=2)
+    assert page == [{"id": "2", "price": 2}, {"id": "3", "price": 3}]
+
+
+def test_etag_revalidation_and_gzip():
+    payload = {"offers": [{"id": str(i), "airline": "Lufthansa"} for i in range(50)]}
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = compact_json_response(payload)
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(response.get_data())) == payload
+        etag = response.headers["ETag"]
+
+    with app.test_request_context(headers={"Accept-Encoding": "gzip", "If-None-Match": etag}):
+        assert compact_json_response(payload).status_code == 304
+
+
+def _api_client():
+    import travel_ui
+    api = Flask(__name__)
+    api.register_blueprint(travel_ui.travel_bp)
+    return api.test_client()
+
+
+def test_search_age_is_a_header_so_the_body_matches_its_etag(monkeypatch):
+    import travel_ui
+    flights = [{"id": "1", "price": 100, "airlines": ["SK"], "route": [], "deep_link": "x"}]
+    ages = iter([5, 65])
+    monkeypatch.setattr(travel_ui, "search_flights_with_meta", lambda **kwargs: (
+        flights, {"source": "cache", "age": next(ages), "stored_at": 1000.0, "key": "k", "facets": {}, "total": 1}))
+
+    client = _api_client()
+    query = "/api/search?origin=STO&destination=LON&date_from=2099-10-10&trip_type=one-way"
+    first, second = client.get(query), client.get(query)
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert first.get_data() == second.get_data()
+    assert (first.headers["Age"], second.headers["Age"]) == ("5", "65")
+
+
+def test_search_total_counts_offers_beyond_the_limit(monkeypatch):
+    import travel_ui
+    flights = [{"id": str(i), "price": 100 + i, "airlines": ["SK"], "route": [], "deep_link": "x"} for i in range(3)]
+    monkeypatch.setattr(travel_ui, "search_flights_with_meta", lambda **kwargs: (
+        flights, {"source": "live", "age": 0, "key": "k", "facets": {}, "total": 250}))
+
+    body = _api_client().get("/api/search?origin=STO&destination=LON&date_from=2099-10-10&trip_type=one-way").get_json()
+    assert body["total"] == 250
+    assert len(body["offers"]) == 3
+
+
+def test_search_rejects_an_empty_stops_filter():
+    response = _api_client().get("/api/search?origin=STO&destination=LON&date_from=2099-10-10&trip_type=one-way&stops=,")
+    assert response.status_code == 400
+
+
+def test_batch_rejects_a_body_that_is_not_an_object():
+    response = _api_client().post("/api/search/batch", json=[{"origin": "STO"}])
+    assert response.status_code == 400
+
+
+def test_results_page_counts_every_matching_offer(tmp_path, monkeypatch):
+    import travel_ui
+    from booking_drafts import DraftStore
+    flights = [{"id": str(i), "price": 100 + i, "airlines": ["SK"], "route": [], "deep_link": "x"} for i in range(3)]
+    monkeypatch.setattr(travel_ui, "booking_drafts", DraftStore(path=str(tmp_path / "drafts.db")))
+    monkeypatch.setattr(travel_ui, "travel_chatbot", lambda *args, **kwargs: {
+        "flights": flights, "total": 40, "trip_info": {}, "facets": {}})
+
+    api = Flask(__name__)
+    api.secret_key = "test"
+    api.register_blueprint(travel_ui.travel_bp)
+    page = api.test_client().post("/travel-ui", data={
+        "origin_code": "STO", "destination_code": "LON", "date_from": "2099-10-10",
+        "trip_type": "one-way", "cabin_class": "economy", "passengers": "1"})
+    assert page.status_code == 200
+    assert b"Showing 3 of 40 flight offers" in page.data
@@ -0,0 +1,70 @@
+# test_search_queue.py: checks job dedup, claiming, completion and requeueing of stuck jobs
+
+import pytest
+
+from search_cache import make_search_spec
+from search_queue import SearchQueue, SearchPending
+
+
+def _spec(destination="LON"):
+    return make_search_spec("STO", destination, "2099-10-01", "", "one-way")
+
+
+def test_jobs_are_deduplicated_and_claimed_once(tmp_path):
+    queue = SearchQueue(path=str(tmp_path / "queue.db"))
+    job_id = queue.enqueue(_spec())
+    assert queue.enqueue(_spec()) == job_id
+    other_id = queue.enqueue(_spec("PAR"))
+    assert other_id != job_id
+
+    claimed_id, spec = queue.claim("w1")
+    assert (claimed_id, spec) == (job_id, _spec())
+    assert queue.claim("w2")[0] == other_id
+    assert queue.claim("w3") is None
+
+    with pytest.raises(SearchPending):
+        queue.run(_spec("PAR"), timeout=0)
+
+    queue.complete(job_id, [{"price": 42}])
+    assert queue.run(_spec(), timeout=0) == [{"price": 42}]
+    assert queue.enqueue(_spec()) == job_id  # fresh result is reused
+
+
+def test_stuck_running_job_is_requeued(tmp_path):
+    queue = SearchQueue(path=str(tmp_path / "queue.db"), job_timeout=0)
+    job_id = queue.enqueue(_spec())
+    assert queue.claim("w1")[0] == job_id
+    assert queue.claim("w2")[0] == job_id  # w1 presumed dead
+    queue.fail(job_id, "boom")
+    assert queue.get(job_id)["status"] == "failed"
+    assert queue.enqueue(_spec()) != job_id
+
+
+def test_job_polls_hold_a_web_worker_only_briefly(tmp_path, monkeypatch):
+    import time
+    from flask import Flask
+    import travel_ui
+
+    queue = SearchQueue(path=str(tmp_path / "queue.db"))
+    monkeypatch.setattr(travel_ui, "search_queue", queue)
+    app = Flask(__name__)
+    app.register_blueprint(travel_ui.travel_bp)
+    job_id = queue.enqueue(_spec())
+
+    started = time.monotonic()
+    response = app.test_client().get(f"/api/jobs/{job_id}?wait=30")
+    assert time.monotonic() - started < travel_ui.JOB_POLL_MAX_WAIT + 1
+    assert response.get_json()["status"] == "queued"
+    assert response.headers["Retry-After"]
+    assert "no-cache" in response.headers["Cache-Control"]
+
+
+def test_job_creation_rejects_a_body_that_is_not_an_object(tmp_path, monkeypatch):
+    from flask import Flask
+    import travel_ui
+
+    monkeypatch.setattr(travel_ui, "search_queue", SearchQueue(path=str(tmp_path / "queue.db")))
+    app = Flask(__name__)
+    app.register_blueprint(travel_ui.travel_bp)
+    for body in ([], "STO-LON"):
+        assert app.test_client().post("/api/jobs", json=body).status_code == 400
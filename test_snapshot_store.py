@@ -0,0 +1,61 @@
+# test_snapshot_store.py: checks last-known-good snapshots and stale-while-revalidate serving
+
+import threading
+import time
+
+import flight_search
+from search_cache import search_cache, make_search_spec, make_search_key
+from snapshot_store import SnapshotStore
+
+
+def test_snapshot_round_trip(tmp_path):
+    store = SnapshotStore(path=str(tmp_path / "snapshots.db"), max_age=60)
+    store.save("STO:LON", [{"id": "a", "price": 120}])
+
+    flights, age = store.load("STO:LON")
+    assert flights == [{"id": "a", "price": 120}]
+    assert 0 <= age < 60
+    assert store.load("STO:PAR") == (None, None)
+
+
+def test_snapshot_served_while_refreshing(tmp_path, monkeypatch):
+    store = SnapshotStore(path=str(tmp_path / "snapshots.db"))
+    monkeypatch.setattr(flight_search, "snapshot_store", store)
+    monkeypatch.setattr(flight_search, "SNAPSHOT_ENABLED", True)
+    monkeypatch.setattr(flight_search, "SNAPSHOT_STALE_WHILE_REVALIDATE", True)
+    search_cache.clear()
+
+    spec = make_search_spec("STO", "LON", "2099-10-10", "2099-10-17", "round-trip")
+    store.save(make_search_key(spec), [{"id": "old", "price": 150}], stored_at=time.time() - 2 * search_cache.ttl)
+
+    release = threading.Event()
+    def slow_upstream(spec):
+        release.wait(5)
+        return [{"id": "new", "price": 90}]
+    monkeypatch.setattr(flight_search, "fetch_flights", slow_upstream)
+
+    flights, meta = flight_search.search_flights_with_meta("STO", "LON", "2099-10-10", "2099-10-17", "round-trip", track=False)
+    assert [f["id"] for f in flights] == ["old"]
+    assert meta["source"] == "snapshot"
+
+    release.set()
+    flight_search.refresh_in_background(spec).result(timeout=5)
+    assert search_cache.get(make_search_key(spec))[0]["id"] == "new"
+    assert store.load(make_search_key(spec))[0][0]["id"] == "new"
+
+
+def test_fresh_snapshot_from_another_worker_is_a_cache_hit(tmp_path, monkeypatch):
+    store = SnapshotStore(path=str(tmp_path / "snapshots.db"))
+    monkeypatch.setattr(flight_search, "snapshot_store", store)
+    monkeypatch.setattr(flight_search, "SNAPSHOT_ENABLED", True)
+    monkeypatch.setattr(flight_search, "fetch_flights", lambda spec: [{"id": "upstream", "price": 1}])
+    search_cache.clear()
+
+    spec = make_search_spec("STO", "LON", "2099-10-10", "2099-10-17", "round-trip")
+    stored_at = time.time() - 10
+    store.save(make_search_key(spec), [{"id": "warm", "price": 150}], stored_at=stored_at)
+
+    flights, meta = flight_search.search_flights_with_meta("STO", "LON", "2099-10-10", "2099-10-17", "round-trip", track=False)
+    assert [f["id"] for f in flights] == ["warm"]
+    assert meta["source"] == "cache" and meta["stored_at"] == stored_at
+    assert search_cache.get_entry(make_search_key(spec))[0] == stored_at
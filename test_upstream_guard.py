@@ -0,0 +1,58 @@
+# test_upstream_guard.py: checks the shared token bucket and the circuit breaker state machine
+
+import time
+
+import pytest
+
+from upstream_guard import (
+    CircuitBreaker,
+    CircuitOpenError,
+    FileTokenBucket,
+    UpstreamError,
+    CLOSED,
+    OPEN,
+)
+
+
+def _fail():
+    raise UpstreamError("boom")
+
+
+def test_token_bucket_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "bucket")
+    first = FileTokenBucket(path=path, rate=0.01, capacity=2)
+    second = FileTokenBucket(path=path, rate=0.01, capacity=2)  # e.g. another worker
+
+    assert first.acquire(timeout=0)
+    assert second.acquire(timeout=0)
+    assert not first.acquire(timeout=0)
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=2, window=60, slow_call_seconds=10, reset_timeout=0.05)
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            breaker.call(_fail)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "not called")
+
+    time.sleep(0.06)
+    assert breaker.call(lambda: "ok") == "ok"  # half-open trial succeeds
+    assert breaker.state == CLOSED
+
+
+def test_mock_fallback_rows_use_the_offer_schema(monkeypatch):
+    import flight_search
+    from search_cache import make_search_spec, search_cache
+
+    search_cache.clear()
+    spec = make_search_spec("STO", "LON", "2025-10-10", "2025-10-17", "round-trip")
+    flights = flight_search.fallback_flights(spec)
+    assert flights
+    for flight in flights:
+        assert flight["depart"].startswith("2025-10-10") and flight["return"].startswith("2025-10-17")
+        assert flight["link"].startswith("http")
+        assert flight["airline"] and " - " not in flight["airline"]
+        assert "departure" not in flight and "deep_link" not in flight
@@ -0,0 +1,70 @@
+# test_warm_cache.py: checks the search cache and the warm cache scheduler without hitting the upstream
+
+import flight_search
+from search_cache import search_cache, make_search_spec, make_search_key
+from warm_cache import PopularityTracker, WarmCacheScheduler
+
+
+def _spec(destination, date_from="2099-10-10"):
+    return make_search_spec("STO", destination, date_from, "2099-10-17", "round-trip")
+
+
+def test_hot_routes_cover_requested_share():
+    tracker = PopularityTracker()
+    for _ in range(8):
+        tracker.record(_spec("LON"))
+    tracker.record(_spec("PAR"))
+    tracker.record(_spec("TYO"))
+
+    assert tracker.hot_routes(coverage=0.8) == [_spec("LON")]
+    assert len(tracker.hot_routes(coverage=1.0)) == 3
+
+
+def test_cycle_refreshes_within_budget(monkeypatch):
+    calls = []
+    monkeypatch.setattr(flight_search, "fetch_flights", lambda spec: calls.append(spec) or [{"id": spec.destination_code, "price": 100}])
+    search_cache.clear()
+
+    tracker = PopularityTracker()
+    for destination in ["LON", "PAR", "TYO"]:
+        tracker.record(_spec(destination))
+    tracker.record(_spec("AMS", date_from="2000-01-01"))  # past dates are never refreshed
+
+    scheduler = WarmCacheScheduler(tracker=tracker, interval=60, max_calls=2, coverage=1.0)
+    assert scheduler.run_cycle() == 2
+    assert len(calls) == 2
+    assert search_cache.get(make_search_key(calls[0])) is not None
+
+    # Warm routes are served from the cache without another upstream call
+    flights = flight_search.search_flights("STO", calls[0].destination_code, "2099-10-10", "2099-10-17", "round-trip", track=False)
+    assert flights[0]["id"] == calls[0].destination_code
+    assert len(calls) == 2
+
+
+def test_counts_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "warm.db")
+    first = PopularityTracker(path=path, flush_interval=3600)
+    second = PopularityTracker(path=path, flush_interval=3600)  # e.g. another worker
+    for _ in range(3):
+        first.record(_spec("LON"))
+    second.record(_spec("PAR"))
+    second.flush()
+
+    # Reading flushes the reader's own buffer; the others' counts come from the file
+    assert first.hot_routes(coverage=1.0) == [_spec("LON"), _spec("PAR")]
+    first.decay()
+    assert second.hot_routes(coverage=1.0) == [_spec("LON"), _spec("PAR")]
+    first.decay()
+    assert second.hot_routes(coverage=1.0) == [_spec("LON")]
+
+
+def test_only_the_lock_holder_runs_cycles(tmp_path):
+    lock_path = str(tmp_path / "warm.lock")
+    leader = WarmCacheScheduler(tracker=PopularityTracker(), lock_path=lock_path)
+    follower = WarmCacheScheduler(tracker=PopularityTracker(), lock_path=lock_path)
+
+    assert leader.is_leader()
+    assert not follower.is_leader()
+    leader.stop()  # the lock goes away with the leader
+    assert follower.is_leader()
+    follower.stop()
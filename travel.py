@@ -1,16 +1,17 @@
 # travel.py — core travel chatbot logic and form handler
 
 from utils import extract_travel_entities
-from flight_search import search_flights
+from flight_search import search_flights_with_meta
 from iata_codes import city_to_iata
-from mock_data import AIRLINE_NAMES  # ✅ Added import
+from reference_data import reference_data
+from place_resolver import place_resolver
+from ranking import DEFAULT_SORT, SORT_MODES
+from profiling import timed_phase
+from booking_reference import booking_references
 from datetime import date, datetime
 from flask import request
 
-import random
-import string
 from datetime import datetime
-from database import db
 
 from config import AFFILIATE_MARKER
 
@@ -75,8 +76,9 @@ def travel_chatbot(user_input: str, trip_type: str = "round-trip", limit=None, d
     # logger.info(f"Origin IATA: {origin_code}, Destination IATA: {destination_code}")
     
     # in real api call:
-    origin_code = info["origin_code"].upper()
-    destination_code = info["destination_code"].upper()
+    # Codes come from "City (CODE)"; fall back to resolving the city name itself
+    origin_code = (info.get("origin_code") or place_resolver.resolve_code(info.get("origin")) or "").upper()
+    destination_code = (info.get("destination_code") or place_resolver.resolve_code(info.get("destination")) or "").upper()
     logger.info(f"origin_code: {origin_code}, destination_code: {destination_code}")
 
     if not origin_code or not destination_code:
@@ -99,11 +101,12 @@ def travel_chatbot(user_input: str, trip_type: str = "round-trip", limit=None, d
     
     adults = int(request.form.get("passengers", 1))
     cabin_class = request.form.get("cabin_class", "economy")
+    sort = request.form.get("sort", DEFAULT_SORT)
     children = 0  # You can add a form field later if needed
     infants = 0   # Same here 
           
 
-    flights = search_flights(
+    flights, search_meta = search_flights_with_meta(
     origin_code,
     destination_code,
     date_from_str,
@@ -114,7 +117,9 @@ def travel_chatbot(user_input: str, trip_type: str = "round-trip", limit=None, d
     infants=infants,
     cabin_class=cabin_class,
     limit=limit,
-    direct_only=direct_only
+    direct_only=direct_only,
+    sort=sort if sort in SORT_MODES else DEFAULT_SORT,
+    filters={}  # no filters yet; this computes the facets for the results page
     )
 
     if not flights:
@@ -143,32 +148,7 @@ def travel_chatbot(user_input: str, trip_type: str = "round-trip", limit=None, d
         logger.info("{} Flights found for your search limit= {}".format(nr, limit))
 
     # ✅ Prepare flight data for template
-    prepared_flights = []
-    sorted_flights = sorted(flights, key=lambda x: x["price"])
-    
-    for flight in sorted_flights:
-        airline_code = flight.get("airline", "Unknown")
-        airline_name = AIRLINE_NAMES.get(airline_code, airline_code)
-
-        trip_type = flight.get("trip_type", "round-trip")  # fallback if missing
-
-
-        prepared_flights.append({
-            "id": flight["id"],
-            "price": flight.get("price"),
-            "depart": flight.get("depart"),
-            "return": flight.get("return"),
-            "airline": airline_name,
-            "flight_number": flight.get("flight_number", "N/A"),
-            "duration": flight.get("duration", "N/A"),
-            "stops": flight.get("stops", 0),
-            "cabin_class": flight.get("cabin_class", "Economy"),
-            "vendor": flight.get("vendor", "Unknown"),
-            "origin": flight.get("origin", "Unknown"),
-            "destination": flight.get("destination", "Unknown"),
-            "link": flight.get("link"),
-            "trip_type": trip_type
-        })
+    prepared_flights = prepare_flights(flights)
 
     # Debug print
     print("Prepared flight IDs:", [f.get("id") for f in prepared_flights])
@@ -180,8 +160,8 @@ def travel_chatbot(user_input: str, trip_type: str = "round-trip", limit=None, d
     )
 
     trip_info = {
-    "origin": info["origin_code"],
-    "destination": info["destination_code"],
+    "origin": origin_code,
+    "destination": destination_code,
     "departure_date": info["date_from"].strftime('%Y-%m-%d') if info.get("date_from") else "",
     "return_date": info["date_to"].strftime('%Y-%m-%d') if info.get("date_to") else "",
     "passengers": passengers,
@@ -203,13 +183,66 @@ def travel_chatbot(user_input: str, trip_type: str = "round-trip", limit=None, d
 
     return {
         "flights": prepared_flights,
-        "message": None,
+        "message": describe_data_age(search_meta),
         "summary": summary,
         "affiliate_link": affiliate_link,
-        "trip_info": trip_info
+        "trip_info": trip_info,
+        "search_key": search_meta["key"],
+        "facets": search_meta.get("facets"),
+        "total": search_meta.get("total", len(prepared_flights)),
+        # Identifies this exact version of the results; only cache hits have one
+        "search_version": f"{search_meta['key']}@{search_meta['stored_at']}" if search_meta.get("stored_at") else None
     }
 
 
+def prepare_flights(flights):
+    """Shape normalized search results for display, keeping their ranked order; airline codes resolved to names"""
+    with timed_phase("normalize"):
+        return _prepare_flights(flights)
+
+
+def _prepare_flights(flights):
+    prepared_flights = []
+
+    for flight in flights:
+        airline_code = flight.get("airline", "Unknown")
+        airline_name = reference_data.airline_name(airline_code, airline_code)
+
+        prepared_flights.append({
+            "id": flight["id"],
+            "price": flight.get("price"),
+            "currency": flight.get("currency"),
+            "depart": flight.get("depart"),
+            "return": flight.get("return"),
+            "airline": airline_name,
+            "flight_number": flight.get("flight_number", "N/A"),
+            "duration": flight.get("duration", "N/A"),
+            "stops": flight.get("stops", 0),
+            "cabin_class": flight.get("cabin_class", "Economy"),
+            "vendor": flight.get("vendor", "Unknown"),
+            "origin": flight.get("origin", "Unknown"),
+            "destination": flight.get("destination", "Unknown"),
+            "link": flight.get("link"),
+            "trip_type": flight.get("trip_type", "round-trip"),  # fallback if missing
+            "score": flight.get("score"),
+            "pareto": flight.get("pareto"),
+            "arrive": flight.get("arrive"),
+            "segments": _prepare_flights(flight["segments"]) if flight.get("segments") else None,
+            "separate_tickets": flight.get("separate_tickets", False)
+        })
+    return prepared_flights
+
+
+def describe_data_age(search_meta):
+    """Tell the user when results come from a last-known-good snapshot instead of a live search"""
+    if search_meta.get("source") != "snapshot":
+        return None
+    minutes = int(search_meta.get("age", 0) // 60)
+    if minutes < 60:
+        return f"⏱️ Showing prices from {minutes} min ago while we refresh them."
+    return f"⏱️ Showing prices from {minutes // 60} h ago — live prices are temporarily unavailable."
+
+
 def travel_form_handler(form_data):
     origin = form_data.get("origin", "").strip()
     destination = form_data.get("destination", "").strip()
@@ -246,7 +279,5 @@ def travel_form_handler(form_data):
 
 
 def generate_booking_reference():
-    prefix = "FF"
-    date_str = datetime.now().strftime("%Y%m%d")
-    random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))
-    return f"{prefix}-{date_str}-{random_str}"
\ No newline at end of file
+    # Numbered from a database sequence: unique without checking the bookings table first
+    return booking_references.next_reference()
\ No newline at end of file
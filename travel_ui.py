@@ -1,28 +1,35 @@
-from flask import Blueprint, redirect, render_template, request, jsonify, url_for
-from travel import travel_chatbot
+from flask import Blueprint, redirect, render_template, request, jsonify, url_for, session, Response, stream_with_context
+from travel import travel_chatbot, prepare_flights
 from datetime import datetime
-from config import DEBUG_MODE, FEATURED_FLIGHT_LIMIT
+from config import DEBUG_MODE, FEATURED_FLIGHT_LIMIT, BATCH_SEARCH_MAX_ITEMS, AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_AGE
+from config import JOB_POLL_MAX_WAIT, JOB_POLL_INTERVAL, SHOWN_OFFERS_LIMIT
 import json
-from database import db
+import re
 
 from utils import extract_travel_entities
-from flight_search import search_flights
-from iata_codes import city_to_iata
+from flight_search import search_flights, search_flights_with_meta
+from search_queue import search_queue, SearchPending
+from search_api import (
+    API_DEFAULT_PAGE_SIZE, API_MAX_OFFERS, API_MAX_PAGE_SIZE, CABIN_CLASSES, TRIP_TYPES,
+    compact_json_response, make_etag, not_modified_response,
+    parse_fields, parse_multi_city_request, parse_search_request, shape_offers,
+)
+from render_cache import render_cached_fragment
+from place_resolver import place_resolver, normalize as normalize_place
+from ranking import DEFAULT_SORT, SORT_MODES
+from facets import FILTER_PARAMS, parse_filters
+from search_cache import parse_search_key
+from reference_data import reference_data
+from booking_drafts import booking_drafts
 
 from travel import generate_booking_reference  # ✅ import from travel.py
 from travel import travel_form_handler
 
-from models import Booking, db
-from travel import generate_booking_reference
-from models import Booking
-from db import save_booking
-
 
 from config import get_logger
 logger = get_logger(__name__)
 
 
-offers_db = {}
 travel_bp = Blueprint("travel", __name__) 
 
 def format_datetime(dt_str):
@@ -72,6 +79,10 @@ def travel_ui():
             errors.append("Destination airport is required.")
             if DEBUG_MODE:
                 print("⚠️  Destination airport is required.")
+
+        # Typed text that was not picked from the suggestions, e.g. "Lodnon" -> "London (LON)"
+        origin_code = resolve_place_input(origin_code, "origin", errors)
+        destination_code = resolve_place_input(destination_code, "destination", errors)
         if not date_from_raw:
             errors.append("Departure date is required.")
         if trip_type != "one-way" and not date_to_raw:
@@ -120,12 +131,13 @@ def travel_ui():
             )
 
         try:
-            result = travel_chatbot( user_input,trip_type=trip_type, limit=limit, direct_only=direct_only)
+            result = travel_chatbot(user_input, trip_type=trip_type, limit=limit, direct_only=direct_only)
+        except SearchPending as pending:
+            return render_search_pending(pending.job_id)
         except Exception as e:
             error_msg = f"WARNING: Something went wrong while processing your request: {str(e)}"
             return render_template("travel_form.html", errors=[error_msg], form_data=form_data)
 
-        offers_db.clear()
         trip_info = result.get("trip_info", {})
         flights = result.get("flights", [])
 
@@ -134,7 +146,7 @@ def travel_ui():
             prepared_flight["destination"] = trip_info.get("destination", destination_code)
             prepared_flight["depart_formatted"] = format_datetime(prepared_flight.get("depart", ""))
             prepared_flight["return_formatted"] = format_datetime(prepared_flight.get("return", ""))
-            offers_db[prepared_flight["id"]] = prepared_flight
+        remember_shown_offers(flights)
 
         DISPLAY_LIMIT = 3
         top_offers = flights[:DISPLAY_LIMIT]
@@ -143,17 +155,35 @@ def travel_ui():
         debug_mode = request.args.get("debug") == "true"
         print("DEBUG MODE:", debug_mode)
 
+        # Everyone repeating a cached search gets the same cards, so render them once
+        results_table = None
+        if result.get("search_version"):
+            results_table = render_cached_fragment(
+                "_results_table.html",
+                f"{result['search_version']}:{trip_type}:{limit}:{direct_only}:{request.form.get('sort', DEFAULT_SORT)}",
+                flights=flights,
+                direct_only=direct_only,
+                trip_type=trip_type
+            )
+
         return render_template(
             "travel_results.html",
+            search_key=result.get("search_key"),
+            facets=result.get("facets"),
+            airline_names=airline_names(result.get("facets")),
+            sort=request.form.get("sort", DEFAULT_SORT),
+            limit=limit,
             top_offers=top_offers,
             flights=flights,
+            total=result.get("total"),
             message=result.get("message"),
             summary=result.get("summary"),
             affiliate_link=result.get("affiliate_link"),
             trip_info=trip_info,
             show_more=show_more,
             debug_payload=result if debug_mode else None,
-            direct_only=direct_only
+            direct_only=direct_only,
+            results_table=results_table
         )
 
     return render_template("travel_form.html", form_data={}, errors=[])
@@ -162,133 +192,226 @@ def travel_ui():
 
 @travel_bp.route("/offer/<offer_id>")
 def view_offer(offer_id):
-    offer = offers_db.get(offer_id)
+    offer = shown_offer(offer_id)
     if offer is None:
         error_msg = f" Warning No offer found for ID: {offer_id}"
         return render_template("travel_form.html", errors=[error_msg])
     return render_template("travel_offer_details.html", offer=offer)
 
 
+def resolve_place_input(raw, field, errors):
+    """Form value as "City (CODE)"; free text is resolved fuzzily, unknown places add an error"""
+    if not raw or re.search(r"\(\s*[A-Z]{3}\s*\)", raw):
+        return raw
+    place = place_resolver.resolve(raw)
+    if place is None:
+        suggestions = ", ".join(p.city for _, p in place_resolver.search(raw, limit=3))
+        errors.append(f"Unknown {field} '{raw}'." + (f" Did you mean {suggestions}?" if suggestions else ""))
+        return raw
+    return f"{place.city} ({place.code})"
+
+
+def airline_names(facets):
+    return {code: reference_data.airline_name(code, code) for code in (facets or {}).get("airlines", {})}
+
+
+@travel_bp.route("/results/filter", methods=["GET"])
+def filter_results():
+    """Re-filter the cached results of a search without searching again; returns the cards and facets"""
+    try:
+        spec = parse_search_key(request.args.get("key", ""))
+    except ValueError:
+        return jsonify({"errors": ["Unknown search."]}), 400
+    filters, errors = parse_filters(request.args)
+    sort = request.args.get("sort", DEFAULT_SORT)
+    if sort not in SORT_MODES:
+        errors.append(f"sort must be one of {', '.join(SORT_MODES)}.")
+    if errors:
+        return jsonify({"errors": errors}), 400
+    limit = min(API_MAX_PAGE_SIZE, max(1, request.args.get("limit", FEATURED_FLIGHT_LIMIT, type=int)))
+
+    # A cache hit normally; an evicted search is simply run again
+    flights, meta = search_flights_with_meta(
+        **spec._asdict(), limit=limit, sort=sort, filters=filters, track=False
+    )
+    flights = prepare_flights(flights)
+    for flight in flights:
+        flight.setdefault("origin", spec.origin_code)
+        flight.setdefault("destination", spec.destination_code)
+        flight["depart_formatted"] = format_datetime(flight.get("depart", ""))
+        flight["return_formatted"] = format_datetime(flight.get("return", ""))
+    remember_shown_offers(flights)
+
+    html = render_template("_results_table.html", flights=flights, direct_only=False, trip_type=spec.trip_type)
+    return compact_json_response({
+        "total": meta["total"],
+        "shown": len(flights),
+        "facets": meta["facets"],
+        "airline_names": airline_names(meta["facets"]),
+        "html": html,
+    }, cache_control="private, no-cache")
+
+
+@travel_bp.app_context_processor
+def inject_last_search():
+    token = session.get("last_search_token")
+    return {"last_search": booking_drafts.get(token) if token else None}
+
+
+# Bumped when the response format changes, so browsers drop their long-cached responses
+AUTOCOMPLETE_FORMAT = 2
+
+
+def autocomplete_version():
+    return f"{place_resolver.version}.{AUTOCOMPLETE_FORMAT}"
+
+
+@travel_bp.app_context_processor
+def inject_autocomplete_settings():
+    return {"autocomplete_version": autocomplete_version(), "autocomplete_limit": AUTOCOMPLETE_LIMIT}
+
+
 @travel_bp.route("/autocomplete-airports")
 def autocomplete_airports():
-    logger.info("Autocomplete route hit!")
-    query = request.args.get("query", "").strip().lower()
-    logger.debug(f"Query received: '{query}'")
+    query = normalize_place(request.args.get("query", ""))
+    version = autocomplete_version()
+
+    # Suggestions depend only on the normalized prefix and the data version. Requests that
+    # name the current version (as the form does) may be cached by browsers and proxies for long.
+    etag = make_etag("autocomplete", version, query, AUTOCOMPLETE_LIMIT)
+    if request.args.get("v") == version:
+        cache_control = f"public, max-age={AUTOCOMPLETE_MAX_AGE}, immutable"
+    else:
+        cache_control = "public, max-age=300"
+    cached = not_modified_response(etag, cache_control)
+    if cached is not None:
+        return cached
+
+    suggestions, prefix_only = place_resolver.suggest(query, limit=AUTOCOMPLETE_LIMIT)
+    logger.debug(f"Autocomplete '{query}': {[place.code for place, _ in suggestions]}")
+
+    # With prefix_only the client narrows this list itself for longer queries, matching
+    # `names` (which include aliases) the way the server would
+    items = [{
+        "value": f"{place.city} ({place.code})",
+        "label": place.label if place.kind == "airport" else f"{place.city} — all airports ({place.code})",
+        "names": names,
+    } for place, names in suggestions]
+
+    return compact_json_response({"items": items, "prefix_only": prefix_only}, etag=etag, cache_control=cache_control)
+
+
+# === Booking Flow ===
+# Each step posts only the draft token; the flight and passenger live in booking_drafts
+
+DEMO_PASSENGER = {"name": "Mehrdad Zandi", "email": "mehzan07@yahoo.com", "phone": "0730318625"}
+
+
+def booking_flight(offer):
+    """The fields of a search result the booking pages show and the booking record keeps"""
+    return {
+        "id": offer.get("id"),
+        "origin": offer.get("origin"),
+        "destination": offer.get("destination"),
+        "departure_date": offer.get("depart"),
+        "return_date": offer.get("return"),
+        "price": offer.get("price"),
+        "currency": offer.get("currency"),
+        "airline": offer.get("airline"),
+        "flight_number": offer.get("flight_number"),
+        "cabin_class": offer.get("cabin_class"),
+        "stops": offer.get("stops"),
+        "duration": offer.get("duration"),
+        "vendor": offer.get("vendor"),
+    }
 
-    with open("airports.json", "r", encoding="utf-8") as f:
-        airports = json.load(f)
 
-    tokens = query.replace("(", "").replace(")", "").replace("-", "").split()
+def remember_shown_offers(flights):
+    """Keep the offers this visitor was shown in their own draft, so "Book Now" and the
+    details page find them on any worker, whatever other visitors search meanwhile"""
+    token = session.get("shown_offers_token")
+    offers = (booking_drafts.get(token) or {}).get("offers", {}) if token else {}
+    for flight in flights:
+        offers.pop(flight["id"], None)
+        offers[flight["id"]] = flight  # newest last
+    # Earlier searches (other tabs) stay bookable, up to SHOWN_OFFERS_LIMIT offers
+    offers = dict(list(offers.items())[-SHOWN_OFFERS_LIMIT:])
+    session["shown_offers_token"] = booking_drafts.save({"offers": offers}, token)
 
-    matches = [a for a in airports if any(
-        is_token_match(token, a) for token in tokens if len(token) >= 1
-    )]
 
-    logger.debug(f"Matched airports: {[a['iata'] for a in matches]}")
+def shown_offer(offer_id):
+    token = session.get("shown_offers_token")
+    draft = booking_drafts.get(token) if token else None
+    return (draft or {}).get("offers", {}).get(offer_id)
 
-    results = [{
-        "value": f'{a["city"]} ({a["iata"]})',
-        "label": f'{a["name"]} — {a["city"]} ({a["iata"]})'
-    } for a in matches]
 
-    return jsonify(results)
+def posted_passenger():
+    return {
+        "name": request.form.get("name"),
+        "email": request.form.get("email"),
+        "phone": request.form.get("phone")
+    }
+
+
+def expired_draft():
+    logger.warning("Booking step posted an unknown or expired draft token")
+    return "Your booking session has expired. Please search again.", 400
 
 
-def is_token_match(token, airport):
-    return (
-        airport["city"].lower().startswith(token) or
-        airport["name"].lower().startswith(token) or
-        airport["iata"].lower().startswith(token)
-    )
-    
-    
 @travel_bp.route("/book-flight", methods=["POST"])
 def book_flight():
-    flight = {
-        "id": request.form.get("flight_id"),
-        "origin": request.form.get("origin"),
-        "destination": request.form.get("destination"),
-        "departure_date": request.form.get("departure_date"),
-        "return_date": request.form.get("return_date"),
-        "price": request.form.get("price"),
-        "airline": request.form.get("airline"),
-        "flight_number": request.form.get("flight_number"),
-        "cabin_class": request.form.get("cabin_class"),
-        "stops": request.form.get("stops"),
-        "duration": request.form.get("duration"),
-        "vendor": request.form.get("vendor"),
-    }
+    # The price comes from the server's copy of the results, never from the form
+    offer = shown_offer(request.form.get("flight_id", ""))
+    if offer is None:
+        return render_template("travel_form.html", errors=["This offer is no longer available. Please search again."], form_data={})
 
+    flight = booking_flight(offer)
+    token = booking_drafts.save({"flight": flight})
     logger.info(f"Booking flight: {flight}")
-    return render_template("travel_confirm.html", flight=flight)
-
-
-
+    return render_template("travel_confirm.html", flight=flight, draft=token)
 
 
 @travel_bp.route("/enter-passenger-info", methods=["POST"])
 def enter_passenger_info():
-    flight_data = request.form.get("flight_data")
-    name = request.form.get("name")
-    email = request.form.get("email")
-    phone = request.form.get("phone")
-
-    try:
-        flight = json.loads(flight_data)
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to decode flight data: {e}")
-        return "Invalid flight data", 400
-
-    passenger = {
-        "name": name,
-        "email": email,
-        "phone": phone
-    }
+    token = request.form.get("draft")
+    draft = booking_drafts.get(token)
+    if draft is None:
+        return expired_draft()
 
-    return render_template("travel_confirm.html", flight=flight, passenger=passenger)
+    passenger = posted_passenger()
+    if any(passenger.values()):
+        booking_drafts.update(token, passenger=passenger)
+    return render_template("travel_confirm.html", flight=draft["flight"], passenger=passenger, draft=token)
 
 
 @travel_bp.route("/payment", methods=["POST"])
 def payment():
-    flight_data = request.form.get("flight_data")
-    name = request.form.get("name")
-    email = request.form.get("email")
-    phone = request.form.get("phone")
+    token = request.form.get("draft")
+    draft = booking_drafts.get(token)
+    if draft is None:
+        return expired_draft()
 
-    try:
-        flight = json.loads(flight_data)
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to decode flight data: {e}")
-        return "Invalid flight data", 400
-
-    passenger = {
-        "name": name,
-        "email": email,
-        "phone": phone
-    }
-    return render_template("payment_form.html", flight=flight, passenger=passenger)
+    # Steps that did not ask for details fall back to what was entered earlier, then the demo passenger
+    earlier = draft.get("passenger") or {}
+    passenger = {k: v or earlier.get(k) or DEMO_PASSENGER[k] for k, v in posted_passenger().items()}
+    booking_drafts.update(token, passenger=passenger)
+    return render_template("payment_form.html", flight=draft["flight"], passenger=passenger, draft=token)
 
 
 @travel_bp.route("/complete-booking", methods=["POST"])
 def complete_booking():
-    flight_data = request.form.get("flight_data")
-    name = request.form.get("name")
-    email = request.form.get("email")
-    phone = request.form.get("phone")
-    card_number = request.form.get("card_number")
+    draft = booking_drafts.get(request.form.get("draft"))
+    if draft is None:
+        return expired_draft()
+    flight = draft["flight"]
+    passenger = draft.get("passenger") or posted_passenger()
+    card_number = request.form.get("card_number") or ""
     expiry = request.form.get("expiry")
-    cvv = request.form.get("cvv")
-
-    try:
-        flight = json.loads(flight_data)
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to decode flight data: {e}")
-        return "Invalid flight data", 400
 
-    logger.info(f"✅ Booking completed for {name} ({email}, {phone}) → {flight}")
+    logger.info(f"✅ Booking completed for {passenger['name']} ({passenger['email']}, {passenger['phone']}) → {flight}")
     logger.info(f"💳 Payment info: Card ending in {card_number[-4:]}, Exp: {expiry}")
 
-    return render_template("booking_success.html", flight=flight, name=name)
+    return render_template("booking_success.html", flight=flight, name=passenger["name"])
 
 
 @travel_bp.route("/", methods=["GET"])
@@ -306,8 +429,8 @@ def flightfinder():
         user_input = request.form.get("user_input", "").strip()
         info = extract_travel_entities(user_input)
 
-        origin_code = city_to_iata.get(info["origin"].lower())
-        destination_code = city_to_iata.get(info["destination"].lower())
+        origin_code = place_resolver.resolve_code(info.get("origin"))
+        destination_code = place_resolver.resolve_code(info.get("destination"))
 
         if not origin_code or not destination_code:
             return render_template("travel_results.html", message="🌍 Unknown city. Try major cities like Paris or Tokyo.")
@@ -325,8 +448,8 @@ def flightfinder():
         infants = int(request.form.get("infants", 0))
         cabin_class = request.form.get("cabin_class", "economy").lower()
 
-        # ✅ Store last search in session
-        session["last_search"] = {
+        # ✅ Store last search server-side; the session cookie only carries its token
+        last_search = {
             "origin": origin_code,
             "destination": destination_code,
             "departure": info["date_from_str"],
@@ -337,21 +460,26 @@ def flightfinder():
             "infants": infants,
             "cabin_class": cabin_class
         }
-
+        session["last_search_token"] = booking_drafts.save(last_search, session.get("last_search_token"))
 
         # ✅ Call the search function with all required arguments
-        flights = search_flights(
-            origin_code, destination_code,
-            info["date_from_str"], info["date_to_str"],
-            trip_type=trip_type,
-            adults=adults, children=children, infants=infants,
-            cabin_class=cabin_class
-        )
+        try:
+            flights = search_flights(
+                origin_code, destination_code,
+                info["date_from_str"], info["date_to_str"],
+                trip_type=trip_type,
+                adults=adults, children=children, infants=infants,
+                cabin_class=cabin_class
+            )
+        except SearchPending as pending:
+            return render_search_pending(pending.job_id)
 
         if not flights:
             fallback_message = "😕 No flights found or API error occurred. Try again later or adjust your search."
             return render_template("travel_results.html", message=fallback_message, info=info)
 
+        remember_shown_offers(flights)  # "Book Now" looks the offer up by id
+
         return render_template("travel_results.html", flights=flights, info=info)
 
    # return render_template("travel_form.html", mode="chat")
@@ -373,22 +501,17 @@ def results():
 @travel_bp.route("/confirm-booking", methods=["POST"])
 def confirm_booking():
     try:
-        # Passenger info
-        name = request.form.get("name")
-        email = request.form.get("email")
-        phone = request.form.get("phone")
-
-        # Flight info
-        import json
-        flight_json = request.form.get("flight_data")
-        flight = json.loads(flight_json) if flight_json else {}
-
-        if not all([name, email, phone, flight]):
-            raise ValueError("Missing passenger or flight data")
+        token = request.form.get("draft")
+        draft = booking_drafts.get(token)
+        if draft is None:
+            return expired_draft()
 
-        passenger = {"name": name, "email": email, "phone": phone}
+        passenger = posted_passenger()
+        if not all(passenger.values()):
+            raise ValueError("Missing passenger data")
 
-        return render_template("payment_form.html", flight=flight, passenger=passenger)
+        booking_drafts.update(token, passenger=passenger)
+        return render_template("payment_form.html", flight=draft["flight"], passenger=passenger, draft=token)
 
     except Exception as e:
         import traceback
@@ -398,22 +521,15 @@ def confirm_booking():
 
 @travel_bp.route("/finalize-booking", methods=["POST"])
 def finalize_booking():
-    try:
-        # Get form data
-        flight_json = request.form.get("flight_data")
-        passenger_json = request.form.get("passenger_data")
-
-        # Debug: log raw form data
-        print("Raw flight_data:", flight_json)
-        print("Raw passenger_data:", passenger_json)
+    token = request.form.get("draft")
+    # Taking the draft out makes a double-submitted payment book only once
+    draft = booking_drafts.pop(token)
+    if draft is None:
+        return expired_draft()
 
-        # Parse JSON strings
-        flight = json.loads(flight_json) if flight_json else {}
-        passenger = json.loads(passenger_json) if passenger_json else {}
-
-        # Debug: log parsed data
-        print("Parsed flight:", flight)
-        print("Parsed passenger:", passenger)
+    try:
+        flight = draft["flight"]
+        passenger = draft.get("passenger") or {}
 
         # Validate passenger fields
         required_fields = ["name", "email", "phone"]
@@ -425,7 +541,8 @@ def finalize_booking():
         reference = generate_booking_reference()
 
         # Save to database
-        save_booking(reference, passenger, flight_json)
+        from db import save_booking
+        save_booking(reference, passenger, json.dumps(flight))
 
         # Render confirmation page
         return render_template(
@@ -436,17 +553,303 @@ def finalize_booking():
         )
 
     except Exception as e:
+        booking_drafts.save(draft, token)  # let the user retry
         print(f"Booking error: {e}")
         return f"Internal Server Error: {e}", 500
-    
+
+
 @travel_bp.route("/booking-history")
 def booking_history():
     from db import get_booking_history
-    bookings = get_booking_history()
-    return render_template("booking_history.html", bookings=bookings)
+    page = max(1, request.args.get("page", 1, type=int))
+    bookings, has_more = get_booking_history(page)
+    return render_template("booking_history.html", bookings=bookings, page=page, has_more=has_more)
+
+
+# === JSON Search API ===
+
+@travel_bp.route("/api/search", methods=["GET"])
+def api_search():
+    params, errors = parse_search_request(request.args)
+    if errors:
+        return jsonify({"errors": errors}), 400
+
+    fields = parse_fields(request.args.get("fields"))
+    page = max(1, request.args.get("page", 1, type=int))
+    page_size = min(API_MAX_PAGE_SIZE, max(1, request.args.get("page_size", API_DEFAULT_PAGE_SIZE, type=int)))
+    sort = request.args.get("sort", DEFAULT_SORT)
+    if sort not in SORT_MODES:
+        return jsonify({"errors": [f"sort must be one of {', '.join(SORT_MODES)}."]}), 400
+    filters, filter_errors = parse_filters(request.args)
+    if filter_errors:
+        return jsonify({"errors": filter_errors}), 400
+    filter_args = "&".join(f"{name}={request.args.get(name)}" for name in FILTER_PARAMS if request.args.get(name))
+
+    try:
+        flights, meta = search_flights_with_meta(**params, limit=API_MAX_OFFERS, sort=sort, filters=filters)
+    except SearchPending as pending:
+        return jsonify({"job_id": pending.job_id,
+                        "poll": url_for("travel.api_get_job", job_id=pending.job_id)}), 202
+
+    # The age changes every second while the body does not, so it goes in the Age header
+    age = str(int(meta.get("age") or 0))
+
+    # Cached results have a version, so repeat polls can be answered before any serialization
+    etag = None
+    if meta.get("stored_at"):
+        etag = make_etag(meta["key"], meta["stored_at"], params["direct_only"], sort, filter_args, ",".join(fields), page, page_size)
+        cached = not_modified_response(etag)
+        if cached is not None:
+            cached.headers["Age"] = age
+            return cached
+
+    offers = prepare_flights(flights)
+    payload = {
+        "search": {k: v for k, v in params.items() if v not in ("", None)},
+        "sort": sort,
+        "source": meta["source"],
+        "total": meta["total"],  # offers matching the filters, before the API_MAX_OFFERS limit
+        "facets": meta["facets"],
+        "page": page,
+        "page_size": page_size,
+        "offers": shape_offers(offers, fields, page, page_size),
+    }
+    response = compact_json_response(payload, etag=etag)
+    response.headers["Age"] = age
+    return response
+
+
+@travel_bp.route("/api/search/batch", methods=["POST"])
+def api_search_batch():
+    from batch_search import run_batch
+
+    body = request.get_json(silent=True)
+    items = body.get("searches") if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"errors": ["Body must be {\"searches\": [...]}."]}), 400
+    if len(items) > BATCH_SEARCH_MAX_ITEMS:
+        return jsonify({"errors": [f"At most {BATCH_SEARCH_MAX_ITEMS} searches per batch."]}), 400
+
+    fields = parse_fields(request.args.get("fields"))
+    per_route = min(API_MAX_PAGE_SIZE, max(1, request.args.get("limit", API_DEFAULT_PAGE_SIZE, type=int)))
+    shape = lambda flights: shape_offers(prepare_flights(flights), fields, 1, per_route)
+
+    def generate():
+        # Items fail one by one inside run_batch; this only keeps a broken batch from cutting the stream
+        try:
+            for result in run_batch(items, shape):
+                yield json.dumps(result, separators=(",", ":"), default=str) + "\n"
+        except Exception as e:
+            logger.exception("Batch search stream failed")
+            yield json.dumps({"error": str(e)}, separators=(",", ":")) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@travel_bp.route("/api/search/multi-city", methods=["POST"])
+def api_search_multi_city():
+    from multi_city import search_multi_city
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"errors": ["Body must be a JSON object."]}), 400
+    params, errors = parse_multi_city_request(body)
+    if errors:
+        return jsonify({"errors": errors}), 400
+    fields = parse_fields(request.args.get("fields"))
+    limit = min(API_MAX_PAGE_SIZE, max(1, request.args.get("limit", API_DEFAULT_PAGE_SIZE, type=int)))
+
+    flights, meta = search_multi_city(**params, limit=limit)
+    if meta["source"] == "pending":
+        # Each pending leg can be polled; repeating this request once they are done returns the itineraries
+        for leg in meta["legs"]:
+            if "job_id" in leg:
+                leg["poll"] = url_for("travel.api_get_job", job_id=leg["job_id"])
+        response = jsonify({"status": "pending", "legs": meta["legs"]})
+        response.headers["Retry-After"] = str(max(1, round(JOB_POLL_INTERVAL)))
+        return response, 202
+
+    offers = prepare_flights(flights)
+    payload = {
+        "legs": [dict(zip(("origin", "destination", "date"), leg)) for leg in params["legs"]],
+        "source": meta["source"],
+        "total": len(offers),
+        "offers": shape_offers(offers, fields, 1, limit),
+    }
+    return compact_json_response(payload, cache_control="private, no-cache")
+
+
+@travel_bp.route("/api/explore", methods=["GET"])
+def api_explore():
+    from explore import explore
+
+    origin = request.args.get("origin", "").strip().upper()
+    date_from = request.args.get("date_from", "").strip()
+    date_to = request.args.get("date_to", "").strip() or None
+    try:
+        datetime.strptime(date_from, "%Y-%m-%d")
+        if date_to:
+            datetime.strptime(date_to, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"errors": ["date_from and date_to must be YYYY-MM-DD."]}), 400
+    if len(origin) != 3:
+        return jsonify({"errors": ["origin must be a 3-letter IATA code."]}), 400
+
+    result = explore(
+        origin, date_from, date_to,
+        adults=max(1, request.args.get("adults", 1, type=int)),
+        cabin_class=request.args.get("cabin_class", "economy").lower(),
+    )
+    return compact_json_response(result)
+
+
+@travel_bp.route("/api/price-trend", methods=["GET"])
+def api_price_trend():
+    from price_history import price_history
+
+    origin = request.args.get("origin", "").strip().upper()
+    destination = request.args.get("destination", "").strip().upper()
+    travel_date = request.args.get("date", "").strip() or None
+    trip_type = request.args.get("trip_type", "round-trip").strip()
+    cabin_class = request.args.get("cabin_class", "economy").strip().lower()
+    if len(origin) != 3 or len(destination) != 3:
+        return jsonify({"errors": ["origin and destination must be 3-letter IATA codes."]}), 400
+    if trip_type not in TRIP_TYPES or cabin_class not in CABIN_CLASSES:
+        return jsonify({"errors": ["trip_type or cabin_class is not supported."]}), 400
+    try:
+        points = price_history.trend(origin, destination, travel_date, trip_type, cabin_class)
+    except ValueError:
+        return jsonify({"errors": ["date must be YYYY-MM-DD."]}), 400
+
+    payload = {"route": f"{origin}-{destination}", "date": travel_date, "trip_type": trip_type,
+               "cabin_class": cabin_class, "points": points}
+    if travel_date:
+        payload["airlines"] = price_history.airline_mins(origin, destination, travel_date, trip_type, cabin_class)
+    return compact_json_response(payload)
+
+
+@travel_bp.route("/api/watches", methods=["POST"])
+def api_create_watch():
+    from price_alerts import price_alerts
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"errors": ["Body must be a JSON object."]}), 400
+    email = str(body.get("email", "")).strip()
+    origin = str(body.get("origin", "")).strip().upper()
+    destination = str(body.get("destination", "")).strip().upper()
+    trip_type = str(body.get("trip_type", "round-trip")).strip()
+    cabin_class = str(body.get("cabin_class", "economy")).strip().lower()
+    if "@" not in email or len(origin) != 3 or len(destination) != 3:
+        return jsonify({"errors": ["email, origin and destination are required."]}), 400
+    if trip_type not in TRIP_TYPES or cabin_class not in CABIN_CLASSES:
+        return jsonify({"errors": ["trip_type or cabin_class is not supported."]}), 400
+    try:
+        adults, children, infants = (int(body.get(name, default)) for name, default in
+                                     (("adults", 1), ("children", 0), ("infants", 0)))
+        if adults < 1 or children < 0 or infants < 0:
+            raise ValueError("adults must be at least 1.")
+        watch, token = price_alerts.add_watch(
+            email, origin, destination,
+            body.get("date_from", ""), body.get("date_to") or body.get("date_from", ""),
+            float(body.get("max_price")),
+            trip_type, cabin_class, adults, children, infants,
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"errors": [f"Invalid watch: {e}"]}), 400
+
+    # The token is only shown here; the email is not echoed back
+    payload = {k: v for k, v in watch._asdict().items() if k != "email"}
+    payload["token"] = token
+    payload["unsubscribe"] = url_for("travel.api_delete_watch", watch_id=watch.id, token=token, _external=True)
+    return jsonify(payload), 201
+
+
+@travel_bp.route("/api/watches/<int:watch_id>", methods=["DELETE"])
+def api_delete_watch(watch_id):
+    from price_alerts import price_alerts
+
+    token = request.headers.get("X-Watch-Token") or request.args.get("token", "")
+    if not token or not price_alerts.remove_watch(watch_id, token):
+        # Same answer for unknown ids and wrong tokens, so ids cannot be probed
+        return jsonify({"errors": ["No active watch with that id and token."]}), 404
+    return "", 204
+
+
+def render_search_pending(job_id):
+    """Interim page that re-posts the same form once the queued search has had time to finish"""
+    return render_template(
+        "search_pending.html",
+        job_id=job_id,
+        poll_interval_ms=int(JOB_POLL_INTERVAL * 1000),
+        action=request.path,
+        form_items=list(request.form.items(multi=True))
+    ), 202
+
+
+@travel_bp.route("/api/jobs", methods=["POST"])
+def api_create_job():
+    from search_cache import make_search_spec
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"errors": ["Body must be a JSON object."]}), 400
+    params, errors = parse_search_request(body)
+    if errors:
+        return jsonify({"errors": errors}), 400
+    params.pop("direct_only", None)
+    job_id = search_queue.enqueue(make_search_spec(**params))
+    return jsonify({"job_id": job_id, "poll": url_for("travel.api_get_job", job_id=job_id)}), 202
+
+
+@travel_bp.route("/api/jobs/<job_id>", methods=["GET"])
+def api_get_job(job_id):
+    # A poll holds a web worker while it waits, so clients re-poll rather than wait long here
+    wait = min(JOB_POLL_MAX_WAIT, max(0.0, request.args.get("wait", 0, type=float)))
+    job = search_queue.wait(job_id, wait)
+    if job is None:
+        return jsonify({"errors": [f"No search job {job_id}."]}), 404
+
+    payload = {"job_id": job_id, "status": job["status"]}
+    if job["status"] == "done":
+        offers = prepare_flights(job["flights"] or [])
+        payload["total"] = len(offers)
+        payload["offers"] = shape_offers(offers, parse_fields(request.args.get("fields")), 1, API_MAX_PAGE_SIZE)
+    elif job["error"]:
+        payload["error"] = job["error"]
+    response = compact_json_response(payload, cache_control="private, no-cache")
+    if job["status"] not in ("done", "failed"):
+        response.headers["Retry-After"] = str(max(1, round(JOB_POLL_INTERVAL)))
+    return response
 
 
 # === Health Check ===
 @travel_bp.route("/health", methods=["GET"])
 def health():
     return jsonify({'status': 'ok', 'timestamp': datetime.utcnow().isoformat()})
+
+
+@travel_bp.route("/health/upstream", methods=["GET"])
+def upstream_health():
+    from upstream_guard import get_upstream_metrics
+    from search_cache import search_cache
+    return jsonify({'upstream': get_upstream_metrics(), 'search_cache': search_cache.stats()})
+
+
+# === Admin ===
+@travel_bp.route("/admin/slow-requests", methods=["GET"])
+def admin_slow_requests():
+    """Most recent slow requests, newest first; needs the profiling secret"""
+    import hmac
+    from config import PROFILING_SECRET
+    from profiling import slow_requests
+
+    token = request.headers.get("X-Profile") or request.args.get("token", "")
+    if not PROFILING_SECRET or not hmac.compare_digest(token, PROFILING_SECRET):
+        return jsonify({"errors": ["Not found."]}), 404
+    limit = max(1, request.args.get("limit", 20, type=int))
+    entries = list(slow_requests)[::-1][:limit]
+    if request.args.get("stacks") != "true":
+        entries = [{k: v for k, v in entry.items() if k != "stacks"} for entry in entries]
+    return compact_json_response({"count": len(slow_requests), "requests": entries}, cache_control="no-store")
+
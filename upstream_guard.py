@@ -0,0 +1,222 @@
+# upstream_guard.py — rate limiting and circuit breaking for the Travelpayouts client
+
+import fcntl
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+from config import (
+    UPSTREAM_RATE_LIMIT,
+    UPSTREAM_BURST,
+    UPSTREAM_RATE_LIMIT_WAIT,
+    UPSTREAM_BUCKET_FILE,
+    BREAKER_FAILURE_RATE,
+    BREAKER_MIN_CALLS,
+    BREAKER_WINDOW,
+    BREAKER_SLOW_CALL_SECONDS,
+    BREAKER_RESET_TIMEOUT,
+)
+from config import get_logger
+logger = get_logger(__name__)
+
+
+class UpstreamError(Exception):
+    """The upstream failed or could not be reached"""
+
+
+class RateLimitedError(UpstreamError):
+    """No upstream token became available in time"""
+
+
+class CircuitOpenError(UpstreamError):
+    """The circuit breaker is open and the call was not attempted"""
+
+
+# === Metrics ===
+
+_metrics = {
+    "calls": 0,
+    "failures": 0,
+    "slow_calls": 0,
+    "throttled": 0,
+    "short_circuited": 0,
+    "fallback_cached": 0,
+    "fallback_mock": 0,
+}
+_metrics_lock = threading.Lock()
+
+
+def record_metric(name, amount=1):
+    with _metrics_lock:
+        _metrics[name] = _metrics.get(name, 0) + amount
+
+
+def get_upstream_metrics():
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    metrics["breaker_state"] = upstream_breaker.state
+    return metrics
+
+
+# === Token Bucket ===
+
+_BUCKET_STATE = struct.Struct("dd")  # tokens, last refill (epoch seconds)
+
+
+class FileTokenBucket:
+    """Token bucket whose state lives in a small file guarded by flock, so every
+    worker process on the host draws from the same budget"""
+
+    def __init__(self, path=UPSTREAM_BUCKET_FILE, rate=UPSTREAM_RATE_LIMIT, capacity=UPSTREAM_BURST):
+        self.path = path
+        self.rate = rate
+        self.capacity = capacity
+
+    def _take(self):
+        """Take one token if available; otherwise return the seconds until one is"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            now = time.time()
+            data = os.pread(fd, _BUCKET_STATE.size, 0)
+            if len(data) == _BUCKET_STATE.size:
+                tokens, last = _BUCKET_STATE.unpack(data)
+                tokens = min(self.capacity, tokens + max(0.0, now - last) * self.rate)
+            else:
+                tokens = float(self.capacity)
+
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            os.pwrite(fd, _BUCKET_STATE.pack(tokens, now), 0)
+            return wait
+        finally:
+            os.close(fd)  # closing the descriptor also releases the lock
+
+    def acquire(self, timeout=UPSTREAM_RATE_LIMIT_WAIT):
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                record_metric("throttled")
+                return False
+            time.sleep(wait)
+
+
+upstream_limiter = FileTokenBucket()
+
+
+def acquire_upstream_token():
+    if not upstream_limiter.acquire():
+        raise RateLimitedError("Upstream rate limit exceeded")
+
+
+# === Circuit Breaker ===
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Opens when too many recent calls failed or were slow, fails fast while open,
+    and lets a single trial call through once `reset_timeout` has passed"""
+
+    def __init__(self, failure_rate=BREAKER_FAILURE_RATE, min_calls=BREAKER_MIN_CALLS,
+                 window=BREAKER_WINDOW, slow_call_seconds=BREAKER_SLOW_CALL_SECONDS,
+                 reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._outcomes = deque()  # (timestamp, ok)
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+                logger.info("Circuit breaker half-open, allowing a trial call")
+            if self.state == HALF_OPEN:
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        logger.warning(f"Circuit breaker opened for {self.reset_timeout}s")
+
+    def record(self, ok, latency):
+        slow = latency >= self.slow_call_seconds
+        if not ok:
+            record_metric("failures")
+        if slow:
+            record_metric("slow_calls")
+
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = False
+                if ok and not slow:
+                    self.state = CLOSED
+                    logger.info("Circuit breaker closed")
+                else:
+                    self._open()
+                return
+
+            now = time.monotonic()
+            self._outcomes.append((now, ok and not slow))
+            while self._outcomes and now - self._outcomes[0][0] > self.window:
+                self._outcomes.popleft()
+
+            if len(self._outcomes) >= self.min_calls:
+                bad = sum(1 for _, good in self._outcomes if not good)
+                if bad / len(self._outcomes) >= self.failure_rate:
+                    self._open()
+
+    def release(self):
+        """Give back a half-open trial slot for a call that never reached the upstream"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def call(self, func, *args, **kwargs):
+        if not self.allow_request():
+            record_metric("short_circuited")
+            raise CircuitOpenError("Upstream circuit breaker is open")
+
+        record_metric("calls")
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except RateLimitedError:
+            self.release()
+            raise
+        except Exception:
+            self.record(False, time.monotonic() - start)
+            raise
+        self.record(True, time.monotonic() - start)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self._trial_in_flight = False
+            self._outcomes.clear()
+
+
+upstream_breaker = CircuitBreaker()
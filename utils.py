@@ -1,15 +1,31 @@
 import re
-import hashlib
 import logging
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, Any
 
-import dateparser
-from word2number import w2n
-import spacy
+from lazy_imports import lazy_import
+
+# Imported on first use: loading spaCy and its model alone took seconds per worker
+dateparser = lazy_import("dateparser")
+w2n = lazy_import("word2number.w2n")
+spacy = lazy_import("spacy")
 
 logger = logging.getLogger(__name__)
-nlp = spacy.load("en_core_web_sm")
+
+
+@lru_cache(maxsize=1)
+def get_nlp():
+    """The spaCy pipeline, loaded the first time it is needed"""
+    return spacy.load("en_core_web_sm")
+
+
+def __getattr__(name):
+    # utils.nlp keeps working for existing callers
+    if name == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def normalize_passenger_count(text: str) -> int:
     text = text.lower()
@@ -99,6 +115,3 @@ def extract_travel_entities(user_input: str) -> Dict[str, Any]:
     print(f"✅ Extracted info: {info}")
     return info
 
-def generate_flight_id(link: str, airline: str, departure: datetime) -> str:
-    raw = f"{link}-{airline}-{departure}"
-    return hashlib.md5(raw.encode()).hexdigest()
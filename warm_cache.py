@@ -0,0 +1,226 @@
+# warm_cache.py — keeps the most-searched routes warm in the search cache
+#
+# Every worker counts its own searches and periodically adds them to a SQLite file, so
+# the counts cover the whole host's traffic. Each worker runs a scheduler thread, but only
+# the one holding an exclusive flock on WARM_CACHE_LOCK_FILE refreshes routes; the upstream
+# budget is therefore WARM_CACHE_MAX_CALLS per cycle for the host, not per worker. When the
+# leader exits (or is recycled) the kernel drops its lock and another worker takes over.
+
+import fcntl
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from search_cache import search_cache, make_search_key, parse_search_key
+from config import (
+    WARM_CACHE_ENABLED,
+    WARM_CACHE_INTERVAL,
+    WARM_CACHE_MAX_CALLS,
+    WARM_CACHE_COVERAGE,
+    WARM_CACHE_TRACKED_ROUTES,
+    WARM_CACHE_DB_PATH,
+    WARM_CACHE_LOCK_FILE,
+    WARM_CACHE_FLUSH_INTERVAL,
+)
+from config import get_logger
+logger = get_logger(__name__)
+
+
+class PopularityTracker:
+    """Counts searches per SearchSpec; counts are halved every cycle so old traffic fades.
+
+    With a `path`, counts are buffered in memory and added to a SQLite file shared by all
+    workers at most every `flush_interval` seconds; rankings are then read from the file."""
+
+    def __init__(self, max_routes=WARM_CACHE_TRACKED_ROUTES, path=None, flush_interval=WARM_CACHE_FLUSH_INTERVAL):
+        self.max_routes = max_routes
+        self.path = path
+        self.flush_interval = flush_interval
+        self._counts = {}  # with a path: searches not flushed yet
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._flushed_at = time.monotonic()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS route_counts ("
+                " search_key TEXT PRIMARY KEY,"
+                " count REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    def record(self, spec):
+        with self._lock:
+            self._counts[spec] = self._counts.get(spec, 0) + 1
+            if len(self._counts) > self.max_routes:
+                keep = heapq.nlargest(self.max_routes // 2, self._counts.items(), key=lambda item: item[1])
+                self._counts = dict(keep)
+            due = self.path is not None and time.monotonic() - self._flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Add the buffered counts to the shared file (no-op without a path)"""
+        if self.path is None:
+            return
+        with self._lock:
+            pending, self._counts = self._counts, {}
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO route_counts (search_key, count) VALUES (?, ?) "
+                    "ON CONFLICT (search_key) DO UPDATE SET count = count + excluded.count",
+                    [(make_search_key(spec), count) for spec, count in pending.items()],
+                )
+                conn.execute(
+                    "DELETE FROM route_counts WHERE search_key NOT IN "
+                    "(SELECT search_key FROM route_counts ORDER BY count DESC LIMIT ?)", (self.max_routes,)
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to flush route popularity: {e}")
+
+    def decay(self, factor=0.5):
+        if self.path is None:
+            with self._lock:
+                self._counts = {spec: count * factor for spec, count in self._counts.items() if count * factor >= 0.5}
+            return
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE route_counts SET count = count * ?", (factor,))
+            conn.execute("DELETE FROM route_counts WHERE count < 0.5")
+
+    def _ranked(self):
+        if self.path is None:
+            with self._lock:
+                return sorted(self._counts.items(), key=lambda item: item[1], reverse=True)
+        self.flush()
+        ranked = []
+        for key, count in self._connect().execute("SELECT search_key, count FROM route_counts ORDER BY count DESC"):
+            try:
+                ranked.append((parse_search_key(key), count))
+            except ValueError:
+                continue
+        return ranked
+
+    def hot_routes(self, coverage=WARM_CACHE_COVERAGE):
+        """Most-searched specs first, stopping once they cover `coverage` of all tracked searches"""
+        ranked = self._ranked()
+        total = sum(count for _, count in ranked)
+        hot, covered = [], 0
+        for spec, count in ranked:
+            if total and covered >= coverage * total:
+                break
+            hot.append(spec)
+            covered += count
+        return hot
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+        if self.path is not None:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM route_counts")
+
+
+# Counts only need to be shared when some worker will read them
+popular_routes = PopularityTracker(path=WARM_CACHE_DB_PATH if WARM_CACHE_ENABLED else None)
+
+
+def _is_past(spec):
+    return spec.date_from_str < date.today().isoformat()
+
+
+class WarmCacheScheduler(threading.Thread):
+    """Background thread that re-fetches hot routes before their cache entries expire.
+    With a `lock_path`, only the process holding the lock runs cycles; the others flush their counts."""
+
+    def __init__(self, tracker=popular_routes, interval=WARM_CACHE_INTERVAL,
+                 max_calls=WARM_CACHE_MAX_CALLS, coverage=WARM_CACHE_COVERAGE, lock_path=None):
+        super().__init__(name="warm-cache", daemon=True)
+        self.tracker = tracker
+        self.interval = interval
+        self.max_calls = max_calls
+        self.coverage = coverage
+        self.lock_path = lock_path
+        self._lock_fd = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        logger.info(f"Warm cache scheduler started (every {self.interval}s, budget {self.max_calls} calls)")
+        while not self._stop_event.wait(self.interval):
+            try:
+                if self.is_leader():
+                    self.run_cycle()
+                else:
+                    self.tracker.flush()
+            except Exception:
+                logger.exception("Warm cache cycle failed")
+
+    def is_leader(self):
+        """Whether this process holds the scheduler lock, taking it if it is free"""
+        if self.lock_path is None or self._lock_fd is not None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd  # held until the process exits
+        logger.info(f"Warm cache scheduler leader is now pid {os.getpid()}")
+        return True
+
+    def run_cycle(self):
+        from flight_search import refresh_search  # Lazy import to avoid circular dependencies
+
+        refreshed = 0
+        for spec in self.tracker.hot_routes(self.coverage):
+            if refreshed >= self.max_calls:
+                break
+            if _is_past(spec):
+                continue
+            # Entries younger than half the TTL will still be fresh at the next cycle
+            age = search_cache.age(make_search_key(spec))
+            if age is not None and age < search_cache.ttl / 2:
+                continue
+            refresh_search(spec)
+            refreshed += 1
+
+        self.tracker.decay()
+        logger.info(f"Warm cache cycle refreshed {refreshed} route(s)")
+        return refreshed
+
+    def stop(self):
+        self._stop_event.set()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_warm_cache_scheduler():
+    """Start this process's scheduler thread once; safe to call from every worker"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = WarmCacheScheduler(lock_path=WARM_CACHE_LOCK_FILE)
+            _scheduler.start()
+    return _scheduler